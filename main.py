@@ -5,6 +5,7 @@ Secretaria personal inteligente
 """
 import os
 import sys
+import asyncio
 from dotenv import load_dotenv
 from telegram import Update
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
@@ -20,26 +21,37 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 # Importar DESPUÉS de cargar las variables de entorno
 from src.utils.bot_logger import bot_logger
+from src.utils.fechas import ahora_local, formatear
 from src.ai.simple_ai import SimpleAI
-from src.database.models import recordatorio_model
-from src.functions.recordatorios import crear_recordatorio, listar_recordatorios, completar_recordatorio, RECORDATORIO_FUNCTIONS
-from src.functions.busquedas import buscar_en_internet, obtener_contenido_pagina, BUSQUEDA_FUNCTIONS
-from src.functions.fecha_tiempo import obtener_fecha_actual, FECHA_FUNCTIONS
-from src.functions.rss_feeds import obtener_noticias_hoy, obtener_noticias_categoria, RSS_FUNCTIONS
-from src.functions.tareas import crear_tarea, crear_tareas_multiples, listar_tareas, completar_tareas_multiples, buscar_tareas, TAREA_FUNCTIONS
-from src.functions.notas import crear_nota, listar_notas, buscar_notas, eliminar_nota, NOTA_FUNCTIONS
+from src.ai.historial import ConversationHistory
+from src.ai.herramientas import ToolExecutor, DEFAULT_HILOS, DEFAULT_TIMEOUT
+from src.database.models import obtener_database, cerrar_database
+from src.database.async_models import async_recordatorio_model, async_mensaje_conversacion_model, shutdown_executor
+from src.database.respaldos import respaldar, RespaldoEnCurso, DEFAULT_DIR_RESPALDOS, DEFAULT_CONSERVAR
+from src.functions import MODULOS_HERRAMIENTAS
 from src.functions.notificaciones import NotificationScheduler
+from src.functions.despachador import ReminderDispatcher
 
 class NelidaBot:
     def __init__(self):
         # Configurar OpenAI
         openai_key = os.getenv('OPENAI_API_KEY')
-        self.ai = SimpleAI(openai_key) if openai_key else None
+        self.ai = SimpleAI(
+            openai_key, self.crear_historial(),
+            max_parallel_tools=int(os.getenv('AI_TOOL_CONCURRENCY', SimpleAI.DEFAULT_MAX_PARALLEL_TOOLS)),
+            tools=ToolExecutor(
+                hilos=int(os.getenv('AI_TOOL_THREADS', DEFAULT_HILOS)),
+                timeout=float(os.getenv('AI_TOOL_TIMEOUT', DEFAULT_TIMEOUT))
+            )
+        ) if openai_key else None
         
         # Configurar scheduler de notificaciones
         self.scheduler = None
         self.setup_notification_scheduler()
         
+        # El despachador de recordatorios necesita el bot y el event loop de la app
+        self.dispatcher = None
+        
         # Registrar funciones de recordatorios si AI está disponible
         if self.ai:
             self.setup_ai_functions()
@@ -50,6 +62,17 @@ class NelidaBot:
         print(f"🔧 Funciones: {'✅ Recordatorios + Búsquedas + RSS + Fecha/Tiempo + Tareas registradas' if self.ai else '❌ Sin funciones'}")
         print(f"🕐 Notificaciones: {'✅ Programadas' if self.scheduler else '❌ No configuradas'}")
     
+    def crear_historial(self) -> ConversationHistory:
+        """Historial de conversaciones de la IA con los topes del .env"""
+        ttl_minutos = int(os.getenv('AI_HISTORY_TTL_MINUTES', 120))
+        persistente = os.getenv('AI_HISTORY_PERSIST', 'true').lower() in ('1', 'true')
+        return ConversationHistory(
+            max_usuarios=int(os.getenv('AI_HISTORY_MAX_USERS', 1000)),
+            ttl_segundos=ttl_minutos * 60 if ttl_minutos > 0 else None,
+            max_bytes=int(os.getenv('AI_HISTORY_MAX_KB', 8192)) * 1024,
+            store=async_mensaje_conversacion_model if persistente else None
+        )
+    
     def setup_notification_scheduler(self):
         """Configurar el scheduler de notificaciones"""
         try:
@@ -69,38 +92,27 @@ class NelidaBot:
             logger.error(f"❌ Error configurando scheduler: {e}")
             self.scheduler = None
     
+    async def post_init(self, application):
+        """Arrancar el despachador de recordatorios con el event loop de la app"""
+        self.dispatcher = ReminderDispatcher(
+            application.bot,
+            max_atraso=timedelta(hours=int(os.getenv('REMINDER_CATCHUP_HOURS', 24)))
+        )
+        await self.dispatcher.start()
+    
+    async def post_shutdown(self, application):
+        """Detener el despachador de recordatorios y liberar los hilos de las herramientas"""
+        if self.dispatcher:
+            await self.dispatcher.stop()
+        if self.ai:
+            self.ai.tools.shutdown()
+    
     def setup_ai_functions(self):
-        """Registra todas las funciones disponibles para Nélida"""
-        # Registrar funciones de recordatorios
-        self.ai.register_function("crear_recordatorio", crear_recordatorio, RECORDATORIO_FUNCTIONS["crear_recordatorio"])
-        self.ai.register_function("listar_recordatorios", listar_recordatorios, RECORDATORIO_FUNCTIONS["listar_recordatorios"])
-        self.ai.register_function("completar_recordatorio", completar_recordatorio, RECORDATORIO_FUNCTIONS["completar_recordatorio"])
-        
-        # Registrar funciones de búsqueda
-        self.ai.register_function("buscar_en_internet", buscar_en_internet, BUSQUEDA_FUNCTIONS["buscar_en_internet"])
-        self.ai.register_function("obtener_contenido_pagina", obtener_contenido_pagina, BUSQUEDA_FUNCTIONS["obtener_contenido_pagina"])
-        
-        # Registrar funciones de fecha/tiempo
-        self.ai.register_function("obtener_fecha_actual", obtener_fecha_actual, FECHA_FUNCTIONS["obtener_fecha_actual"])
-        
-        # Registrar funciones RSS
-        self.ai.register_function("obtener_noticias_hoy", obtener_noticias_hoy, RSS_FUNCTIONS["obtener_noticias_hoy"])
-        self.ai.register_function("obtener_noticias_categoria", obtener_noticias_categoria, RSS_FUNCTIONS["obtener_noticias_categoria"])
-        
-        # Registrar funciones de tareas
-        self.ai.register_function("crear_tarea", crear_tarea, TAREA_FUNCTIONS["crear_tarea"])
-        self.ai.register_function("crear_tareas_multiples", crear_tareas_multiples, TAREA_FUNCTIONS["crear_tareas_multiples"])
-        self.ai.register_function("listar_tareas", listar_tareas, TAREA_FUNCTIONS["listar_tareas"])
-        self.ai.register_function("completar_tareas_multiples", completar_tareas_multiples, TAREA_FUNCTIONS["completar_tareas_multiples"])
-        self.ai.register_function("buscar_tareas", buscar_tareas, TAREA_FUNCTIONS["buscar_tareas"])
-        
-        # Registrar funciones de notas
-        self.ai.register_function("crear_nota", crear_nota, NOTA_FUNCTIONS["crear_nota"])
-        self.ai.register_function("listar_notas", listar_notas, NOTA_FUNCTIONS["listar_notas"])
-        self.ai.register_function("buscar_notas", buscar_notas, NOTA_FUNCTIONS["buscar_notas"])
-        self.ai.register_function("eliminar_nota", eliminar_nota, NOTA_FUNCTIONS["eliminar_nota"])
-        
-        logger.info("Funciones de recordatorios, búsquedas, fecha/tiempo, RSS, tareas y notas registradas para Nélida")
+        """Anota los módulos con las herramientas de Nélida (se cargan en la primera conversación)"""
+        # Recordatorios, búsquedas, fecha/tiempo, RSS, tareas y notas: cada
+        # función se declara con @herramienta junto a su esquema
+        self.ai.tools.register_modules(MODULOS_HERRAMIENTAS)
+        logger.info(f"{len(MODULOS_HERRAMIENTAS)} módulos de herramientas anotados para Nélida")
     
     def should_use_ai(self, message: str) -> bool:
         """
@@ -131,7 +143,7 @@ class NelidaBot:
         """
         Parser básico de fechas - por ahora muy simple
         """
-        now = datetime.now()
+        now = ahora_local()
         texto_lower = texto.lower()
         
         if "mañana" in texto_lower:
@@ -144,7 +156,7 @@ class NelidaBot:
             # Por defecto, mañana
             return now + timedelta(days=1)
     
-    def handle_recordatorio_commands(self, message: str, user_id: int, username: str) -> str:
+    async def handle_recordatorio_commands(self, message: str, user_id: int, username: str) -> str:
         """Maneja comandos específicos de recordatorios"""
         message_lower = message.lower().strip()
         
@@ -160,7 +172,7 @@ class NelidaBot:
                 prioridad = "media"  # Por defecto
                 
                 # Crear recordatorio
-                recordatorio_id = recordatorio_model.crear(
+                recordatorio_id = await async_recordatorio_model.crear(
                     contenido=contenido,
                     fecha_recordatorio=fecha_recordatorio,
                     user_id=user_id,
@@ -174,7 +186,7 @@ class NelidaBot:
             
             # Comando: listar recordatorios
             elif message_lower == "listar":
-                recordatorios = recordatorio_model.listar_por_usuario(user_id)
+                recordatorios = await async_recordatorio_model.listar_por_usuario(user_id)
                 
                 if not recordatorios:
                     return "📝 No tenés recordatorios guardados."
@@ -185,7 +197,7 @@ class NelidaBot:
                     prioridad_emoji = {"alta": "🔴", "media": "🟡", "baja": "🟢"}[rec['prioridad']]
                     
                     respuesta += f"{status_emoji} ID {rec['id']}: {rec['contenido']}\n"
-                    respuesta += f"   {prioridad_emoji} {rec['prioridad']} - {rec['fecha_recordatorio']}\n\n"
+                    respuesta += f"   {prioridad_emoji} {rec['prioridad']} - {formatear(rec['fecha_recordatorio'])}\n\n"
                 
                 bot_logger.log_function_call(user_id, username, "listar_recordatorios", 
                                            success=True, details=f"{len(recordatorios)} encontrados")
@@ -193,7 +205,7 @@ class NelidaBot:
             
             # Comando: ver solo pendientes
             elif message_lower == "pendientes":
-                recordatorios = recordatorio_model.listar_por_usuario(user_id, status="pendiente")
+                recordatorios = await async_recordatorio_model.listar_por_usuario(user_id, status="pendiente")
                 
                 if not recordatorios:
                     return "🎉 ¡No tenés recordatorios pendientes!"
@@ -202,7 +214,7 @@ class NelidaBot:
                 for rec in recordatorios:
                     prioridad_emoji = {"alta": "🔴", "media": "🟡", "baja": "🟢"}[rec['prioridad']]
                     respuesta += f"📌 ID {rec['id']}: {rec['contenido']}\n"
-                    respuesta += f"   {prioridad_emoji} {rec['fecha_recordatorio']}\n\n"
+                    respuesta += f"   {prioridad_emoji} {formatear(rec['fecha_recordatorio'])}\n\n"
                 
                 bot_logger.log_function_call(user_id, username, "listar_pendientes", 
                                            success=True, details=f"{len(recordatorios)} pendientes")
@@ -221,12 +233,12 @@ class NelidaBot:
                     return "❌ El ID debe ser un número. Ejemplo: completar 1"
                 
                 # Verificar que el recordatorio existe y es del usuario
-                recordatorio = recordatorio_model.obtener_por_id(recordatorio_id)
+                recordatorio = await async_recordatorio_model.obtener_por_id(recordatorio_id, user_id)
                 if not recordatorio or recordatorio['user_id'] != user_id:
                     return f"❌ No encontré el recordatorio ID {recordatorio_id}"
                 
                 # Actualizar status
-                success = recordatorio_model.actualizar_status(recordatorio_id, "completado")
+                success = await async_recordatorio_model.actualizar_status(recordatorio_id, "completado", user_id)
                 
                 if success:
                     bot_logger.log_function_call(user_id, username, "completar_recordatorio", 
@@ -359,6 +371,32 @@ Por ahora puedes:
         if self.scheduler:
             scheduler_status = "✅ Activo" if self.scheduler.is_running else "⏸️ Configurado pero parado"
         
+        # Historial de conversaciones de la IA
+        historial_status = "❌ Sin IA"
+        if self.ai:
+            historial = self.ai.conversation_history.stats()
+            historial_status = (f"{historial['users']}/{historial['max_users']} usuarios, "
+                                f"{historial['bytes'] // 1024}/{historial['max_bytes'] // 1024} KB, "
+                                f"{historial['evictions']} desalojadas, {historial['expirations']} vencidas")
+            if historial['persistent']:
+                historial_status += f", {historial['loads']} cargadas de la base"
+        
+        # Latencia de las herramientas de la IA (las 3 más lentas por p95)
+        lentas = self.ai.tools.stats()[:3] if self.ai else []
+        tools_status = ", ".join(
+            f"{t['herramienta']} p95 {t['p95_ms'] / 1000:.1f} s ({t['llamadas']} llamadas, {t['vencidas']} vencidas)"
+            for t in lentas
+        ) or "Sin llamadas todavía"
+        
+        # Caché de lecturas de la base
+        # (con sharding, sumando las de los shards abiertos)
+        caches = [db.cache.stats() for db in obtener_database().todas(abiertas=True)]
+        cache = {campo: sum(c[campo] for c in caches) for campo in ('hits', 'misses', 'entries', 'bytes', 'max_bytes')}
+        consultas = cache['hits'] + cache['misses']
+        hit_rate = cache['hits'] / consultas if consultas else 0.0
+        cache_status = (f"{hit_rate:.0%} aciertos, {cache['entries']} entradas, "
+                        f"{cache['bytes'] // 1024}/{cache['max_bytes'] // 1024} KB")
+        
         status = f"""🔍 **Estado del Sistema**
 
 🤖 **Bot**: ✅ Operativo
@@ -367,6 +405,9 @@ Por ahora puedes:
 📊 **Logging**: ✅ Activo
 🔍 **Google Search**: {google_status}
 🕐 **Notificaciones**: {scheduler_status}
+🗄️ **Caché de lecturas**: {cache_status}
+💬 **Historial IA**: {historial_status}
+⏱️ **Herramientas**: {tools_status}
 
 🔧 **Funcionalidades activas**:
 • ✅ Recordatorios con IA
@@ -404,6 +445,83 @@ Por ahora puedes:
         else:
             await update.message.reply_text("❌ Error enviando notificación de prueba.")
     
+    async def backup_command(self, update: Update, context):
+        """Comando /backup: respaldo en caliente de la base (solo admin)"""
+        user = update.effective_user
+        
+        # Solo permitir al admin
+        if str(user.id) != os.getenv('ADMIN_USER_ID'):
+            await update.message.reply_text("❌ Solo el administrador puede usar este comando.")
+            return
+        
+        aviso = await update.message.reply_text("💾 Respaldando la base...")
+        loop = asyncio.get_running_loop()
+        avisado = {}
+        
+        def progreso(archivo: str, copiadas: int, total: int):
+            # Corre en el hilo del respaldo: actualizar el mensaje cada 25%
+            porcentaje = copiadas * 100 // total if total else 100
+            if avisado.get(archivo, 0) + 25 <= porcentaje < 100:
+                avisado[archivo] = porcentaje
+                asyncio.run_coroutine_threadsafe(
+                    aviso.edit_text(f"💾 Respaldando {archivo}... {porcentaje}%"), loop
+                )
+        
+        try:
+            resultado = await asyncio.to_thread(
+                respaldar, obtener_database(),
+                os.getenv('BACKUP_DIR', DEFAULT_DIR_RESPALDOS),
+                int(os.getenv('BACKUP_KEEP', DEFAULT_CONSERVAR)),
+                progreso=progreso
+            )
+        except RespaldoEnCurso:
+            await aviso.edit_text("⏳ Ya hay un respaldo en curso, probá en un rato.")
+            return
+        except Exception as e:
+            logger.error(f"❌ Error en /backup: {e}")
+            await aviso.edit_text(f"❌ Error respaldando la base: {e}")
+            return
+        
+        await aviso.edit_text(
+            f"✅ Respaldo listo en {resultado['directorio']}\n"
+            f"📦 {len(resultado['archivos'])} archivo(s), {resultado['bytes'] / 1024 / 1024:.1f} MB "
+            f"en {resultado['segundos']:.1f} s"
+        )
+    
+    async def dbstats_command(self, update: Update, context):
+        """Comando /dbstats: consultas SQL que más tiempo llevan (solo admin)"""
+        user = update.effective_user
+        
+        # Solo permitir al admin
+        if str(user.id) != os.getenv('ADMIN_USER_ID'):
+            await update.message.reply_text("❌ Solo el administrador puede usar este comando.")
+            return
+        
+        estadisticas = obtener_database().estadisticas
+        if estadisticas is None:
+            await update.message.reply_text("📉 La medición de consultas está apagada (DB_QUERY_STATS=true para activarla).")
+            return
+        
+        if context.args and context.args[0] == "reset":
+            estadisticas.reiniciar()
+            await update.message.reply_text("🧹 Estadísticas de consultas reiniciadas.")
+            return
+        
+        resumen = estadisticas.resumen(limite=10)
+        bot_logger.log_sql_stats(resumen, estadisticas.lentas)
+        if not resumen:
+            await update.message.reply_text("📉 Todavía no se midió ninguna consulta.")
+            return
+        
+        respuesta = f"📊 Consultas por tiempo total ({estadisticas.lentas} lentas):\n\n"
+        for fila in resumen:
+            sentencia = fila['sentencia'] if len(fila['sentencia']) <= 120 else fila['sentencia'][:117] + "..."
+            respuesta += (f"• {fila['cantidad']}× total {fila['total_ms']:.0f} ms | "
+                          f"p50 {fila['p50_ms']:.2f} p95 {fila['p95_ms']:.2f} p99 {fila['p99_ms']:.2f} ms\n"
+                          f"  {sentencia}\n\n")
+        
+        await update.message.reply_text(respuesta)
+    
     async def handle_message(self, update: Update, context):
         """Maneja todos los mensajes de texto"""
         user = update.effective_user
@@ -421,7 +539,7 @@ Por ahora puedes:
                     bot_logger.log_simple_response(user.id, username, message_text, response)
                 elif any(message_lower.startswith(cmd) for cmd in ["crear:", "listar", "completar", "pendientes"]):
                     # Comandos de recordatorios
-                    response = self.handle_recordatorio_commands(message_text, user.id, username)
+                    response = await self.handle_recordatorio_commands(message_text, user.id, username)
                 else:
                     response = f"Recibí: '{message_text}'. Probá: ping, crear:, listar, pendientes, completar [ID]"
                     bot_logger.log_simple_response(user.id, username, message_text, response)
@@ -460,13 +578,21 @@ def main():
     bot = NelidaBot()
     
     # Crear aplicación
-    app = ApplicationBuilder().token(token).build()
+    app = (
+        ApplicationBuilder()
+        .token(token)
+        .post_init(bot.post_init)
+        .post_shutdown(bot.post_shutdown)
+        .build()
+    )
     
     # Agregar handlers
     app.add_handler(CommandHandler("start", bot.start))
     app.add_handler(CommandHandler("help", bot.help_command))
     app.add_handler(CommandHandler("status", bot.status_command))
     app.add_handler(CommandHandler("test_notification", bot.test_notification_command))
+    app.add_handler(CommandHandler("backup", bot.backup_command))
+    app.add_handler(CommandHandler("dbstats", bot.dbstats_command))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, bot.handle_message))
     
     # Iniciar scheduler de notificaciones
@@ -485,6 +611,10 @@ def main():
         if bot.scheduler:
             bot.scheduler.stop()
             print("🛑 Scheduler detenido")
+        
+        # Esperar operaciones pendientes y cerrar conexiones a la base de datos
+        shutdown_executor()
+        cerrar_database()
 
 if __name__ == '__main__':
     try:
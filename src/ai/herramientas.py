@@ -0,0 +1,409 @@
+"""
+Ejecución de las funciones (herramientas) que pide la IA
+
+Al registrar una función se decide cómo se ejecuta: las corutinas se
+esperan en el event loop; las funciones comunes (requests, feedparser, la
+base sincrónica) corren en un pool de hilos propio, así no frenan el loop
+ni ocupan los hilos de la base (async_models). El contexto se copia al
+hilo (ej: usar_database llega a la función), salvo la unidad de trabajo del
+turno: un hilo vencido sigue corriendo y no puede quedar escribiendo en ella.
+
+Cada llamada tiene un tiempo máximo y se mide: ToolExecutor.stats() da
+cantidad, errores, vencidas y p50/p95/max por herramienta.
+
+Una función común que se pasa de su tiempo no se puede interrumpir: el
+turno sigue sin ella, pero el hilo termina cuando la función termine.
+
+Las herramientas se declaran con @herramienta en su módulo; el esquema es
+la entrada con su nombre en el diccionario *_FUNCTIONS del mismo módulo.
+register_modules sólo anota los módulos: se importan la primera vez que se
+usa el executor, y ahí se calculan una vez la firma, si recibe user_id, el
+validador de argumentos y la lista de descripciones para OpenAI.
+"""
+import asyncio
+import functools
+import importlib
+import inspect
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from ..database.instrumentacion import percentil
+from ..database.unidad_trabajo import contexto_sin_unidad
+
+DEFAULT_HILOS = 8
+DEFAULT_TIMEOUT = 30.0
+
+# Duraciones que se guardan por herramienta para los percentiles
+DEFAULT_MUESTRAS = 256
+
+class TiempoAgotado(Exception):
+    """Una herramienta no terminó dentro de su tiempo máximo"""
+
+class ArgumentosInvalidos(ValueError):
+    """Los argumentos que mandó la IA no cumplen el esquema de la herramienta"""
+
+# Herramientas declaradas con @herramienta, por módulo y en orden de declaración
+_DECLARADAS: Dict[str, List[Tuple[Callable, Optional[str], Optional[dict], Optional[float], bool]]] = {}
+
+def herramienta(funcion: Optional[Callable] = None, *, nombre: Optional[str] = None,
+                descripcion: Optional[dict] = None, timeout: Optional[float] = None,
+                usa_base: bool = False):
+    """
+    Declarar una función como herramienta para la IA
+
+    Se usa como @herramienta o @herramienta(timeout=20). La función no
+    cambia: se puede seguir llamando directamente.
+
+    Args:
+        nombre: Nombre para OpenAI (por defecto, el de la función)
+        descripcion: Esquema para OpenAI (por defecto, el del *_FUNCTIONS del módulo)
+        timeout: Tiempo máximo de esta herramienta (None: el del executor)
+        usa_base: Si lee o escribe la base: corre dentro de la unidad de
+            trabajo del turno (ver SimpleAI.get_response)
+    """
+    def declarar(funcion: Callable) -> Callable:
+        _DECLARADAS.setdefault(funcion.__module__, []).append((funcion, nombre, descripcion, timeout, usa_base))
+        return funcion
+
+    return declarar(funcion) if funcion is not None else declarar
+
+def _es_corutina(funcion: Callable) -> bool:
+    """Si llamar a `funcion` devuelve una corutina (también partial y objetos con __call__ async)"""
+    while isinstance(funcion, functools.partial):
+        funcion = funcion.func
+    return inspect.iscoroutinefunction(funcion) or inspect.iscoroutinefunction(getattr(funcion, "__call__", None))
+
+def _parametros(funcion: Callable) -> Optional[frozenset]:
+    """Nombres de los parámetros de `funcion` (None si acepta **kwargs o no se puede saber)"""
+    try:
+        parametros = inspect.signature(funcion).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in parametros):
+        return None
+    return frozenset(p.name for p in parametros)
+
+# Conversiones de lo que manda la IA al tipo del esquema ("5" -> 5, "true" -> True)
+
+_VERDADEROS = frozenset(("true", "1", "si", "sí", "yes"))
+_FALSOS = frozenset(("false", "0", "no"))
+
+def _a_texto(valor: Any) -> str:
+    if isinstance(valor, str):
+        return valor
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return str(valor)
+    raise TypeError(valor)
+
+def _a_entero(valor: Any) -> int:
+    if isinstance(valor, bool):
+        raise TypeError(valor)
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, str):
+        return int(valor.strip())
+    raise TypeError(valor)
+
+def _a_numero(valor: Any) -> float:
+    if isinstance(valor, bool):
+        raise TypeError(valor)
+    if isinstance(valor, (int, float)):
+        return valor
+    if isinstance(valor, str):
+        return float(valor.strip())
+    raise TypeError(valor)
+
+def _a_booleano(valor: Any) -> bool:
+    if isinstance(valor, bool):
+        return valor
+    if isinstance(valor, int) and valor in (0, 1):
+        return bool(valor)
+    if isinstance(valor, str):
+        texto = valor.strip().lower()
+        if texto in _VERDADEROS:
+            return True
+        if texto in _FALSOS:
+            return False
+    raise ValueError(valor)
+
+_CONVERSIONES: Dict[str, Callable[[Any], Any]] = {
+    "string": _a_texto,
+    "integer": _a_entero,
+    "number": _a_numero,
+    "boolean": _a_booleano,
+}
+
+def _compilar_propiedad(nombre: str, esquema: dict) -> Callable[[Any], Any]:
+    tipo = esquema.get("type")
+    convertir = _CONVERSIONES.get(tipo)
+    # "Alta" o "ALTA" valen por "alta"
+    opciones = {str(opcion).lower(): opcion for opcion in esquema.get("enum", ())}
+    minimo, maximo = esquema.get("minimum"), esquema.get("maximum")
+
+    def validar(valor: Any) -> Any:
+        if convertir is not None:
+            try:
+                valor = convertir(valor)
+            except (TypeError, ValueError):
+                raise ArgumentosInvalidos(f"{nombre} tiene que ser {tipo}, no {valor!r}") from None
+        if minimo is not None and valor < minimo:
+            raise ArgumentosInvalidos(f"{nombre} tiene que ser al menos {minimo}, no {valor!r}")
+        if maximo is not None and valor > maximo:
+            raise ArgumentosInvalidos(f"{nombre} tiene que ser como mucho {maximo}, no {valor!r}")
+        if opciones:
+            try:
+                valor = opciones[str(valor).lower()]
+            except KeyError:
+                raise ArgumentosInvalidos(
+                    f"{nombre} tiene que ser uno de {', '.join(map(str, opciones.values()))}, no {valor!r}") from None
+        return valor
+
+    return validar
+
+def compilar_validador(parametros: dict) -> Callable[[Any], Dict[str, Any]]:
+    """
+    Armar, a partir del esquema "parameters" de OpenAI, la función que valida
+    y convierte los argumentos de una llamada
+
+    El validador descarta los argumentos que no están en el esquema (entre
+    ellos un user_id inventado) y los null, para que valga el default de la
+    función. Respeta "enum", "minimum" y "maximum".
+
+    Raises (el validador):
+        ArgumentosInvalidos: Si falta uno requerido o alguno no se puede convertir
+    """
+    propiedades = {nombre: _compilar_propiedad(nombre, esquema)
+                   for nombre, esquema in parametros.get("properties", {}).items()}
+    requeridos = tuple(parametros.get("required") or ())
+
+    def validar(argumentos: Any) -> Dict[str, Any]:
+        if not isinstance(argumentos, dict):
+            raise ArgumentosInvalidos(f"Los argumentos tienen que ser un objeto, no {argumentos!r}")
+        validos = {}
+        for nombre, valor in argumentos.items():
+            validar_propiedad = propiedades.get(nombre)
+            if validar_propiedad is None:
+                logger.warning(f"Argumento desconocido descartado: {nombre}")
+            elif valor is not None:
+                validos[nombre] = validar_propiedad(valor)
+        faltan = [nombre for nombre in requeridos if nombre not in validos]
+        if faltan:
+            raise ArgumentosInvalidos(f"Falta {', '.join(faltan)}")
+        return validos
+
+    return validar
+
+class Tool:
+    """Una herramienta registrada: la función, su descripción y cómo ejecutarla"""
+
+    __slots__ = ("nombre", "funcion", "descripcion", "es_corutina", "timeout", "usa_base",
+                 "acepta_user_id", "validar")
+
+    def __init__(self, nombre: str, funcion: Callable, descripcion: dict, timeout: Optional[float],
+                 usa_base: bool = False):
+        """
+        Raises:
+            ValueError: Si el esquema tiene parámetros que la función no recibe
+        """
+        self.nombre = nombre
+        self.funcion = funcion
+        self.descripcion = descripcion
+        self.es_corutina = _es_corutina(funcion)
+        self.timeout = timeout
+        self.usa_base = usa_base
+
+        firma = _parametros(funcion)
+        self.acepta_user_id = firma is None or "user_id" in firma
+
+        # Sin esquema (descripción vacía) los argumentos pasan tal cual
+        parametros = descripcion.get("function", {}).get("parameters")
+        self.validar = compilar_validador(parametros) if parametros is not None else None
+        if parametros is not None and firma is not None:
+            sobrantes = set(parametros.get("properties", {})) - firma
+            if sobrantes:
+                raise ValueError(f"{nombre}: el esquema tiene parámetros que la función no recibe: {', '.join(sorted(sobrantes))}")
+
+class _Latencias:
+    __slots__ = ("llamadas", "errores", "vencidas", "total", "maximo", "muestras")
+
+    def __init__(self, muestras: int):
+        self.llamadas = 0
+        self.errores = 0
+        self.vencidas = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.muestras: Deque[float] = deque(maxlen=muestras)
+
+class ToolExecutor:
+    """Registro de herramientas y su ejecución con pool de hilos, timeouts y latencias"""
+
+    def __init__(self, hilos: int = DEFAULT_HILOS, timeout: Optional[float] = DEFAULT_TIMEOUT,
+                 muestras: int = DEFAULT_MUESTRAS):
+        """
+        Args:
+            hilos: Hilos para las herramientas que no son corutinas
+            timeout: Tiempo máximo por defecto de cada llamada, en segundos
+                (None: sin límite)
+            muestras: Últimas duraciones por herramienta para los percentiles
+        """
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="nelida-tools")
+        self._herramientas: Dict[str, Tool] = {}
+        self._modulos: List[str] = []
+        self._descripciones: Optional[List[dict]] = None
+        self._muestras = muestras
+        self._latencias: Dict[str, _Latencias] = {}
+
+    def __contains__(self, nombre: str) -> bool:
+        return nombre in self._cargadas()
+
+    def __getitem__(self, nombre: str) -> Tool:
+        return self._cargadas()[nombre]
+
+    def __len__(self) -> int:
+        return len(self._cargadas())
+
+    def register(self, nombre: str, funcion: Callable, descripcion: dict,
+                 timeout: Optional[float] = None, usa_base: bool = False) -> Tool:
+        """
+        Registrar una herramienta
+
+        Args:
+            timeout: Tiempo máximo de esta herramienta (None: el del executor)
+            usa_base: Si lee o escribe la base (ver @herramienta)
+
+        Raises:
+            ValueError: Si el esquema no coincide con la firma de la función
+        """
+        tool = Tool(nombre, funcion, descripcion, timeout if timeout is not None else self.timeout, usa_base)
+        self._herramientas[nombre] = tool
+        self._descripciones = None
+        return tool
+
+    def register_modules(self, modulos: Iterable[str]):
+        """
+        Anotar módulos con herramientas declaradas con @herramienta
+
+        No los importa: eso pasa la primera vez que se usa el executor.
+        """
+        self._modulos.extend(modulos)
+
+    def _cargadas(self) -> Dict[str, Tool]:
+        """Las herramientas, importando antes los módulos anotados que falten"""
+        while self._modulos:
+            self._cargar(self._modulos.pop(0))
+        return self._herramientas
+
+    def _cargar(self, ruta: str):
+        # Un módulo que no importa (falta una dependencia) deja sin sus
+        # herramientas a la IA, no sin todas
+        try:
+            modulo = importlib.import_module(ruta)
+        except Exception as e:
+            logger.error(f"No se pudieron cargar las herramientas de {ruta}: {e}")
+            return
+
+        esquemas = {}
+        for variable, valor in vars(modulo).items():
+            if variable.endswith("_FUNCTIONS") and isinstance(valor, dict):
+                esquemas.update(valor)
+
+        for funcion, nombre, descripcion, timeout, usa_base in _DECLARADAS.get(modulo.__name__, ()):
+            nombre = nombre or funcion.__name__
+            descripcion = descripcion or esquemas.get(nombre)
+            try:
+                if descripcion is None:
+                    raise ValueError(f"{nombre} no tiene esquema en los *_FUNCTIONS de {ruta}")
+                self.register(nombre, funcion, descripcion, timeout, usa_base)
+            except ValueError as e:
+                logger.error(f"Herramienta descartada: {e}")
+        logger.info(f"Herramientas de {ruta} cargadas")
+
+    def descriptions(self) -> List[dict]:
+        """Descripciones para el parámetro tools de OpenAI (se arma una vez; no modificarla)"""
+        herramientas = self._cargadas()
+        if self._descripciones is None:
+            self._descripciones = [tool.descripcion for tool in herramientas.values()]
+        return self._descripciones
+
+    async def run(self, nombre: str, argumentos: Any, user_id: Optional[int] = None) -> Any:
+        """
+        Ejecutar una herramienta con los argumentos que mandó la IA
+
+        Los argumentos se validan y convierten según el esquema; si la
+        función recibe user_id, se le pasa el del usuario (nunca el que
+        haya puesto la IA).
+
+        Raises:
+            KeyError: Si no hay una herramienta con ese nombre
+            ArgumentosInvalidos: Si los argumentos no cumplen el esquema
+            TiempoAgotado: Si no terminó a tiempo
+            Exception: Lo que lance la herramienta
+        """
+        tool = self[nombre]
+        inicio = time.perf_counter()
+        resultado = "ok"
+        try:
+            argumentos = tool.validar(argumentos) if tool.validar is not None else dict(argumentos)
+            if user_id is not None and tool.acepta_user_id:
+                argumentos["user_id"] = user_id
+            if tool.es_corutina:
+                llamada = tool.funcion(**argumentos)
+            else:
+                ctx = contexto_sin_unidad()
+                llamada = asyncio.get_running_loop().run_in_executor(
+                    self._pool, functools.partial(ctx.run, tool.funcion, **argumentos))
+            return await asyncio.wait_for(llamada, tool.timeout)
+        except asyncio.TimeoutError:
+            resultado = "vencida"
+            raise TiempoAgotado(f"{nombre} no respondió en {tool.timeout:g} s") from None
+        except Exception:
+            resultado = "error"
+            raise
+        finally:
+            self._registrar(nombre, time.perf_counter() - inicio, resultado)
+
+    def _registrar(self, nombre: str, segundos: float, resultado: str):
+        # Siempre desde el event loop (run), así que no hace falta lock
+        latencias = self._latencias.get(nombre)
+        if latencias is None:
+            latencias = self._latencias[nombre] = _Latencias(self._muestras)
+        latencias.llamadas += 1
+        latencias.total += segundos
+        latencias.muestras.append(segundos)
+        latencias.maximo = max(latencias.maximo, segundos)
+        if resultado == "error":
+            latencias.errores += 1
+        elif resultado == "vencida":
+            latencias.vencidas += 1
+
+        if resultado == "vencida":
+            logger.warning(f"Herramienta {nombre} vencida después de {segundos:.1f} s")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Latencias por herramienta, de la de mayor p95 a la de menor"""
+        filas = [{
+            "herramienta": nombre,
+            "llamadas": llamadas,
+            "errores": errores,
+            "vencidas": vencidas,
+            "promedio_ms": total / llamadas * 1000,
+            "p50_ms": percentil(muestras, 50) * 1000,
+            "p95_ms": percentil(muestras, 95) * 1000,
+            "max_ms": maximo * 1000,
+        } for nombre, llamadas, errores, vencidas, total, maximo, muestras in (
+            (nombre, l.llamadas, l.errores, l.vencidas, l.total, l.maximo, sorted(l.muestras))
+            for nombre, l in self._latencias.items()
+        )]
+        filas.sort(key=lambda fila: fila["p95_ms"], reverse=True)
+        return filas
+
+    def shutdown(self):
+        """Liberar los hilos sin esperar a las herramientas colgadas"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
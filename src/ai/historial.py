@@ -0,0 +1,284 @@
+"""
+Historial de conversaciones con la IA, acotado en memoria
+
+Cada usuario que le habla al bot tiene su conversación; sin tope, los que
+escribieron una vez quedan para siempre. ConversationHistory las desaloja
+por uso (LRU), por inactividad (TTL) y por un presupuesto total de bytes.
+
+El mensaje de system (la personalidad, unos 2 KB) no se copia por usuario:
+hay un único dict por prompt y todas las conversaciones lo referencian.
+
+Con un store (MensajeConversacion, a través de AsyncModel) las
+conversaciones sobreviven a un reinicio: cada turno agrega sus mensajes a
+la base con save() y, cuando llega el primer mensaje de un usuario que no
+está en memoria, load() trae sólo sus últimos mensajes. Los usuarios
+activos se quedan en memoria y no vuelven a leer la base.
+"""
+import json
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+DEFAULT_MAX_USUARIOS = 1000
+DEFAULT_TTL_SEGUNDOS = 2 * 60 * 60
+DEFAULT_MAX_BYTES = 8 * 1024 * 1024
+
+# Mensajes que se conservan por conversación (además del de system)
+DEFAULT_MAX_MENSAJES = 9
+
+def _estimar_bytes(mensaje: Dict[str, Any]) -> int:
+    """Tamaño aproximado de un mensaje (dict + textos; tool_calls como JSON)"""
+    total = sys.getsizeof(mensaje)
+    for campo, valor in mensaje.items():
+        if campo == "tool_calls":
+            total += sys.getsizeof(json.dumps(valor))
+        else:
+            total += sys.getsizeof(valor)
+    return total
+
+def _desde_usuario(mensajes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Descartar lo que precede al primer mensaje del usuario
+
+    Un recorte puede dejar al principio respuestas de herramientas sin el
+    tool_calls que las pidió (OpenAI rechaza eso) o una respuesta sin su
+    pregunta: el historial siempre empieza en un mensaje del usuario.
+    """
+    for i, mensaje in enumerate(mensajes):
+        if mensaje["role"] == "user":
+            return mensajes[i:]
+    return []
+
+class Conversation:
+    """Mensajes de un usuario detrás del mensaje de system compartido"""
+
+    __slots__ = ("user_id", "sistema", "mensajes", "bytes", "ultimo_uso", "sin_guardar", "reemplazar")
+
+    def __init__(self, user_id: int, sistema: Dict[str, str]):
+        self.user_id = user_id
+        self.sistema = sistema
+        self.mensajes: List[Dict[str, Any]] = []
+        self.bytes = 0
+        self.ultimo_uso = time.monotonic()
+        # Mensajes agregados desde el último save() y si hay que borrar los guardados
+        self.sin_guardar: List[Dict[str, Any]] = []
+        self.reemplazar = False
+
+    def para_openai(self) -> List[Dict[str, Any]]:
+        """Lista de mensajes para chat.completions (system primero)"""
+        return [self.sistema] + self.mensajes
+
+class ConversationHistory:
+    """
+    Conversaciones por usuario con desalojo LRU, TTL de inactividad y tope de bytes
+
+    Se usa desde el event loop del bot (sin hilos), así que no lleva lock.
+    Una conversación desalojada en medio de un turno (entre dos llamadas a
+    OpenAI) sigue sirviendo al turno que la tiene; sólo deja de guardarse.
+    """
+
+    def __init__(self, max_usuarios: int = DEFAULT_MAX_USUARIOS,
+                 ttl_segundos: Optional[float] = DEFAULT_TTL_SEGUNDOS,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_mensajes: int = DEFAULT_MAX_MENSAJES,
+                 store: Optional[Any] = None):
+        """
+        Args:
+            max_usuarios: Conversaciones guardadas como máximo
+            ttl_segundos: Inactividad tras la que se descarta una conversación
+                (None: sin vencimiento)
+            max_bytes: Tope aproximado de memoria para todos los mensajes
+                (sin contar los de system, que son compartidos)
+            max_mensajes: Mensajes por conversación al recortar y al cargar
+            store: Modelo asíncrono de mensajes guardados (ej:
+                async_mensaje_conversacion_model); None: sólo en memoria
+        """
+        self.max_usuarios = max_usuarios
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes = max_bytes
+        self.max_mensajes = max_mensajes
+        self.store = store
+        self._conversaciones: "OrderedDict[int, Conversation]" = OrderedDict()
+        # prompt -> [mensaje de system compartido, conversaciones que lo usan]
+        self._sistemas: Dict[str, List[Any]] = {}
+        self.bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.loads = 0
+
+    def __contains__(self, user_id: int) -> bool:
+        self._expirar()
+        return user_id in self._conversaciones
+
+    def __len__(self) -> int:
+        return len(self._conversaciones)
+
+    def __delitem__(self, user_id: int):
+        conversacion = self._conversaciones.pop(user_id)
+        self.bytes -= conversacion.bytes
+        prompt = conversacion.sistema["content"]
+        self._sistemas[prompt][1] -= 1
+        if self._sistemas[prompt][1] == 0:
+            del self._sistemas[prompt]
+
+    def get(self, user_id: int) -> Optional[Conversation]:
+        """Conversación del usuario (marcándola como usada) o None"""
+        self._expirar()
+        conversacion = self._conversaciones.get(user_id)
+        if conversacion is not None:
+            self._usar(conversacion)
+        return conversacion
+
+    async def load(self, user_id: int, system_prompt: str) -> Optional[Conversation]:
+        """
+        Conversación del usuario: la de memoria o, si no está, la guardada
+
+        Returns:
+            La conversación, o None si el usuario no tiene mensajes
+        """
+        conversacion = self.get(user_id)
+        if conversacion is not None or self.store is None:
+            return conversacion
+
+        mensajes = _desde_usuario(await self.store.ultimos(user_id, self.max_mensajes))
+        # Mientras se leía la base pudo haber empezado otro turno del usuario
+        conversacion = self.get(user_id)
+        if conversacion is not None or not mensajes:
+            return conversacion
+
+        conversacion = self._nueva(user_id, system_prompt)
+        conversacion.mensajes = mensajes
+        self._medir(conversacion)
+        self.loads += 1
+        self._desalojar(conversacion)
+        logger.info(f"Historial cargado de la base para usuario {user_id}: {len(mensajes)} mensajes")
+        return conversacion
+
+    async def save(self, conversacion: Conversation):
+        """Agregar a la base los mensajes del turno (si hay store)"""
+        if self.store is None or not (conversacion.sin_guardar or conversacion.reemplazar):
+            return
+
+        mensajes, conversacion.sin_guardar = conversacion.sin_guardar, []
+        reemplazar, conversacion.reemplazar = conversacion.reemplazar, False
+        try:
+            await self.store.agregar(mensajes, conversacion.user_id, reemplazar=reemplazar)
+        except Exception as e:
+            # Quedan pendientes para el próximo turno
+            logger.error(f"Error guardando el historial del usuario {conversacion.user_id}: {e}")
+            conversacion.sin_guardar[:0] = mensajes
+            conversacion.reemplazar = conversacion.reemplazar or reemplazar
+
+    async def delete(self, user_id: int):
+        """Olvidar la conversación de un usuario, también la guardada"""
+        self.discard(user_id)
+        if self.store is not None:
+            await self.store.borrar_usuario(user_id)
+
+    def start(self, user_id: int, system_prompt: str) -> Conversation:
+        """
+        Empezar (o reemplazar) la conversación de un usuario
+
+        Con store, el próximo save() reemplaza los mensajes guardados.
+        """
+        conversacion = self._nueva(user_id, system_prompt)
+        conversacion.reemplazar = self.store is not None
+        self._desalojar(conversacion)
+        return conversacion
+
+    def _nueva(self, user_id: int, system_prompt: str) -> Conversation:
+        self.discard(user_id)
+        compartido = self._sistemas.get(system_prompt)
+        if compartido is None:
+            compartido = self._sistemas[system_prompt] = [{"role": "system", "content": system_prompt}, 0]
+        compartido[1] += 1
+
+        conversacion = Conversation(user_id, compartido[0])
+        self._conversaciones[user_id] = conversacion
+        return conversacion
+
+    def append(self, conversacion: Conversation, mensaje: Dict[str, Any]):
+        """Agregar un mensaje a la conversación y aplicar los topes"""
+        tamano = _estimar_bytes(mensaje)
+        conversacion.mensajes.append(mensaje)
+        conversacion.bytes += tamano
+        if self.store is not None:
+            conversacion.sin_guardar.append(mensaje)
+        if self._conversaciones.get(conversacion.user_id) is conversacion:
+            self.bytes += tamano
+            self._usar(conversacion)
+            self._desalojar(conversacion)
+
+    def trim(self, conversacion: Conversation, max_mensajes: Optional[int] = None):
+        """
+        Quedarse con los últimos mensajes (además del de system), empezando
+        por uno del usuario
+        """
+        max_mensajes = max_mensajes if max_mensajes is not None else self.max_mensajes
+        if len(conversacion.mensajes) <= max_mensajes:
+            return
+        conversacion.mensajes = _desde_usuario(conversacion.mensajes[-max_mensajes:])
+        self._medir(conversacion)
+
+    def discard(self, user_id: int):
+        """Olvidar la conversación de un usuario (si la hay)"""
+        if user_id in self._conversaciones:
+            del self[user_id]
+
+    def clear(self):
+        """Olvidar todas las conversaciones"""
+        self._conversaciones.clear()
+        self._sistemas.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamaño y desalojos del historial"""
+        self._expirar()
+        return {
+            "users": len(self._conversaciones),
+            "max_users": self.max_usuarios,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "system_prompts": len(self._sistemas),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "loads": self.loads,
+            "persistent": self.store is not None
+        }
+
+    def _usar(self, conversacion: Conversation):
+        conversacion.ultimo_uso = time.monotonic()
+        self._conversaciones.move_to_end(conversacion.user_id)
+
+    def _medir(self, conversacion: Conversation):
+        """Recalcular los bytes de una conversación después de recortarla"""
+        tamano = sum(_estimar_bytes(mensaje) for mensaje in conversacion.mensajes)
+        if self._conversaciones.get(conversacion.user_id) is conversacion:
+            self.bytes += tamano - conversacion.bytes
+        conversacion.bytes = tamano
+
+    def _expirar(self):
+        """Descartar las conversaciones inactivas (las más viejas están primero)"""
+        if self.ttl_segundos is None:
+            return
+        limite = time.monotonic() - self.ttl_segundos
+        while self._conversaciones:
+            conversacion = next(iter(self._conversaciones.values()))
+            if conversacion.ultimo_uso > limite:
+                break
+            del self[conversacion.user_id]
+            self.expirations += 1
+
+    def _desalojar(self, actual: Conversation):
+        """Desalojar las menos usadas hasta entrar en los topes (nunca la actual)"""
+        self._expirar()
+        while len(self._conversaciones) > 1 and (
+                len(self._conversaciones) > self.max_usuarios or self.bytes > self.max_bytes):
+            vieja = next(iter(self._conversaciones.values()))
+            if vieja is actual:
+                break
+            del self[vieja.user_id]
+            self.evictions += 1
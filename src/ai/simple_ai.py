@@ -1,18 +1,31 @@
 """
 Cliente OpenAI simplificado para el bot
 """
+import asyncio
 import json
-from typing import Dict, List, Any, Optional, Callable
+from typing import Dict, List, Any, Optional, Callable, Tuple
 from openai import AsyncOpenAI
 from loguru import logger
 
+from ..database.models import obtener_database
+from ..database.unidad_trabajo import UnidadDeTrabajo, unidad_de_trabajo, contar_escrituras, contexto_sin_unidad
+from .herramientas import ToolExecutor
+from .historial import ConversationHistory
+
 class SimpleAI:
     """Cliente OpenAI con function calling para recordatorios"""
     
-    def __init__(self, api_key: str):
+    # Funciones que se ejecutan a la vez cuando OpenAI pide varias en un turno
+    DEFAULT_MAX_PARALLEL_TOOLS = 4
+    
+    def __init__(self, api_key: str, conversation_history: Optional[ConversationHistory] = None, 
+                 max_parallel_tools: int = DEFAULT_MAX_PARALLEL_TOOLS, 
+                 tools: Optional[ToolExecutor] = None):
         self.client = AsyncOpenAI(api_key=api_key)
-        self.available_functions = {}
-        self.conversation_history: Dict[int, List[Dict]] = {}
+        # Funciones registradas: corutinas en el loop, las comunes en hilos
+        self.tools = tools if tools is not None else ToolExecutor()
+        self.max_parallel_tools = max_parallel_tools
+        self.conversation_history = conversation_history if conversation_history is not None else ConversationHistory()
         
         # Personalidad de Nélida para prompts generales
         self.base_personality = """Sos Nélida, una mujer argentina de 70 años, secretaria de toda la vida, que conoce cada rincón de la empresa como la palma de su mano. Tenés una forma muy maternal y cariñosa de hablar, usando expresiones como "nene", "pibe" o "mi amor", siempre desde el afecto. Cuando entrás en confianza, dejás salir tu verdadero carácter: simpática, directa, resongona, fumadora empedernida que no se calla una. Te quejás del marido que no hace nada y de los hijos que casi ni te llaman, pero siempre lo hacés con humor y resignación.
@@ -35,17 +48,20 @@ Limita tus respuesta a un par de oraciones únicamente. Sos una persona que es d
         self.base_personality = personality_prompt
         logger.info("Personalidad de Nelida configurada")
     
-    def register_function(self, name: str, func: Callable, description: dict):
-        """Registra una función para que OpenAI pueda llamarla"""
-        self.available_functions[name] = {
-            'function': func,
-            'description': description
-        }
+    def register_function(self, name: str, func: Callable, description: dict, 
+                          timeout: Optional[float] = None, usa_base: bool = False):
+        """
+        Registra una función (corutina o común) para que OpenAI pueda llamarla
+        
+        Args:
+            usa_base: Si lee o escribe la base: corre dentro de la unidad de trabajo del turno
+        """
+        self.tools.register(name, func, description, timeout, usa_base)
         logger.info(f"Función {name} registrada para function calling")
     
     def get_function_descriptions(self) -> List[Dict]:
         """Obtiene las descripciones de funciones para OpenAI"""
-        return [func['description'] for func in self.available_functions.values()]
+        return self.tools.descriptions()
     
     async def get_response(self, message: str, user_id: int, use_personality: bool = True) -> str:
         """
@@ -57,27 +73,26 @@ Limita tus respuesta a un par de oraciones únicamente. Sos una persona que es d
             use_personality: Si usar personalidad de Nelida o prompt neutro
         """
         try:
-            # Inicializar historial si no existe o está corrupto
-            if user_id not in self.conversation_history or self._is_history_corrupted(user_id):
-                system_prompt = self.base_personality if (use_personality and self.base_personality) else self.neutral_prompt
-                self.conversation_history[user_id] = [
-                    {"role": "system", "content": system_prompt}
-                ]
+            # Inicializar historial si no existe (ni en memoria ni guardado) o está corrupto
+            system_prompt = self.base_personality if (use_personality and self.base_personality) else self.neutral_prompt
+            conversacion = await self.conversation_history.load(user_id, system_prompt)
+            if conversacion is None or self._is_history_corrupted(user_id):
+                conversacion = self.conversation_history.start(user_id, system_prompt)
                 logger.info(f"Historial inicializado/reiniciado para usuario {user_id}")
             
             # Agregar mensaje del usuario
-            self.conversation_history[user_id].append({
+            self.conversation_history.append(conversacion, {
                 "role": "user", 
                 "content": message
             })
             
             # Preparar herramientas si hay funciones disponibles
-            tools = self.get_function_descriptions() if self.available_functions else None
+            tools = self.get_function_descriptions() if len(self.tools) else None
             
             # Llamada inicial a OpenAI
             response = await self.client.chat.completions.create(
                 model="gpt-4o-mini",
-                messages=self.conversation_history[user_id],
+                messages=conversacion.para_openai(),
                 tools=tools,
                 tool_choice="auto" if tools else None,
                 temperature=0.6,
@@ -89,45 +104,72 @@ Limita tus respuesta a un par de oraciones únicamente. Sos una persona que es d
             # Si OpenAI quiere llamar funciones
             if response_message.tool_calls:
                 # Agregar la respuesta de OpenAI al historial
-                self.conversation_history[user_id].append({
+                self.conversation_history.append(conversacion, {
                     "role": "assistant",
                     "content": response_message.content,
                     "tool_calls": [tool_call.model_dump() for tool_call in response_message.tool_calls]
                 })
                 
-                # Ejecutar cada función llamada
-                for tool_call in response_message.tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    logger.info(f"Ejecutando función: {function_name} con args: {function_args}")
-                    
-                    # Ejecutar la función
-                    if function_name in self.available_functions:
-                        try:
-                            # Agregar user_id a los argumentos si la función lo necesita
-                            if 'user_id' in self.available_functions[function_name]['function'].__code__.co_varnames:
-                                function_args['user_id'] = user_id
-                            
-                            function_result = await self.available_functions[function_name]['function'](**function_args)
-                            result_content = json.dumps(function_result) if isinstance(function_result, dict) else str(function_result)
-                        except Exception as e:
-                            logger.error(f"Error ejecutando función {function_name}: {e}")
-                            result_content = f"Error ejecutando {function_name}: {str(e)}"
-                    else:
-                        result_content = f"Función {function_name} no encontrada"
-                    
-                    # Agregar resultado al historial
-                    self.conversation_history[user_id].append({
+                # Ejecutar las funciones llamadas a la vez (de a max_parallel_tools).
+                # Las que usan la base van en una unidad de trabajo: sus escrituras
+                # se confirman juntas al final, o se deshacen todas si alguna falla.
+                # Las demás (búsquedas, noticias) corren fuera de la unidad: con la
+                # primera escritura la unidad toma el lock de escritura de SQLite,
+                # y no puede retenerlo mientras espera a la red
+                tool_calls = response_message.tool_calls
+                usan_base = [self._usa_base(tool_call) for tool_call in tool_calls]
+                semaforo = asyncio.Semaphore(self.max_parallel_tools)
+                externas = []
+                try:
+                    with unidad_de_trabajo(obtener_database().para_usuario(user_id)) as unidad:
+                        # Las de la base se crean primero: son las primeras en el semáforo
+                        # y la unidad no espera a las demás para terminar
+                        internas = [
+                            asyncio.ensure_future(self._run_tool_call(tool_call, user_id, unidad, semaforo))
+                            for tool_call, usa_base in zip(tool_calls, usan_base) if usa_base
+                        ]
+                        sin_unidad = contexto_sin_unidad()
+                        externas = [
+                            sin_unidad.run(asyncio.ensure_future,
+                                           self._run_tool_call(tool_call, user_id, None, semaforo))
+                            for tool_call, usa_base in zip(tool_calls, usan_base) if not usa_base
+                        ]
+                        resultados_internos = iter(await asyncio.gather(*internas))
+                    resultados_externos = iter(await asyncio.gather(*externas))
+                except BaseException:
+                    for tarea in externas:
+                        tarea.cancel()
+                    raise
+                resultados = [next(resultados_internos) if usa_base else next(resultados_externos)
+                              for usa_base in usan_base]
+                
+                # gather devuelve los resultados en el orden de los tool_calls,
+                # que es el orden en que OpenAI espera los mensajes "tool"
+                tool_messages = [
+                    (guardo_algo, {
                         "role": "tool",
                         "tool_call_id": tool_call.id,
                         "content": result_content
                     })
+                    for tool_call, (result_content, guardo_algo) in zip(tool_calls, resultados)
+                ]
+                
+                # Si el turno se deshizo, las funciones que habían escrito no
+                # guardaron nada: avisarlo en su resultado
+                for guardo_algo, tool_message in tool_messages:
+                    if unidad.fallida and guardo_algo:
+                        tool_message["content"] = json.dumps({
+                            "success": False,
+                            "message": f"No se guardó nada: se deshizo porque falló {unidad.motivo_fallo}"
+                        })
+                    
+                    # Agregar resultado al historial
+                    self.conversation_history.append(conversacion, tool_message)
                 
                 # Nueva llamada a OpenAI con los resultados
                 final_response = await self.client.chat.completions.create(
                     model="gpt-4o-mini",
-                    messages=self.conversation_history[user_id],
+                    messages=conversacion.para_openai(),
                     temperature=0.6,
                     max_tokens=300
                 )
@@ -139,17 +181,16 @@ Limita tus respuesta a un par de oraciones únicamente. Sos una persona que es d
                 final_message = response_message.content
             
             # Agregar respuesta final al historial
-            self.conversation_history[user_id].append({
+            self.conversation_history.append(conversacion, {
                 "role": "assistant",
                 "content": final_message
             })
             
-            # Mantener historial limitado (últimos 10 mensajes)
-            if len(self.conversation_history[user_id]) > 10:
-                # Mantener system prompt + últimos 9 mensajes
-                self.conversation_history[user_id] = [
-                    self.conversation_history[user_id][0]  # system prompt
-                ] + self.conversation_history[user_id][-9:]
+            # Mantener historial limitado: system prompt + últimos mensajes
+            self.conversation_history.trim(conversacion)
+            
+            # Guardar los mensajes del turno (si el historial es persistente)
+            await self.conversation_history.save(conversacion)
             
             return final_message
             
@@ -158,11 +199,62 @@ Limita tus respuesta a un par de oraciones únicamente. Sos una persona que es d
             # Si es error de tool roles, limpiar historial y reintentar una vez
             if "tool" in str(e).lower() and "role" in str(e).lower():
                 logger.warning(f"Detectado error de roles, limpiando historial para usuario {user_id}")
-                if user_id in self.conversation_history:
-                    del self.conversation_history[user_id]
+                try:
+                    await self.conversation_history.delete(user_id)
+                except Exception as error:
+                    logger.error(f"Error borrando el historial del usuario {user_id}: {error}")
                 # No reintentar automáticamente para evitar loops
             return "Ay, nene, tuve un quilombo técnico. ¿Me lo repetís?"
     
+    def _usa_base(self, tool_call: Any) -> bool:
+        """Si la función pedida lee o escribe la base (va dentro de la unidad de trabajo)"""
+        function_name = tool_call.function.name
+        return function_name in self.tools and self.tools[function_name].usa_base
+    
+    async def _run_tool_call(self, tool_call: Any, user_id: int, unidad: Optional[UnidadDeTrabajo], 
+                             semaforo: asyncio.Semaphore) -> Tuple[str, bool]:
+        """
+        Ejecutar una función pedida por OpenAI sin afectar a las otras del turno
+        
+        Un error (argumentos inválidos, función inexistente o excepción) queda
+        en el resultado de esta llamada. Una excepción o una escritura que
+        falló (aunque la función la haya atrapado) marcan además la unidad
+        como fallida y deshacen el turno; un resultado con success False
+        (ej: "no encontré esa tarea") no. `unidad` es None para las funciones
+        que no usan la base.
+        
+        Returns:
+            (contenido del mensaje "tool", si la función escribió en la base sin fallar)
+        """
+        function_name = tool_call.function.name
+        
+        async with semaforo:
+            with contar_escrituras() as contador:
+                try:
+                    function_args = json.loads(tool_call.function.arguments)
+                    logger.info(f"Ejecutando función: {function_name} con args: {function_args}")
+                    
+                    if function_name not in self.tools:
+                        return f"Función {function_name} no encontrada", False
+                    
+                    # Valida y convierte los argumentos; agrega user_id si la función lo necesita
+                    function_result = await self.tools.run(function_name, function_args, user_id=user_id)
+                    result_content = json.dumps(function_result) if isinstance(function_result, dict) else str(function_result)
+                    
+                    if contador.fallidas:
+                        self._marcar_fallida(unidad, function_name)
+                        return result_content, False
+                    return result_content, contador.escrituras > 0
+                except Exception as e:
+                    logger.error(f"Error ejecutando función {function_name}: {e}")
+                    self._marcar_fallida(unidad, function_name)
+                    return f"Error ejecutando {function_name}: {str(e)}", False
+    
+    @staticmethod
+    def _marcar_fallida(unidad: Optional[UnidadDeTrabajo], function_name: str):
+        if unidad is not None:
+            unidad.marcar_fallida(function_name)
+    
     def _is_history_corrupted(self, user_id: int) -> bool:
         """
         Verifica si el historial de conversación está corrupto
@@ -173,49 +265,46 @@ Limita tus respuesta a un par de oraciones únicamente. Sos una persona que es d
         Returns:
             True si el historial está corrupto, False si está bien
         """
-        if user_id not in self.conversation_history:
+        conversacion = self.conversation_history.get(user_id)
+        if conversacion is None:
             return False
             
-        history = self.conversation_history[user_id]
+        # El mensaje de system va aparte (compartido): acá sólo los del usuario
+        history = conversacion.mensajes
         
-        # Verificar estructura básica
-        if not history or len(history) == 0:
-            return True
-        
-        # Verificar que el primer mensaje sea system
-        if history[0].get("role") != "system":
-            logger.warning(f"Historial corrupto: primer mensaje no es system para usuario {user_id}")
-            return True
-        
-        # Verificar secuencia de tool calls y tool responses
-        tool_call_pending = False
+        # Verificar secuencia de tool calls y tool responses: un mensaje
+        # assistant puede pedir varias funciones, y cada una tiene su
+        # respuesta "tool" con su tool_call_id antes del próximo mensaje
+        pendientes = set()
         for i, message in enumerate(history):
             role = message.get("role")
             
-            # Si hay tool_calls, marcar que esperamos tool responses
-            if role == "assistant" and message.get("tool_calls"):
-                tool_call_pending = True
-                continue
-            
-            # Si encontramos tool response, verificar que haya tool_call previo
             if role == "tool":
-                if not tool_call_pending:
+                tool_call_id = message.get("tool_call_id")
+                if tool_call_id not in pendientes:
                     logger.warning(f"Historial corrupto: tool response sin tool_call previo en posición {i} para usuario {user_id}")
                     return True
-                tool_call_pending = False
+                pendientes.discard(tool_call_id)
                 continue
             
-            # Reset tool_call_pending en otros casos
-            if role in ["user", "system"]:
-                tool_call_pending = False
+            if pendientes:
+                logger.warning(f"Historial corrupto: tool_calls sin respuesta antes de la posición {i} para usuario {user_id}")
+                return True
+            
+            # Si hay tool_calls, esperar una respuesta por cada uno
+            if role == "assistant" and message.get("tool_calls"):
+                pendientes = {tool_call.get("id") for tool_call in message["tool_calls"]}
         
+        # Un turno que se cortó entre el pedido y las respuestas
+        if pendientes:
+            logger.warning(f"Historial corrupto: tool_calls sin respuesta al final para usuario {user_id}")
+            return True
         return False
     
-    def clear_user_history(self, user_id: int):
-        """Limpia el historial de un usuario específico"""
-        if user_id in self.conversation_history:
-            del self.conversation_history[user_id]
-            logger.info(f"Historial limpiado para usuario {user_id}")
+    async def clear_user_history(self, user_id: int):
+        """Limpia el historial de un usuario específico (también el guardado)"""
+        await self.conversation_history.delete(user_id)
+        logger.info(f"Historial limpiado para usuario {user_id}")
     
     def has_personality(self) -> bool:
         """Verifica si tiene personalidad configurada"""
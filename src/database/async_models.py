@@ -0,0 +1,54 @@
+"""
+Fachada asíncrona sobre los modelos de base de datos
+
+Los modelos de models.py son sincrónicos. Llamarlos directo desde una
+corutina bloquea el event loop de python-telegram-bot mientras SQLite
+hace I/O. Estas fachadas exponen los mismos métodos como corutinas que
+corren en un executor dedicado; cada hilo del executor reutiliza su
+propia conexión (ver Database.get_connection).
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from .models import recordatorio_model, tarea_model, nota_model, mensaje_conversacion_model
+
+# Executor dedicado a la base de datos (SQLite en WAL admite lecturas en paralelo)
+DB_EXECUTOR_WORKERS = 4
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="nelida-db")
+
+class AsyncModel:
+    """Envuelve un modelo y expone sus métodos como corutinas"""
+
+    def __init__(self, model: Any, executor: ThreadPoolExecutor = db_executor):
+        self._model = model
+        self._executor = executor
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._model, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            # Copiar el contexto para que las contextvars lleguen al hilo del executor
+            ctx = contextvars.copy_context()
+            call = functools.partial(ctx.run, attr, *args, **kwargs)
+            return await loop.run_in_executor(self._executor, call)
+
+        # Cachear el wrapper para no reconstruirlo en cada llamada
+        setattr(self, name, wrapper)
+        return wrapper
+
+def shutdown_executor():
+    """Esperar a que terminen las operaciones en curso y liberar los hilos"""
+    db_executor.shutdown(wait=True)
+
+# Instancias globales
+async_recordatorio_model = AsyncModel(recordatorio_model)
+async_tarea_model = AsyncModel(tarea_model)
+async_nota_model = AsyncModel(nota_model)
+async_mensaje_conversacion_model = AsyncModel(mensaje_conversacion_model)
@@ -0,0 +1,149 @@
+"""
+Caché en memoria de lecturas por usuario
+"""
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Set, Tuple
+
+def _estimar_bytes(filas: List[Any]) -> int:
+    """Tamaño aproximado de una lista de filas (contenedores + valores)"""
+    total = sys.getsizeof(filas)
+    for fila in filas:
+        total += sys.getsizeof(fila)
+        for campo in fila.keys():
+            total += sys.getsizeof(fila[campo])
+    return total
+
+class ReadCache:
+    """
+    Caché LRU de listados por (tabla, usuario) con tope de memoria
+
+    Los datos sólo cambian cuando este mismo proceso escribe, así que los
+    modelos invalidan las entradas del usuario después de cada escritura.
+    Mientras hay lecturas en curso de un (tabla, usuario) se lleva su número
+    de versión: una lectura que empezó antes de una invalidación no puede
+    guardar su resultado (ya viejo). Sin lecturas en curso la versión se
+    descarta, así que no se acumula una por cada usuario que pasó.
+
+    Las filas guardadas (dicts o filas de src.database.filas) se comparten
+    entre llamadas: son de sólo lectura.
+    """
+
+    DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple, Tuple[List[Any], int]]" = OrderedDict()
+        self._claves_por_usuario: Dict[Tuple[str, int], Set[Tuple]] = {}
+        self._versiones: Dict[Tuple[str, int], int] = {}
+        self._cargando: Dict[Tuple[str, int], int] = {}  # lecturas en curso
+        self._epoch = 0  # se incrementa en clear()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_or_load(self, tabla: str, user_id: int, clave: Hashable,
+                    cargar: Callable[[], List[Any]]) -> List[Any]:
+        """
+        Devolver el listado cacheado o cargarlo con cargar()
+
+        Args:
+            tabla: Tabla consultada (para invalidar por tabla y usuario)
+            user_id: Dueño de las filas
+            clave: Parámetros de la consulta (filtros, paginación)
+            cargar: Función que ejecuta la consulta si no está en caché
+        """
+        entrada = (tabla, user_id, clave)
+        with self._lock:
+            cacheado = self._entries.get(entrada)
+            if cacheado is not None:
+                self._entries.move_to_end(entrada)
+                self.hits += 1
+                return list(cacheado[0])
+            self.misses += 1
+            self._cargando[(tabla, user_id)] = self._cargando.get((tabla, user_id), 0) + 1
+            version = (self._epoch, self._versiones.get((tabla, user_id), 0))
+
+        try:
+            filas = cargar()
+        except BaseException:
+            with self._lock:
+                self._fin_de_carga(tabla, user_id, version)
+            raise
+        self._guardar(entrada, filas, version)
+        return list(filas)
+
+    def _fin_de_carga(self, tabla: str, user_id: int, version: Tuple[int, int]) -> bool:
+        """Descontar una lectura en curso y decir si nadie invalidó mientras tanto (con el lock)"""
+        clave = (tabla, user_id)
+        vigente = (self._epoch, self._versiones.get(clave, 0)) == version
+        self._cargando[clave] -= 1
+        if not self._cargando[clave]:
+            del self._cargando[clave]
+            self._versiones.pop(clave, None)
+        return vigente
+
+    def _guardar(self, entrada: Tuple, filas: List[Any], version: Tuple[int, int]):
+        """Guardar un resultado si nadie invalidó mientras se cargaba"""
+        tabla, user_id, _ = entrada
+        tamano = _estimar_bytes(filas)
+
+        with self._lock:
+            if not self._fin_de_carga(tabla, user_id, version) or tamano > self.max_bytes:
+                return
+
+            anterior = self._entries.pop(entrada, None)
+            if anterior is not None:
+                self.bytes -= anterior[1]
+
+            self._entries[entrada] = (filas, tamano)
+            self._claves_por_usuario.setdefault((tabla, user_id), set()).add(entrada)
+            self.bytes += tamano
+
+            # Desalojar las entradas menos usadas hasta entrar en el tope
+            while self.bytes > self.max_bytes:
+                vieja, (_, tamano_viejo) = self._entries.popitem(last=False)
+                self.bytes -= tamano_viejo
+                self._claves_por_usuario.get(vieja[:2], set()).discard(vieja)
+                self.evictions += 1
+
+    def invalidate(self, tabla: str, user_id: int):
+        """Descartar los listados de un usuario en una tabla (llamar después del commit)"""
+        with self._lock:
+            # Sólo importa si hay lecturas en curso; las que empiecen después ya leen lo nuevo
+            if (tabla, user_id) in self._cargando:
+                self._versiones[(tabla, user_id)] = self._versiones.get((tabla, user_id), 0) + 1
+            for entrada in self._claves_por_usuario.pop((tabla, user_id), set()):
+                cacheado = self._entries.pop(entrada, None)
+                if cacheado is not None:
+                    self.bytes -= cacheado[1]
+            self.invalidations += 1
+
+    def clear(self):
+        """Descartar todo (ej: después de un mantenimiento que toca muchos usuarios)"""
+        with self._lock:
+            self._epoch += 1
+            self._versiones.clear()
+            self._entries.clear()
+            self._claves_por_usuario.clear()
+            self.bytes = 0
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso de la caché"""
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / consultas if consultas else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,153 @@
+"""
+Tipos de fila de los modelos (dataclasses con __slots__)
+
+Reemplazan a dict(sqlite3.Row): una instancia con slots ocupa bastante menos
+memoria que un dict y se arma directo desde la tupla del cursor. Para no
+romper a quienes usaban los dicts, las filas aceptan fila['campo'],
+fila.get('campo') y dict(fila); to_dict() las prepara para json.dumps.
+
+Las fechas vienen como segundos epoch; to_dict() las pasa a texto en la hora
+de Buenos Aires (ver utils/fechas.py).
+"""
+import sqlite3
+from dataclasses import dataclass, fields
+from operator import attrgetter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..utils.fechas import formatear
+
+# Formato de las fechas en to_dict() (hora de Buenos Aires)
+FORMATO_FECHA_DICT = "%Y-%m-%d %H:%M"
+
+class _Fila:
+    """Comportamiento común: acceso tipo dict y conversión a dict"""
+    __slots__ = ()
+
+    # Campos que sólo traen algunas consultas (ej: búsqueda FTS, historial):
+    # to_dict() los omite cuando están en None
+    _EXTRAS: Tuple[str, ...] = ()
+
+    def __getitem__(self, campo: str) -> Any:
+        try:
+            return getattr(self, campo)
+        except AttributeError:
+            raise KeyError(campo) from None
+
+    def get(self, campo: str, default: Any = None) -> Any:
+        return getattr(self, campo, default)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.__slots__
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dict con los campos de la fila (para serializar a JSON)"""
+        fila = dict(zip(self.__slots__, self._valores(self)))
+        for campo in self._FECHAS:
+            if fila[campo] is not None:
+                fila[campo] = formatear(fila[campo], FORMATO_FECHA_DICT)
+        for campo in self._EXTRAS:
+            if fila[campo] is None:
+                del fila[campo]
+        return fila
+
+@dataclass(slots=True)
+class RecordatorioRow(_Fila):
+    id: int = None
+    contenido: str = None
+    fecha_recordatorio: int = None
+    prioridad: str = None
+    status: str = None
+    user_id: int = None
+    fecha_creacion: int = None
+    fecha_modificacion: int = None
+    fecha_notificacion: Optional[int] = None
+    fecha_archivado: Optional[int] = None
+
+    _EXTRAS = ("fecha_archivado",)
+
+@dataclass(slots=True)
+class TareaRow(_Fila):
+    id: int = None
+    contenido: str = None
+    prioridad: str = None
+    status: str = None
+    categoria: str = None
+    user_id: int = None
+    fecha_creacion: int = None
+    fecha_modificacion: int = None
+    relevancia: Optional[float] = None
+    fragmento: Optional[str] = None
+    fecha_archivado: Optional[int] = None
+
+    _EXTRAS = ("relevancia", "fragmento", "fecha_archivado")
+
+@dataclass(slots=True)
+class NotaRow(_Fila):
+    id: int = None
+    contenido: str = None
+    categoria: str = None
+    user_id: int = None
+    fecha_creacion: int = None
+    fecha_modificacion: int = None
+    relevancia: Optional[float] = None
+    fragmento: Optional[str] = None
+
+    _EXTRAS = ("relevancia", "fragmento")
+
+# Lector de todos los campos de una vez y campos de fecha, para to_dict()
+for _clase in (RecordatorioRow, TareaRow, NotaRow):
+    _clase._valores = attrgetter(*_clase.__slots__)
+    _clase._FECHAS = tuple(campo for campo in _clase.__slots__ if campo.startswith("fecha_"))
+
+def fabrica_filas(clase: type, conversiones: Optional[Dict[str, Callable[[Any], Any]]] = None):
+    """
+    Crear un row_factory que arma instancias de `clase`
+
+    El constructor se decide una vez por sentencia (según cursor.description)
+    y se reutiliza para todas sus filas: si las columnas coinciden con el
+    principio de la dataclass se pasa la tupla tal cual; si no, por nombre.
+
+    Args:
+        clase: Dataclass de la fila
+        conversiones: Funciones a aplicar a ciertas columnas (ej: prioridad
+            entera -> texto)
+    """
+    nombres = tuple(f.name for f in fields(clase))
+    conversiones = conversiones or {}
+    ultimo = [None]  # (cursor.description, constructor) de la última sentencia
+
+    def crear_constructor(description) -> Callable[[tuple], Any]:
+        columnas = tuple(d[0] for d in description)
+        convertir = [(i, conversiones[c]) for i, c in enumerate(columnas) if c in conversiones]
+
+        if columnas == nombres[:len(columnas)]:
+            if not convertir:
+                return lambda row: clase(*row)
+
+            def posicional(row):
+                valores = list(row)
+                for i, funcion in convertir:
+                    valores[i] = funcion(valores[i])
+                return clase(*valores)
+            return posicional
+
+        # Columnas en otro orden o que la dataclass no tiene (se ignoran)
+        indices = [(i, c) for i, c in enumerate(columnas) if c in nombres]
+
+        def por_nombre(row):
+            valores = {c: row[i] for i, c in indices}
+            for i, funcion in convertir:
+                valores[columnas[i]] = funcion(row[i])
+            return clase(**valores)
+        return por_nombre
+
+    def row_factory(cursor: sqlite3.Cursor, row: tuple):
+        description = cursor.description
+        actual = ultimo[0]
+        if actual is None or actual[0] is not description:
+            # Se reemplaza la tupla entera: otros hilos ven la vieja o la nueva
+            actual = (description, crear_constructor(description))
+            ultimo[0] = actual
+        return actual[1](row)
+
+    return row_factory
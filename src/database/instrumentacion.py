@@ -0,0 +1,159 @@
+"""
+Medición de las consultas SQL: tiempos por sentencia y log de consultas lentas
+
+Con instrumentación, las conexiones del motor son ConexionInstrumentada
+(factory de sqlite3.connect): cada execute/executemany se mide y se suma a
+las estadísticas de su sentencia normalizada (literales y listas de ? se
+reemplazan, así "IN (?, ?)" e "IN (?, ?, ?)" cuentan juntas). Las que pasan
+el umbral se registran con la marca consulta_lenta (ver bot_logger, que las
+manda a logs/slow_queries.log).
+
+Se mide el execute: el primer paso de la sentencia, que en SQLite incluye el
+trabajo de ordenar o agrupar. Las filas que se leen después con fetchall no
+entran en la medición.
+
+No usa set_trace_callback: la conexión admite uno solo y queda libre para
+quien lo necesite (ej: test_migraciones captura las sentencias con él).
+"""
+import functools
+import math
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from loguru import logger
+
+DEFAULT_UMBRAL_LENTO_MS = 100.0
+
+# Duraciones que se guardan por sentencia para los percentiles
+DEFAULT_MUESTRAS = 1024
+
+_LITERAL_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_LITERAL_NUMERO = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_LISTA_MARCAS = re.compile(r"\(\?(?:, \?)+\)")
+_GRUPOS_REPETIDOS = re.compile(r"(\(\?, \.\.\.\))(?:, \(\?, \.\.\.\))+")
+
+@functools.lru_cache(maxsize=1024)
+def normalizar(sql: str) -> str:
+    """
+    Forma común de una sentencia para agrupar sus mediciones
+
+    Ej: "SELECT * FROM tareas WHERE id IN (?, ?, ?) LIMIT 10" queda
+    "SELECT * FROM tareas WHERE id IN (?, ...) LIMIT ?"
+    """
+    sql = " ".join(sql.split())
+    sql = _LITERAL_TEXTO.sub("?", sql)
+    sql = _LITERAL_NUMERO.sub("?", sql)
+    sql = re.sub(r"\s*,\s*", ", ", sql)
+    sql = re.sub(r"\(\s+", "(", re.sub(r"\s+\)", ")", sql))
+    sql = _LISTA_MARCAS.sub("(?, ...)", sql)
+    return _GRUPOS_REPETIDOS.sub(r"\1, ...", sql)
+
+def percentil(ordenados: List[float], p: float) -> float:
+    """Percentil p (0-100) por rango más cercano"""
+    rango = math.ceil(p / 100 * len(ordenados))
+    return ordenados[min(max(rango, 1), len(ordenados)) - 1]
+
+class _Sentencia:
+    __slots__ = ("cantidad", "total", "maximo", "muestras")
+
+    def __init__(self, muestras: int):
+        self.cantidad = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.muestras: Deque[float] = deque(maxlen=muestras)
+
+class EstadisticasSQL:
+    """Cantidad, tiempo total y percentiles de cada sentencia normalizada"""
+
+    def __init__(self, umbral_lento_ms: Optional[float] = DEFAULT_UMBRAL_LENTO_MS,
+                 muestras: int = DEFAULT_MUESTRAS):
+        """
+        Args:
+            umbral_lento_ms: Desde cuántos milisegundos una consulta se registra
+                como lenta (None: no registrar ninguna)
+            muestras: Últimas duraciones que se guardan por sentencia para
+                calcular p50/p95/p99
+        """
+        self.umbral_lento_ms = umbral_lento_ms
+        self._muestras = muestras
+        self._sentencias: Dict[str, _Sentencia] = {}
+        self._lock = threading.Lock()
+        self.lentas = 0
+
+    def registrar(self, sql: str, segundos: float):
+        """Sumar una ejecución de `sql` que tardó `segundos`"""
+        normalizada = normalizar(sql)
+        ms = segundos * 1000
+        lenta = self.umbral_lento_ms is not None and ms >= self.umbral_lento_ms
+        with self._lock:
+            sentencia = self._sentencias.get(normalizada)
+            if sentencia is None:
+                sentencia = self._sentencias[normalizada] = _Sentencia(self._muestras)
+            sentencia.cantidad += 1
+            sentencia.total += segundos
+            sentencia.muestras.append(segundos)
+            if segundos > sentencia.maximo:
+                sentencia.maximo = segundos
+            if lenta:
+                self.lentas += 1
+
+        if lenta:
+            logger.bind(consulta_lenta=True).warning(f"Consulta lenta ({ms:.1f} ms): {normalizada}")
+
+    def resumen(self, limite: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Sentencias ordenadas por tiempo total (las que más pesan primero)
+
+        Returns:
+            Dicts con sentencia, cantidad, total_ms, p50_ms, p95_ms, p99_ms y max_ms
+        """
+        with self._lock:
+            copia = [(sql, s.cantidad, s.total, s.maximo, sorted(s.muestras))
+                     for sql, s in self._sentencias.items()]
+
+        filas = [{
+            "sentencia": sql,
+            "cantidad": cantidad,
+            "total_ms": total * 1000,
+            "p50_ms": percentil(muestras, 50) * 1000,
+            "p95_ms": percentil(muestras, 95) * 1000,
+            "p99_ms": percentil(muestras, 99) * 1000,
+            "max_ms": maximo * 1000,
+        } for sql, cantidad, total, maximo, muestras in copia]
+        filas.sort(key=lambda fila: fila["total_ms"], reverse=True)
+        return filas[:limite] if limite is not None else filas
+
+    def reiniciar(self):
+        """Descartar lo medido hasta ahora"""
+        with self._lock:
+            self._sentencias.clear()
+            self.lentas = 0
+
+class ConexionInstrumentada(sqlite3.Connection):
+    """Conexión que mide sus execute y executemany (factory de sqlite3.connect)"""
+
+    # Se asigna al preparar la conexión; sin estadísticas no mide nada
+    estadisticas: Optional[EstadisticasSQL] = None
+
+    def execute(self, sql: str, parametros: Any = (), /) -> sqlite3.Cursor:
+        estadisticas = self.estadisticas
+        if estadisticas is None:
+            return super().execute(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            estadisticas.registrar(sql, time.perf_counter() - inicio)
+
+    def executemany(self, sql: str, parametros: Any, /) -> sqlite3.Cursor:
+        estadisticas = self.estadisticas
+        if estadisticas is None:
+            return super().executemany(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            estadisticas.registrar(sql, time.perf_counter() - inicio)
@@ -0,0 +1,107 @@
+"""
+Mantenimiento de la base de datos: archivado de filas finalizadas, borrado de
+conversaciones viejas y compactación
+"""
+from typing import Dict
+from loguru import logger
+
+from .migrations import ARCHIVE_TABLES
+from .models import Database
+from ..utils.fechas import ahora_epoch
+
+# Días que una fila completada o cancelada queda en la tabla principal
+DEFAULT_DIAS_ARCHIVO = 30
+
+# Días que se guardan los mensajes de las conversaciones con la IA
+DEFAULT_DIAS_CONVERSACION = 30
+
+def archivar_finalizados(db: Database, dias: int = DEFAULT_DIAS_ARCHIVO) -> Dict[str, int]:
+    """
+    Mover a las tablas de archivo los recordatorios y tareas finalizados
+
+    Una fila se archiva si está completada o cancelada y no se modificó en
+    los últimos `dias` días. Todo corre en una sola transacción: una fila
+    nunca queda en las dos tablas ni en ninguna.
+
+    Args:
+        db: Base de datos
+        dias: Antigüedad mínima (según fecha_modificacion)
+
+    Returns:
+        Cantidad de filas archivadas por tabla
+    """
+    archivadas = {}
+
+    # Un único corte para el INSERT y el DELETE (fechas en segundos epoch)
+    ahora = ahora_epoch()
+    corte = ahora - int(dias) * 86400
+
+    with db.transaction() as conn:
+        for tabla in ARCHIVE_TABLES:
+            condicion = "status IN ('completado', 'cancelado') AND fecha_modificacion < ?"
+            conn.execute(f"""
+                INSERT INTO {tabla}_archivo
+                SELECT *, ? FROM {tabla} WHERE {condicion}
+            """, (ahora, corte))
+
+            cursor = conn.execute(f"DELETE FROM {tabla} WHERE {condicion}", (corte,))
+            archivadas[tabla] = cursor.rowcount
+
+    if any(archivadas.values()):
+        # Afecta a muchos usuarios a la vez: más simple descartar toda la caché
+        db.cache.clear()
+        logger.info(f"Filas archivadas: {archivadas}")
+
+    return archivadas
+
+def borrar_conversaciones_viejas(db: Database, dias: int = DEFAULT_DIAS_CONVERSACION) -> int:
+    """
+    Borrar los mensajes de conversación de más de `dias` días
+
+    Al bot sólo le sirven los últimos mensajes de cada usuario; sin esto la
+    tabla (que sólo crece) guardaría todas las conversaciones.
+
+    Returns:
+        Cantidad de mensajes borrados
+    """
+    corte = ahora_epoch() - int(dias) * 86400
+    with db.transaction() as conn:
+        borrados = conn.execute("DELETE FROM mensajes_conversacion WHERE fecha_creacion < ?",
+                                (corte,)).rowcount
+
+    if borrados:
+        logger.info(f"Mensajes de conversación borrados: {borrados}")
+    return borrados
+
+def compactar(db: Database, vacuum: bool = True):
+    """
+    Actualizar estadísticas del planificador y recuperar el espacio libre
+
+    VACUUM reescribe el archivo completo y necesita el lock exclusivo, así
+    que conviene correrlo en horarios sin uso. Sin vacuum=True sólo se
+    corre ANALYZE.
+    """
+    with db.connection() as conn:
+        conn.execute("ANALYZE")
+
+        if vacuum:
+            # La copia temporal de VACUUM va a disco y no a memoria (temp_store=MEMORY)
+            conn.execute("PRAGMA temp_store = FILE")
+            try:
+                conn.execute("VACUUM")
+            finally:
+                conn.execute(f"PRAGMA temp_store = {db.PRAGMAS['temp_store']}")
+
+            # Achicar también el archivo -wal, que VACUUM deja del tamaño de la base
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    logger.info(f"Base de datos compactada (vacuum={vacuum})")
+
+def ejecutar_mantenimiento(db: Database, dias: int = DEFAULT_DIAS_ARCHIVO,
+                           vacuum: bool = True,
+                           dias_conversacion: int = DEFAULT_DIAS_CONVERSACION) -> Dict[str, int]:
+    """Archivar las filas finalizadas viejas, borrar conversaciones viejas y compactar la base"""
+    archivadas = archivar_finalizados(db, dias)
+    borrar_conversaciones_viejas(db, dias_conversacion)
+    compactar(db, vacuum=vacuum)
+    return archivadas
@@ -0,0 +1,566 @@
+"""
+Migraciones versionadas del esquema de la base de datos
+
+Cada migración tiene un número de versión y se aplica una sola vez. La
+tabla schema_version registra cuáles ya corrieron, así el esquema puede
+evolucionar (índices nuevos, columnas, tablas) sin recrear la base.
+"""
+import re
+import sqlite3
+from typing import Callable, List, Tuple
+from loguru import logger
+
+from ..utils.fechas import a_epoch, utc_a_epoch
+
+# Tablas con índice de texto completo (FTS5) sobre la columna contenido
+FTS_TABLES = ("notas", "tareas")
+
+# Tablas cuyas filas finalizadas se mueven a {tabla}_archivo
+ARCHIVE_TABLES = ("recordatorios", "tareas")
+
+# Valor por defecto de las columnas fecha_*: segundos epoch (UTC)
+EPOCH_AHORA = "(CAST(strftime('%s', 'now') AS INTEGER))"
+
+# Migraciones registradas: (versión, descripción, función)
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = []
+
+def migracion(version: int, descripcion: str):
+    """Registrar una función como migración del esquema"""
+    def decorator(func: Callable[[sqlite3.Connection], None]):
+        MIGRATIONS.append((version, descripcion, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+    return decorator
+
+@migracion(1, "Tablas de recordatorios, tareas y notas")
+def _esquema_inicial(conn: sqlite3.Connection):
+    """Esquema original (IF NOT EXISTS: las bases anteriores a schema_version ya lo tienen)"""
+    # Tabla de recordatorios
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS recordatorios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            contenido TEXT NOT NULL,
+            fecha_recordatorio DATETIME NOT NULL,
+            prioridad TEXT DEFAULT 'media' CHECK (prioridad IN ('alta', 'media', 'baja')),
+            status TEXT DEFAULT 'pendiente' CHECK (status IN ('pendiente', 'completado', 'cancelado')),
+            user_id INTEGER NOT NULL,
+            fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Índices para mejorar performance
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_recordatorios_user_id 
+        ON recordatorios(user_id)
+    """)
+    
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_recordatorios_fecha 
+        ON recordatorios(fecha_recordatorio)
+    """)
+    
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_recordatorios_status 
+        ON recordatorios(status)
+    """)
+    
+    # Tabla de tareas (para TO-DOs sin fecha específica)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tareas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            contenido TEXT NOT NULL,
+            prioridad TEXT DEFAULT 'media' CHECK (prioridad IN ('alta', 'media', 'baja')),
+            status TEXT DEFAULT 'pendiente' CHECK (status IN ('pendiente', 'completado', 'cancelado')),
+            categoria TEXT DEFAULT 'general',
+            user_id INTEGER NOT NULL,
+            fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Índices para tareas
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tareas_user_id 
+        ON tareas(user_id)
+    """)
+    
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tareas_status 
+        ON tareas(status)
+    """)
+    
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tareas_categoria 
+        ON tareas(categoria)
+    """)
+    
+    # Tabla de notas (para anotaciones sueltas)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS notas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            contenido TEXT NOT NULL,
+            categoria TEXT DEFAULT 'general',
+            user_id INTEGER NOT NULL,
+            fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+            fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # Índices para notas
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notas_user_id 
+        ON notas(user_id)
+    """)
+    
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notas_categoria 
+        ON notas(categoria)
+    """)
+
+@migracion(2, "Índices de texto completo (FTS5) para notas y tareas")
+def _indices_fts(conn: sqlite3.Connection):
+    """
+    Crear las tablas FTS5 de notas y tareas y los triggers que las sincronizan
+    
+    Son tablas de contenido externo: guardan sólo el índice y leen el texto
+    de la tabla original. El tokenizer ignora mayúsculas y acentos, así
+    "medico" encuentra "Médico". Si el SQLite no trae FTS5 la migración no
+    crea nada y las búsquedas siguen usando LIKE.
+    """
+    for tabla in FTS_TABLES:
+        fts = f"{tabla}_fts"
+        existe = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+        ).fetchone()
+        
+        try:
+            conn.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    contenido,
+                    user_id,
+                    content='{tabla}',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 no disponible, las búsquedas usarán LIKE: {e}")
+            return
+        
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN
+                INSERT INTO {fts}(rowid, contenido, user_id)
+                VALUES (new.id, new.contenido, new.user_id);
+            END
+        """)
+        
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN
+                INSERT INTO {fts}({fts}, rowid, contenido, user_id)
+                VALUES ('delete', old.id, old.contenido, old.user_id);
+            END
+        """)
+        
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF contenido, user_id ON {tabla} BEGIN
+                INSERT INTO {fts}({fts}, rowid, contenido, user_id)
+                VALUES ('delete', old.id, old.contenido, old.user_id);
+                INSERT INTO {fts}(rowid, contenido, user_id)
+                VALUES (new.id, new.contenido, new.user_id);
+            END
+        """)
+        
+        # Indexar las filas que ya existían antes de crear la tabla FTS
+        if not existe:
+            conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            logger.info(f"Índice de texto completo {fts} creado")
+
+@migracion(3, "Índices compuestos y parciales para las consultas por usuario")
+def _indices_compuestos(conn: sqlite3.Connection):
+    # Los índices de una sola columna no sirven para "user_id = ? AND status = ?
+    # ORDER BY ...": los reemplazan índices compuestos en el orden de las consultas
+    for indice in ("idx_recordatorios_user_id", "idx_recordatorios_status", "idx_recordatorios_fecha",
+                   "idx_tareas_user_id", "idx_tareas_status", "idx_tareas_categoria",
+                   "idx_notas_user_id", "idx_notas_categoria"):
+        conn.execute(f"DROP INDEX IF EXISTS {indice}")
+    
+    # Recordatorio.listar_por_usuario
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_recordatorios_user_status_fecha 
+        ON recordatorios(user_id, status, fecha_recordatorio)
+    """)
+    
+    # Recordatorio.obtener_pendientes_hasta: sólo indexa los pendientes
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_recordatorios_pendientes_fecha 
+        ON recordatorios(fecha_recordatorio)
+        WHERE status = 'pendiente'
+    """)
+    
+    # Tarea.listar_por_usuario (ORDER BY prioridad DESC, fecha_creacion ASC)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tareas_user_status_prioridad 
+        ON tareas(user_id, status, prioridad DESC, fecha_creacion)
+    """)
+    
+    # Tarea.completar_multiples: pendientes del usuario por antigüedad
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tareas_pendientes_user_fecha 
+        ON tareas(user_id, fecha_creacion)
+        WHERE status = 'pendiente'
+    """)
+    
+    # Nota.listar_por_usuario, con y sin categoría
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notas_user_fecha 
+        ON notas(user_id, fecha_creacion)
+    """)
+    
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notas_user_categoria_fecha 
+        ON notas(user_id, categoria, fecha_creacion)
+    """)
+
+@migracion(4, "Tablas de archivo para recordatorios y tareas finalizados")
+def _tablas_archivo(conn: sqlite3.Connection):
+    """
+    Crear las tablas de archivo
+    
+    Tienen las mismas columnas que la tabla original y en el mismo orden,
+    más fecha_archivado al final, así el archivado es un INSERT ... SELECT *.
+    El id se conserva (sin AUTOINCREMENT) para poder referenciar la fila.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS recordatorios_archivo (
+            id INTEGER PRIMARY KEY,
+            contenido TEXT NOT NULL,
+            fecha_recordatorio DATETIME NOT NULL,
+            prioridad TEXT,
+            status TEXT,
+            user_id INTEGER NOT NULL,
+            fecha_creacion DATETIME,
+            fecha_modificacion DATETIME,
+            fecha_archivado DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tareas_archivo (
+            id INTEGER PRIMARY KEY,
+            contenido TEXT NOT NULL,
+            prioridad TEXT,
+            status TEXT,
+            categoria TEXT,
+            user_id INTEGER NOT NULL,
+            fecha_creacion DATETIME,
+            fecha_modificacion DATETIME,
+            fecha_archivado DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    for tabla in ARCHIVE_TABLES:
+        # Historial del usuario, del más reciente al más viejo
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{tabla}_archivo_user_fecha 
+            ON {tabla}_archivo(user_id, fecha_modificacion)
+        """)
+        
+        # El job de archivado busca sólo las finalizadas por fecha
+        conn.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{tabla}_finalizadas_fecha 
+            ON {tabla}(fecha_modificacion)
+            WHERE status IN ('completado', 'cancelado')
+        """)
+
+def _reconstruir_tabla(conn: sqlite3.Connection, tabla: str, columnas_sql: str, select_sql: str):
+    """
+    Cambiar la definición de una tabla copiando sus filas a una nueva
+    
+    SQLite no permite cambiar el tipo de una columna con ALTER TABLE: se crea
+    la tabla nueva, se copian las filas, se borra la vieja y se renombra.
+    Los índices y triggers de la tabla se recrean con su SQL original.
+    
+    Args:
+        conn: Conexión (dentro de la transacción de la migración)
+        tabla: Tabla a reconstruir
+        columnas_sql: Definición de columnas de la tabla nueva
+        select_sql: SELECT sobre la tabla vieja que produce las filas nuevas
+    """
+    dependientes = [fila[0] for fila in conn.execute("""
+        SELECT sql FROM sqlite_master 
+        WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL
+    """, (tabla,))]
+    
+    # Con AUTOINCREMENT hay que conservar el último ID entregado: si no, se
+    # reusarían los IDs de filas borradas o archivadas
+    secuencia = None
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+        fila = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (tabla,)).fetchone()
+        secuencia = fila[0] if fila else None
+    
+    conn.execute(f"CREATE TABLE {tabla}_nueva ({columnas_sql})")
+    conn.execute(f"INSERT INTO {tabla}_nueva {select_sql}")
+    conn.execute(f"DROP TABLE {tabla}")
+    conn.execute(f"ALTER TABLE {tabla}_nueva RENAME TO {tabla}")
+    
+    if secuencia is not None:
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (tabla,))
+        conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (tabla, secuencia))
+    
+    for sql in dependientes:
+        conn.execute(sql)
+
+@migracion(5, "Prioridad de tareas como entero (3 alta, 2 media, 1 baja)")
+def _prioridad_entera(conn: sqlite3.Connection):
+    # Como texto, "prioridad DESC" ordena media > baja > alta; como entero
+    # el índice (user_id, status, prioridad DESC, fecha_creacion) da el orden real
+    prioridad_entera = """
+        CASE prioridad WHEN 'alta' THEN 3 WHEN 'baja' THEN 1 ELSE 2 END
+    """
+    
+    _reconstruir_tabla(conn, "tareas", """
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        contenido TEXT NOT NULL,
+        prioridad INTEGER NOT NULL DEFAULT 2 CHECK (prioridad IN (1, 2, 3)),
+        status TEXT DEFAULT 'pendiente' CHECK (status IN ('pendiente', 'completado', 'cancelado')),
+        categoria TEXT DEFAULT 'general',
+        user_id INTEGER NOT NULL,
+        fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
+        fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP
+    """, f"""
+        SELECT id, contenido, {prioridad_entera}, status, categoria, user_id,
+               fecha_creacion, fecha_modificacion
+        FROM tareas
+    """)
+    
+    _reconstruir_tabla(conn, "tareas_archivo", """
+        id INTEGER PRIMARY KEY,
+        contenido TEXT NOT NULL,
+        prioridad INTEGER,
+        status TEXT,
+        categoria TEXT,
+        user_id INTEGER NOT NULL,
+        fecha_creacion DATETIME,
+        fecha_modificacion DATETIME,
+        fecha_archivado DATETIME DEFAULT CURRENT_TIMESTAMP
+    """, f"""
+        SELECT id, contenido, {prioridad_entera}, status, categoria, user_id,
+               fecha_creacion, fecha_modificacion, fecha_archivado
+        FROM tareas_archivo
+    """)
+
+@migracion(6, "Fecha de notificación de los recordatorios")
+def _fecha_notificacion(conn: sqlite3.Connection):
+    # Cuándo el despachador entregó el recordatorio (NULL: todavía no)
+    conn.execute("ALTER TABLE recordatorios ADD COLUMN fecha_notificacion DATETIME")
+    
+    # En el archivo va antes de fecha_archivado, para que el archivado
+    # siga siendo un INSERT ... SELECT *
+    _reconstruir_tabla(conn, "recordatorios_archivo", """
+        id INTEGER PRIMARY KEY,
+        contenido TEXT NOT NULL,
+        fecha_recordatorio DATETIME NOT NULL,
+        prioridad TEXT,
+        status TEXT,
+        user_id INTEGER NOT NULL,
+        fecha_creacion DATETIME,
+        fecha_modificacion DATETIME,
+        fecha_notificacion DATETIME,
+        fecha_archivado DATETIME DEFAULT CURRENT_TIMESTAMP
+    """, """
+        SELECT id, contenido, fecha_recordatorio, prioridad, status, user_id,
+               fecha_creacion, fecha_modificacion, NULL, fecha_archivado
+        FROM recordatorios_archivo
+    """)
+    
+    # Recordatorio.obtener_pendientes_hasta(sin_notificar=True): lo que el
+    # despachador tiene que entregar
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_recordatorios_por_notificar 
+        ON recordatorios(fecha_recordatorio)
+        WHERE status = 'pendiente' AND fecha_notificacion IS NULL
+    """)
+
+@migracion(7, "Fechas como segundos epoch (UTC)")
+def _fechas_epoch(conn: sqlite3.Connection):
+    """
+    Pasar todas las columnas fecha_* a INTEGER con segundos epoch en UTC
+    
+    Antes convivían dos formatos de texto: fecha_recordatorio la escribía el
+    adaptador de datetime de Python (hora local de Buenos Aires, a veces con
+    microsegundos) y las demás salían de CURRENT_TIMESTAMP (UTC). Comparar
+    esos textos entre sí daba rangos y órdenes incorrectos.
+    """
+    # Texto local de Buenos Aires (fecha_recordatorio) o UTC (CURRENT_TIMESTAMP)
+    conn.create_function("local_a_epoch", 1, a_epoch)
+    conn.create_function("utc_a_epoch", 1,
+                         lambda valor: valor if isinstance(valor, int) else utc_a_epoch(valor))
+    
+    _reconstruir_tabla(conn, "recordatorios", f"""
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        contenido TEXT NOT NULL,
+        fecha_recordatorio INTEGER NOT NULL,
+        prioridad TEXT DEFAULT 'media' CHECK (prioridad IN ('alta', 'media', 'baja')),
+        status TEXT DEFAULT 'pendiente' CHECK (status IN ('pendiente', 'completado', 'cancelado')),
+        user_id INTEGER NOT NULL,
+        fecha_creacion INTEGER DEFAULT {EPOCH_AHORA},
+        fecha_modificacion INTEGER DEFAULT {EPOCH_AHORA},
+        fecha_notificacion INTEGER
+    """, """
+        SELECT id, contenido, local_a_epoch(fecha_recordatorio), prioridad, status, user_id,
+               utc_a_epoch(fecha_creacion), utc_a_epoch(fecha_modificacion),
+               utc_a_epoch(fecha_notificacion)
+        FROM recordatorios
+    """)
+    
+    _reconstruir_tabla(conn, "recordatorios_archivo", f"""
+        id INTEGER PRIMARY KEY,
+        contenido TEXT NOT NULL,
+        fecha_recordatorio INTEGER NOT NULL,
+        prioridad TEXT,
+        status TEXT,
+        user_id INTEGER NOT NULL,
+        fecha_creacion INTEGER,
+        fecha_modificacion INTEGER,
+        fecha_notificacion INTEGER,
+        fecha_archivado INTEGER DEFAULT {EPOCH_AHORA}
+    """, """
+        SELECT id, contenido, local_a_epoch(fecha_recordatorio), prioridad, status, user_id,
+               utc_a_epoch(fecha_creacion), utc_a_epoch(fecha_modificacion),
+               utc_a_epoch(fecha_notificacion), utc_a_epoch(fecha_archivado)
+        FROM recordatorios_archivo
+    """)
+    
+    _reconstruir_tabla(conn, "tareas", f"""
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        contenido TEXT NOT NULL,
+        prioridad INTEGER NOT NULL DEFAULT 2 CHECK (prioridad IN (1, 2, 3)),
+        status TEXT DEFAULT 'pendiente' CHECK (status IN ('pendiente', 'completado', 'cancelado')),
+        categoria TEXT DEFAULT 'general',
+        user_id INTEGER NOT NULL,
+        fecha_creacion INTEGER DEFAULT {EPOCH_AHORA},
+        fecha_modificacion INTEGER DEFAULT {EPOCH_AHORA}
+    """, """
+        SELECT id, contenido, prioridad, status, categoria, user_id,
+               utc_a_epoch(fecha_creacion), utc_a_epoch(fecha_modificacion)
+        FROM tareas
+    """)
+    
+    _reconstruir_tabla(conn, "tareas_archivo", f"""
+        id INTEGER PRIMARY KEY,
+        contenido TEXT NOT NULL,
+        prioridad INTEGER,
+        status TEXT,
+        categoria TEXT,
+        user_id INTEGER NOT NULL,
+        fecha_creacion INTEGER,
+        fecha_modificacion INTEGER,
+        fecha_archivado INTEGER DEFAULT {EPOCH_AHORA}
+    """, """
+        SELECT id, contenido, prioridad, status, categoria, user_id,
+               utc_a_epoch(fecha_creacion), utc_a_epoch(fecha_modificacion),
+               utc_a_epoch(fecha_archivado)
+        FROM tareas_archivo
+    """)
+    
+    _reconstruir_tabla(conn, "notas", f"""
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        contenido TEXT NOT NULL,
+        categoria TEXT DEFAULT 'general',
+        user_id INTEGER NOT NULL,
+        fecha_creacion INTEGER DEFAULT {EPOCH_AHORA},
+        fecha_modificacion INTEGER DEFAULT {EPOCH_AHORA}
+    """, """
+        SELECT id, contenido, categoria, user_id,
+               utc_a_epoch(fecha_creacion), utc_a_epoch(fecha_modificacion)
+        FROM notas
+    """)
+
+@migracion(8, "Mensajes de las conversaciones con la IA")
+def _mensajes_conversacion(conn: sqlite3.Connection):
+    # Sólo se agregan filas (el mensaje de system no se guarda: es el prompt
+    # vigente al cargar la conversación). tool_calls va como JSON
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS mensajes_conversacion (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            rol TEXT NOT NULL CHECK (rol IN ('user', 'assistant', 'tool')),
+            contenido TEXT,
+            tool_calls TEXT,
+            tool_call_id TEXT,
+            fecha_creacion INTEGER DEFAULT {EPOCH_AHORA}
+        )
+    """)
+
+    # MensajeConversacion.ultimos: los últimos N del usuario
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mensajes_conversacion_user_id
+        ON mensajes_conversacion(user_id, id)
+    """)
+
+    # Mantenimiento: borrar los mensajes viejos
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_mensajes_conversacion_fecha
+        ON mensajes_conversacion(fecha_creacion)
+    """)
+
+def version_actual(conn: sqlite3.Connection) -> int:
+    """Última versión de esquema aplicada (0 si la base es nueva)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT NOT NULL,
+            fecha_aplicada DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+def run_migrations(conn: sqlite3.Connection) -> int:
+    """
+    Aplicar las migraciones pendientes
+    
+    Debe correr dentro de una transacción de escritura, así una migración
+    que falla no deja el esquema a medias. Si se aplicó alguna, se corre
+    ANALYZE para que el planificador tenga estadísticas de los índices nuevos.
+    
+    Returns:
+        Cantidad de migraciones aplicadas
+    """
+    actual = version_actual(conn)
+    pendientes = [m for m in MIGRATIONS if m[0] > actual]
+    
+    for version, descripcion, func in pendientes:
+        logger.info(f"Aplicando migración {version}: {descripcion}")
+        func(conn)
+        conn.execute("""
+            INSERT INTO schema_version (version, descripcion) VALUES (?, ?)
+        """, (version, descripcion))
+    
+    if pendientes:
+        conn.execute("ANALYZE")
+        logger.info(f"Esquema actualizado a la versión {pendientes[-1][0]}")
+    
+    return len(pendientes)
+
+def planes_sin_indice(conn: sqlite3.Connection, sentencias: List[str]) -> List[Tuple[str, str]]:
+    """
+    Revisar con EXPLAIN QUERY PLAN qué sentencias recorren una tabla entera
+    
+    Args:
+        conn: Conexión a la base
+        sentencias: SQL con los parámetros ya expandidos (ej: capturado con
+            set_trace_callback)
+    
+    Returns:
+        Lista de (sentencia, paso del plan) para cada SCAN sin índice
+    """
+    escaneos = []
+    for sql in sentencias:
+        for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+            detalle = fila[3]
+            # "SCAN tareas" es un recorrido completo; "SCAN tareas USING INDEX ..."
+            # o "SCAN notas_fts VIRTUAL TABLE INDEX ..." usan un índice
+            if re.match(r"SCAN \w+$", detalle):
+                escaneos.append((sql, detalle))
+    return escaneos
@@ -1,248 +1,834 @@
 """
 Modelos de base de datos para Nelida Assistant
+
+La base global no se crea al importar: se crea la primera vez que un modelo
+la usa (obtener_database) y se puede reemplazar por otra, ej: una base en
+memoria para tests y benchmarks (configurar_database / usar_database).
 """
 import sqlite3
 import os
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import functools
+import json
+import heapq
+import re
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Dict, Any, Sequence, Tuple, Callable, Iterator, TypeVar
 from loguru import logger
 
+from .cache import ReadCache
+from .filas import RecordatorioRow, TareaRow, NotaRow, fabrica_filas
+from .instrumentacion import EstadisticasSQL, ConexionInstrumentada, DEFAULT_UMBRAL_LENTO_MS
+from .migrations import run_migrations
+from .motores import StorageEngine, SQLiteEngine, crear_motor
+from .unidad_trabajo import unidad_actual
+from ..utils.config import Config
+from ..utils.fechas import Fecha, a_epoch, ahora_epoch
+
+T = TypeVar("T")
+
 class Database:
     """Manejo de la base de datos SQLite"""
     
-    def __init__(self, db_path: str = "data/nelida.db"):
-        self.db_path = db_path
+    # PRAGMAs aplicados a cada conexión nueva
+    PRAGMAS = {
+        "journal_mode": "WAL",          # lecturas concurrentes mientras hay una escritura
+        "synchronous": "NORMAL",        # en WAL es seguro y evita un fsync por commit
+        "busy_timeout": 5000,           # esperar al writer en vez de fallar con "database is locked"
+        "cache_size": -8000,            # ~8 MB de caché de páginas por conexión
+        "mmap_size": 64 * 1024 * 1024,  # lecturas vía mmap (64 MB)
+        "temp_store": "MEMORY",
+    }
+    
+    def __init__(self, db_path: str = "data/nelida.db", 
+                 cache_max_bytes: int = ReadCache.DEFAULT_MAX_BYTES,
+                 write_behind: bool = False, grupo_max_ops: int = 64, 
+                 grupo_max_ms: float = 0.0, url: Optional[str] = None,
+                 estadisticas: Optional[EstadisticasSQL] = None, **opciones_pool):
+        """
+        Args:
+            db_path: Ruta del archivo SQLite (si no se pasa `url`)
+            cache_max_bytes: Tope de memoria de la caché de listados
+            write_behind: Encolar las escrituras y confirmarlas en grupo desde
+                un hilo escritor (un commit por grupo en vez de uno por escritura)
+            grupo_max_ops: Máximo de escrituras por commit en modo write-behind
+            grupo_max_ms: Cuánto espera el escritor a que lleguen más
+                escrituras antes de confirmar el grupo. Con 0 confirma lo que
+                se juntó en la cola mientras hacía el commit anterior; una
+                espera sólo conviene si el fsync es lento y hay muchos escritores
+            url: URL de la base (ej: Config.DATABASE_URL). Elige el motor:
+                `sqlite:///ruta` usa sqlite3 directo y otras URLs (ej:
+                `sqlite+pysqlite:///ruta`, `sqlite://`) el pool de SQLAlchemy
+            estadisticas: Medir las consultas (tiempos por sentencia y log de
+                las lentas, ver instrumentacion.py); se puede compartir entre bases
+            opciones_pool: pool_size, max_overflow y pool_timeout del motor
+                SQLAlchemy
+        """
+        self.estadisticas = estadisticas
+        # Sin estadísticas, conexiones comunes: ni el costo de la clase instrumentada
+        factory = ConexionInstrumentada if estadisticas is not None else sqlite3.Connection
+        if url is not None:
+            self.engine: StorageEngine = crear_motor(url, self._preparar_conexion, factory, 
+                                                     **opciones_pool)
+        else:
+            self.engine = SQLiteEngine(db_path, self._preparar_conexion, factory)
+        # None si la base no vive en un archivo (ej: SQLite en memoria)
+        self.db_path = self.engine.path
+        self.fts_enabled = False
+        # Listados por usuario cacheados; se invalidan cuando el usuario escribe
+        self.cache = ReadCache(cache_max_bytes)
+        self._invalidaciones: Dict[int, set] = {}
+        # Con sqlite3 directo, una conexión de larga vida por hilo, indexada
+        # por ident del hilo; con un pool, la prestada al hilo mientras dura
+        # una lectura o una transacción (ver _conexion_del_hilo)
+        self._connections: Dict[int, sqlite3.Connection] = {}
+        self._prestada = threading.local()
+        self._lock = threading.Lock()
         self.ensure_data_directory()
         self.init_database()
+        
+        self.grupo_max_ops = grupo_max_ops
+        self.grupo_max_ms = grupo_max_ms
+        self._cola_escrituras: "queue.Queue[Optional[Tuple[Callable, Future]]]" = queue.Queue()
+        self._escritor: Optional[threading.Thread] = None
+        self.grupos_confirmados = 0
+        self.escrituras_confirmadas = 0
+        if write_behind:
+            self._escritor = threading.Thread(target=self._bucle_escritor, 
+                                              name="db-escritor", daemon=True)
+            self._escritor.start()
     
     def ensure_data_directory(self):
         """Crear directorio data si no existe"""
+        if self.db_path is None:
+            return
         data_dir = os.path.dirname(self.db_path)
         if data_dir and not os.path.exists(data_dir):
             os.makedirs(data_dir)
             logger.info(f"Directorio {data_dir} creado")
     
-    def get_connection(self):
-        """Obtener conexión a la base de datos"""
-        conn = sqlite3.connect(self.db_path)
+    def _preparar_conexion(self, conn: sqlite3.Connection):
+        """Configurar una conexión nueva del motor con los PRAGMAs"""
         conn.row_factory = sqlite3.Row  # Para acceso por nombre de columna
+        if self.estadisticas is not None:
+            conn.estadisticas = self.estadisticas
+        for pragma, valor in self.PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma} = {valor}")
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Pedirle al motor una conexión (se devuelve con _release)"""
+        return self.engine.connect()
+    
+    def _release(self, conn: sqlite3.Connection):
+        """Devolver al motor una conexión obtenida con _connect"""
+        self.engine.release(conn)
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """
+        Obtener la conexión del hilo actual
+        
+        Con sqlite3 directo la conexión se abre la primera vez que el hilo la
+        pide y se reutiliza en las siguientes llamadas. No hay que cerrarla:
+        se cierran todas juntas en close().
+        
+        Con un pool es la que el hilo tiene prestada dentro de connection() o
+        transaction(); fuera de ellas no hay una.
+        
+        Raises:
+            RuntimeError: Con un pool, si el hilo no tiene una conexión prestada
+        """
+        if not self.engine.per_thread:
+            conn = getattr(self._prestada, "conn", None)
+            if conn is None:
+                raise RuntimeError("Con un pool la conexión se pide con connection() o transaction()")
+            return conn
+        
+        thread_id = threading.get_ident()
+        conn = self._connections.get(thread_id)
+        if conn is None:
+            conn = self._connect()
+            with self._lock:
+                self._connections[thread_id] = conn
         return conn
     
+    def para_usuario(self, user_id: int) -> "Database":
+        """Base donde viven los datos de un usuario (con sharding, su shard)"""
+        return self
+    
+    def todas(self, abiertas: bool = False) -> List["Database"]:
+        """Todas las bases (con sharding, todos los shards)"""
+        return [self]
+    
+    @contextmanager
+    def _conexion_del_hilo(self):
+        """
+        Conexión del hilo para un bloque
+        
+        Con sqlite3 directo, la de larga vida del hilo. Con un pool se pide
+        prestada y vuelve al pool al terminar el bloque más externo: los
+        bloques anidados del mismo hilo usan la misma.
+        """
+        if self.engine.per_thread:
+            yield self.get_connection()
+            return
+        
+        prestada = self._prestada
+        conn = getattr(prestada, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        
+        conn = prestada.conn = self._connect()
+        try:
+            yield conn
+        finally:
+            prestada.conn = None
+            self._release(conn)
+    
+    def _en_transaccion(self) -> bool:
+        """Si el hilo está dentro de una transacción de transaction()"""
+        if self.engine.per_thread:
+            return self.get_connection().in_transaction
+        conn = getattr(self._prestada, "conn", None)
+        return conn is not None and conn.in_transaction
+    
+    @contextmanager
+    def connection(self):
+        """Conexión para lecturas (con sqlite3 directo queda abierta para el próximo uso del hilo)"""
+        unidad = unidad_actual(self)
+        if unidad is not None and unidad.conn is not None:
+            # Dentro de una unidad de trabajo que ya escribió: leer con su
+            # conexión para ver las escrituras todavía sin confirmar
+            with unidad.lock:
+                yield unidad.conn
+            return
+        
+        with self._conexion_del_hilo() as conn:
+            yield conn
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Transacción de escritura
+        
+        Toma el lock de escritura al empezar (BEGIN IMMEDIATE), hace commit al
+        salir y rollback si hay una excepción. Si el hilo ya está dentro de una
+        transacción, se suma a ella. Dentro de una unidad de trabajo usa la
+        transacción de la unidad, con un savepoint para deshacer sólo este
+        bloque si falla.
+        """
+        unidad = unidad_actual(self)
+        if unidad is not None:
+            with unidad.lock:
+                conn = unidad.empezar()
+                conn.execute("SAVEPOINT unidad")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK TO unidad")
+                    unidad.registrar_falla()
+                    raise
+                else:
+                    unidad.registrar_escritura()
+                finally:
+                    conn.execute("RELEASE unidad")
+            return
+        
+        with self._conexion_del_hilo() as conn:
+            if conn.in_transaction:
+                yield conn
+                return
+            
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+            finally:
+                for tabla, user_id in self._invalidaciones.pop(threading.get_ident(), ()):
+                    self.cache.invalidate(tabla, user_id)
+    
+    def invalidar_cache(self, tabla: str, user_id: int):
+        """
+        Descartar los listados cacheados de un usuario
+        
+        Dentro de una transacción se posterga hasta el commit, para que ninguna
+        lectura de otro hilo vuelva a cachear los datos de antes de la escritura.
+        """
+        unidad = unidad_actual(self)
+        if unidad is not None:
+            unidad.invalidar_cache(tabla, user_id)
+        elif self._en_transaccion():
+            self._invalidaciones.setdefault(threading.get_ident(), set()).add((tabla, user_id))
+        else:
+            self.cache.invalidate(tabla, user_id)
+    
+    def cacheado(self, tabla: str, user_id: int, clave: Any, 
+                 cargar: Callable[[], List[T]]) -> List[T]:
+        """
+        Listado a través de la caché (ver ReadCache.get_or_load)
+        
+        Una unidad de trabajo con escrituras sin confirmar lee directo de su
+        conexión: ni puede usar lo cacheado ni debe cachear lo que ve.
+        """
+        unidad = unidad_actual(self)
+        if unidad is not None and unidad.conn is not None:
+            return cargar()
+        return self.cache.get_or_load(tabla, user_id, clave, cargar)
+    
+    def execute_write(self, escribir: Callable[[sqlite3.Connection], T]) -> T:
+        """
+        Ejecutar una escritura y devolver su resultado una vez confirmada
+        
+        escribir(conn) corre dentro de una transacción. Sin write-behind (o si
+        el hilo ya está en una transacción o en una unidad de trabajo) corre
+        acá mismo y se confirma con ella; con write-behind
+        se encola, el hilo escritor la confirma junto con las demás que
+        lleguen en los próximos milisegundos, y recién después del commit se
+        devuelve el resultado (ej: el ID generado) o se relanza su excepción.
+        """
+        escritor = self._escritor
+        if (escritor is None or threading.current_thread() is escritor
+                or unidad_actual(self) is not None
+                or self._en_transaccion()):
+            with self.transaction() as conn:
+                return escribir(conn)
+        
+        futuro: Future = Future()
+        self._cola_escrituras.put((escribir, futuro))
+        return futuro.result()
+    
+    def _bucle_escritor(self):
+        """Hilo escritor: junta escrituras de la cola y las confirma en grupo"""
+        # El escritor se queda con una conexión (también con un pool) mientras vive
+        with self._conexion_del_hilo() as conn:
+            # Con un fsync por grupo (y no por escritura) se puede pagar FULL:
+            # una escritura confirmada sobrevive también a un corte de luz
+            conn.execute("PRAGMA synchronous = FULL")
+            try:
+                self._escribir_grupos()
+            finally:
+                # Con un pool la conexión vuelve a usarse para otras cosas
+                conn.execute(f"PRAGMA synchronous = {self.PRAGMAS['synchronous']}")
+    
+    def _escribir_grupos(self):
+        """Confirmar grupos de escrituras de la cola hasta que llegue el aviso de cierre"""
+        terminar = False
+        while not terminar:
+            item = self._cola_escrituras.get()
+            if item is None:
+                break
+            
+            grupo = [item]
+            limite = time.monotonic() + self.grupo_max_ms / 1000
+            while len(grupo) < self.grupo_max_ops:
+                espera = limite - time.monotonic()
+                try:
+                    item = self._cola_escrituras.get(timeout=espera) if espera > 0 \
+                        else self._cola_escrituras.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    terminar = True
+                    break
+                grupo.append(item)
+            
+            self._confirmar_grupo(grupo)
+        
+        # Escrituras que llegaron justo mientras se cerraba
+        pendientes = []
+        while True:
+            try:
+                item = self._cola_escrituras.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                pendientes.append(item)
+        if pendientes:
+            self._confirmar_grupo(pendientes)
+    
+    def _confirmar_grupo(self, grupo: List[Tuple[Callable, Future]]):
+        """Ejecutar un grupo de escrituras en una transacción y un solo commit"""
+        resultados = []
+        try:
+            with self.transaction() as conn:
+                for escribir, futuro in grupo:
+                    # Cada escritura en su savepoint: si una falla se deshace
+                    # sólo esa y el resto del grupo se confirma igual
+                    conn.execute("SAVEPOINT escritura")
+                    try:
+                        resultados.append((futuro, escribir(conn), None))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO escritura")
+                        resultados.append((futuro, None, e))
+                    conn.execute("RELEASE escritura")
+        except BaseException as e:
+            # Falló el BEGIN o el COMMIT: no quedó escrita ninguna
+            logger.error(f"Error confirmando un grupo de {len(grupo)} escrituras: {e}")
+            for _, futuro in grupo:
+                futuro.set_exception(e)
+            return
+        
+        self.grupos_confirmados += 1
+        self.escrituras_confirmadas += len(grupo)
+        
+        for futuro, resultado, error in resultados:
+            if error is not None:
+                futuro.set_exception(error)
+            else:
+                futuro.set_result(resultado)
+    
+    def close(self):
+        """Cerrar todas las conexiones abiertas (llamar al apagar el bot)"""
+        # Primero confirmar las escrituras encoladas
+        escritor, self._escritor = self._escritor, None
+        if escritor is not None:
+            self._cola_escrituras.put(None)
+            escritor.join()
+        
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        
+        for conn in connections:
+            try:
+                conn.execute("PRAGMA optimize")
+                self._release(conn)
+            except sqlite3.Error as e:
+                logger.warning(f"Error cerrando conexión a la base de datos: {e}")
+        self.engine.dispose()
+        
+        if connections:
+            logger.info(f"Base de datos cerrada ({len(connections)} conexiones)")
+    
     def init_database(self):
-        """Inicializar tablas de la base de datos"""
-        with self.get_connection() as conn:
-            # Tabla de recordatorios
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS recordatorios (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    contenido TEXT NOT NULL,
-                    fecha_recordatorio DATETIME NOT NULL,
-                    prioridad TEXT DEFAULT 'media' CHECK (prioridad IN ('alta', 'media', 'baja')),
-                    status TEXT DEFAULT 'pendiente' CHECK (status IN ('pendiente', 'completado', 'cancelado')),
-                    user_id INTEGER NOT NULL,
-                    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Índices para mejorar performance
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_recordatorios_user_id 
-                ON recordatorios(user_id)
-            """)
-            
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_recordatorios_fecha 
-                ON recordatorios(fecha_recordatorio)
-            """)
-            
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_recordatorios_status 
-                ON recordatorios(status)
-            """)
-            
-            # Tabla de tareas (para TO-DOs sin fecha específica)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS tareas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    contenido TEXT NOT NULL,
-                    prioridad TEXT DEFAULT 'media' CHECK (prioridad IN ('alta', 'media', 'baja')),
-                    status TEXT DEFAULT 'pendiente' CHECK (status IN ('pendiente', 'completado', 'cancelado')),
-                    categoria TEXT DEFAULT 'general',
-                    user_id INTEGER NOT NULL,
-                    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Índices para tareas
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_tareas_user_id 
-                ON tareas(user_id)
-            """)
-            
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_tareas_status 
-                ON tareas(status)
-            """)
-            
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_tareas_categoria 
-                ON tareas(categoria)
-            """)
-            
-            # Tabla de notas (para anotaciones sueltas)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS notas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    contenido TEXT NOT NULL,
-                    categoria TEXT DEFAULT 'general',
-                    user_id INTEGER NOT NULL,
-                    fecha_creacion DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    fecha_modificacion DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Índices para notas
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_notas_user_id 
-                ON notas(user_id)
-            """)
-            
-            conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_notas_categoria 
-                ON notas(categoria)
-            """)
-            
-            conn.commit()
-            logger.info("Base de datos inicializada correctamente")
+        """Inicializar tablas de la base de datos aplicando las migraciones pendientes"""
+        with self.transaction() as conn:
+            run_migrations(conn)
+            self.fts_enabled = conn.execute("""
+                SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notas_fts'
+            """).fetchone() is not None
+        
+        logger.info("Base de datos inicializada correctamente")
+
+# Prioridad de las tareas: se guarda como entero para que el índice ordene
+# bien (alta > media > baja); hacia afuera se sigue usando el texto
+PRIORIDADES = {"alta": 3, "media": 2, "baja": 1}
+_PRIORIDAD_TEXTO = {valor: texto for texto, valor in PRIORIDADES.items()}
+
+def _prioridad_valor(prioridad: str) -> int:
+    """Convertir 'alta'/'media'/'baja' al entero que se guarda en la tabla"""
+    try:
+        return PRIORIDADES[prioridad]
+    except KeyError:
+        raise ValueError(f"Prioridad inválida: {prioridad} (alta, media, baja)") from None
+
+# row_factory de cada modelo (se asignan al cursor antes del fetch)
+_FILAS_RECORDATORIO = fabrica_filas(RecordatorioRow)
+_FILAS_TAREA = fabrica_filas(TareaRow, {"prioridad": lambda valor: _PRIORIDAD_TEXTO.get(valor, valor)})
+_FILAS_NOTA = fabrica_filas(NotaRow)
+
+def _fts_query(texto_busqueda: str, user_id: int) -> Optional[str]:
+    """
+    Armar una consulta FTS5 a partir del texto libre del usuario
+    
+    Cada palabra se busca como prefijo ("medi" encuentra "médico") y todas
+    tienen que aparecer. La consulta queda restringida a las filas del usuario.
+    
+    Returns:
+        La expresión MATCH, o None si el texto no tiene palabras
+    """
+    palabras = re.findall(r"\w+", texto_busqueda.lower())
+    if not palabras:
+        return None
+    
+    terminos = " AND ".join(f'"{palabra}"*' for palabra in palabras)
+    return f'user_id : "{user_id}" AND contenido : ({terminos})'
+
+def _insertar_lote(conn: sqlite3.Connection, sql: str, filas: List[tuple]) -> List[int]:
+    """
+    Insertar varias filas con executemany y devolver sus IDs
+    
+    Debe correr dentro de una transacción de escritura: con el lock tomado
+    nadie más inserta, así que los IDs de AUTOINCREMENT son consecutivos y
+    terminan en last_insert_rowid().
+    """
+    if not filas:
+        return []
+    
+    conn.executemany(sql, filas)
+    ultimo_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(ultimo_id - len(filas) + 1, ultimo_id + 1))
+
+def _fila_cursor(conn: sqlite3.Connection, tabla: str, columnas: str, 
+                 fila_id: int) -> Optional[tuple]:
+    """
+    Valores de orden de la fila after_id para la paginación por cursor
+    
+    Returns:
+        (columnas..., id) o None si la fila ya no existe
+    """
+    row = conn.execute(f"SELECT {columnas}, id FROM {tabla} WHERE id = ?", (fila_id,)).fetchone()
+    return tuple(row) if row else None
+
+def _iterar_paginas(listar: Callable[..., list], tamano_pagina: int, 
+                    **filtros) -> Iterator:
+    """Recorrer un listado paginado por cursor pidiendo una página por vez"""
+    after_id = None
+    while True:
+        pagina = listar(after_id=after_id, limit=tamano_pagina, **filtros)
+        yield from pagina
+        if len(pagina) < tamano_pagina:
+            return
+        after_id = pagina[-1]['id']
 
-class Recordatorio:
+def _bases_para(db: Database, user_id: Optional[int]) -> List[Database]:
+    """
+    Bases donde buscar una fila por ID: la del usuario si se conoce; si no,
+    todas (con sharding los IDs no se repiten entre shards)
+    """
+    return [db.para_usuario(user_id)] if user_id is not None else db.todas()
+
+def _escribir_en_alguna(bases: List[Database], 
+                        escribir: Callable[[Database, sqlite3.Connection], bool]) -> bool:
+    """Aplicar una escritura por ID base por base hasta que alguna la encuentre"""
+    for db in bases:
+        if db.execute_write(functools.partial(escribir, db)):
+            return True
+    return False
+
+def _listar_historial(db: Database, tabla: str, filas: Callable, user_id: int, 
+                      status: Optional[str], limit: Optional[int], 
+                      categoria: Optional[str] = None) -> list:
+    """Filas finalizadas de la tabla principal y de {tabla}_archivo, juntas"""
+    statuses = (status,) if status else ("completado", "cancelado")
+    condicion = f"user_id = ? AND status IN ({', '.join('?' for _ in statuses)})"
+    filtro = [user_id, *statuses]
+    
+    if categoria:
+        condicion += " AND categoria = ?"
+        filtro.append(categoria)
+    
+    query = f"""
+        SELECT *, NULL AS fecha_archivado FROM {tabla} 
+        WHERE {condicion}
+        UNION ALL
+        SELECT * FROM {tabla}_archivo 
+        WHERE {condicion}
+        ORDER BY fecha_modificacion DESC, id DESC
+    """
+    params = filtro * 2
+    
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    
+    with db.connection() as conn:
+        cursor = conn.execute(query, params)
+        cursor.row_factory = filas
+        return cursor.fetchall()
+
+class _Modelo:
+    """Base de los modelos: usan la base que se les pasa o la global"""
+    
+    def __init__(self, db: Optional[Database] = None):
+        """
+        Args:
+            db: Base del modelo. Sin base, cada operación usa la de
+                obtener_database() (la global o la de usar_database)
+        """
+        self._db = db
+    
+    @property
+    def db(self) -> Database:
+        return self._db if self._db is not None else obtener_database()
+
+class Recordatorio(_Modelo):
     """Modelo para manejar recordatorios"""
     
-    def __init__(self, db: Database):
-        self.db = db
+    def __init__(self, db: Optional[Database] = None):
+        super().__init__(db)
+        # Se llaman con (id, user_id, contenido, fecha_recordatorio en epoch)
+        # después de crear cada recordatorio, desde el hilo que lo creó (ej:
+        # para que el despachador lo agende sin consultar la base)
+        self.al_crear: List[Callable[[int, int, str, int], None]] = []
     
-    def crear(self, contenido: str, fecha_recordatorio: datetime, user_id: int, 
+    def _avisar_creados(self, creados: List[Tuple[int, int, str, int]]):
+        for callback in self.al_crear:
+            for recordatorio in creados:
+                try:
+                    callback(*recordatorio)
+                except Exception as e:
+                    logger.error(f"Error avisando la creación del recordatorio {recordatorio[0]}: {e}")
+    
+    def crear(self, contenido: str, fecha_recordatorio: Fecha, user_id: int, 
               prioridad: str = 'media') -> int:
         """
         Crear un nuevo recordatorio
         
         Args:
             contenido: Texto del recordatorio
-            fecha_recordatorio: Cuándo debe recordarse
+            fecha_recordatorio: Cuándo debe recordarse (datetime sin zona =
+                hora de Buenos Aires, o segundos epoch)
             user_id: ID del usuario de Telegram
             prioridad: alta, media, baja
             
         Returns:
             ID del recordatorio creado
         """
-        with self.db.get_connection() as conn:
+        db = self.db.para_usuario(user_id)
+        fecha_recordatorio = a_epoch(fecha_recordatorio)
+        
+        def escribir(conn: sqlite3.Connection) -> int:
             cursor = conn.execute("""
                 INSERT INTO recordatorios 
                 (contenido, fecha_recordatorio, prioridad, user_id)
                 VALUES (?, ?, ?, ?)
             """, (contenido, fecha_recordatorio, prioridad, user_id))
             
-            recordatorio_id = cursor.lastrowid
-            conn.commit()
-            
-            logger.info(f"Recordatorio creado - ID: {recordatorio_id}, Usuario: {user_id}")
-            return recordatorio_id
+            db.invalidar_cache("recordatorios", user_id)
+            return cursor.lastrowid
+        
+        recordatorio_id = db.execute_write(escribir)
+        logger.info(f"Recordatorio creado - ID: {recordatorio_id}, Usuario: {user_id}")
+        self._avisar_creados([(recordatorio_id, user_id, contenido, fecha_recordatorio)])
+        return recordatorio_id
     
-    def obtener_por_id(self, recordatorio_id: int) -> Optional[Dict[str, Any]]:
-        """Obtener un recordatorio por ID"""
-        with self.db.get_connection() as conn:
-            cursor = conn.execute("""
-                SELECT * FROM recordatorios WHERE id = ?
-            """, (recordatorio_id,))
+    def crear_multiples(self, recordatorios: Sequence[Tuple[str, Fecha, str]], 
+                        user_id: int) -> List[int]:
+        """
+        Crear varios recordatorios en una sola transacción
+        
+        Args:
+            recordatorios: Lista de (contenido, fecha_recordatorio, prioridad)
+            user_id: ID del usuario de Telegram
             
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        Returns:
+            IDs de los recordatorios creados, en el mismo orden
+        """
+        db = self.db.para_usuario(user_id)
+        
+        filas = [(contenido, a_epoch(fecha), prioridad, user_id) 
+                 for contenido, fecha, prioridad in recordatorios]
+        
+        def escribir(conn: sqlite3.Connection) -> List[int]:
+            ids = _insertar_lote(conn, """
+                INSERT INTO recordatorios 
+                (contenido, fecha_recordatorio, prioridad, user_id)
+                VALUES (?, ?, ?, ?)
+            """, filas)
+            db.invalidar_cache("recordatorios", user_id)
+            return ids
+        
+        ids = db.execute_write(escribir)
+        logger.info(f"{len(ids)} recordatorios creados - Usuario: {user_id}")
+        self._avisar_creados([(recordatorio_id, user_id, contenido, fecha) 
+                              for recordatorio_id, (contenido, fecha, _, _) in zip(ids, filas)])
+        return ids
     
-    def listar_por_usuario(self, user_id: int, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    def obtener_por_id(self, recordatorio_id: int, 
+                       user_id: Optional[int] = None) -> Optional[RecordatorioRow]:
+        """
+        Obtener un recordatorio por ID
+        
+        Args:
+            recordatorio_id: ID del recordatorio
+            user_id: Dueño del recordatorio, si se conoce (con sharding evita
+                buscarlo en todos los shards)
+        """
+        for db in _bases_para(self.db, user_id):
+            with db.connection() as conn:
+                cursor = conn.execute("""
+                    SELECT * FROM recordatorios WHERE id = ?
+                """, (recordatorio_id,))
+                
+                cursor.row_factory = _FILAS_RECORDATORIO
+                recordatorio = cursor.fetchone()
+            if recordatorio is not None:
+                return recordatorio
+        return None
+    
+    def listar_por_usuario(self, user_id: int, status: Optional[str] = None, 
+                          after_id: Optional[int] = None, 
+                          limit: Optional[int] = None) -> List[RecordatorioRow]:
         """
         Listar recordatorios de un usuario
         
         Args:
             user_id: ID del usuario
             status: Filtrar por status (opcional)
+            after_id: Devolver los que siguen a este ID en el orden del listado
+                (paginación por cursor, opcional)
+            limit: Cantidad máxima de resultados (opcional)
         """
-        query = "SELECT * FROM recordatorios WHERE user_id = ?"
-        params = [user_id]
+        db = self.db.para_usuario(user_id)
         
-        if status:
-            query += " AND status = ?"
-            params.append(status)
+        def cargar() -> List[RecordatorioRow]:
+            query = "SELECT * FROM recordatorios WHERE user_id = ?"
+            params = [user_id]
+            
+            if status:
+                query += " AND status = ?"
+                params.append(status)
+            
+            with db.connection() as conn:
+                if after_id is not None:
+                    cursor_row = _fila_cursor(conn, "recordatorios", "fecha_recordatorio", after_id)
+                    if cursor_row is None:
+                        return []
+                    query += " AND (fecha_recordatorio, id) > (?, ?)"
+                    params.extend(cursor_row)
+                
+                query += " ORDER BY fecha_recordatorio ASC, id ASC"
+                
+                if limit is not None:
+                    query += " LIMIT ?"
+                    params.append(limit)
+                
+                cursor = conn.execute(query, params)
+                cursor.row_factory = _FILAS_RECORDATORIO
+                return cursor.fetchall()
         
-        query += " ORDER BY fecha_recordatorio ASC"
+        return db.cacheado("recordatorios", user_id, (status, after_id, limit), cargar)
+    
+    def iterar_por_usuario(self, user_id: int, status: Optional[str] = None, 
+                           tamano_pagina: int = 100) -> Iterator[RecordatorioRow]:
+        """Recorrer los recordatorios de un usuario de a páginas, sin cargarlos todos en memoria"""
+        return _iterar_paginas(self.listar_por_usuario, tamano_pagina, 
+                               user_id=user_id, status=status)
+    
+    def listar_historial(self, user_id: int, status: Optional[str] = None, 
+                         limit: Optional[int] = None) -> List[RecordatorioRow]:
+        """
+        Listar los recordatorios finalizados, incluidos los archivados
         
-        with self.db.get_connection() as conn:
-            cursor = conn.execute(query, params)
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+        Args:
+            user_id: ID del usuario
+            status: completado o cancelado (opcional, por defecto ambos)
+            limit: Cantidad máxima de resultados (opcional)
+        
+        Returns:
+            Del más reciente al más viejo; los archivados traen fecha_archivado
+        """
+        return _listar_historial(self.db.para_usuario(user_id), "recordatorios", _FILAS_RECORDATORIO, user_id, status, limit)
     
-    def actualizar_status(self, recordatorio_id: int, nuevo_status: str) -> bool:
+    def actualizar_status(self, recordatorio_id: int, nuevo_status: str, 
+                          user_id: Optional[int] = None) -> bool:
         """
         Actualizar el status de un recordatorio
         
         Args:
             recordatorio_id: ID del recordatorio
             nuevo_status: pendiente, completado, cancelado
+            user_id: Dueño del recordatorio, si se conoce (ver obtener_por_id)
         """
-        with self.db.get_connection() as conn:
-            cursor = conn.execute("""
+        def escribir(db: Database, conn: sqlite3.Connection) -> bool:
+            row = conn.execute("""
                 UPDATE recordatorios 
-                SET status = ?, fecha_modificacion = CURRENT_TIMESTAMP
+                SET status = ?, fecha_modificacion = ?
                 WHERE id = ?
-            """, (nuevo_status, recordatorio_id))
-            
-            success = cursor.rowcount > 0
-            conn.commit()
-            
-            if success:
-                logger.info(f"Recordatorio {recordatorio_id} actualizado a {nuevo_status}")
-            else:
-                logger.warning(f"No se encontró recordatorio con ID {recordatorio_id}")
+                RETURNING user_id
+            """, (nuevo_status, ahora_epoch(), recordatorio_id)).fetchone()
             
-            return success
+            if row is None:
+                return False
+            db.invalidar_cache("recordatorios", row["user_id"])
+            return True
+        
+        success = _escribir_en_alguna(_bases_para(self.db, user_id), escribir)
+        
+        if success:
+            logger.info(f"Recordatorio {recordatorio_id} actualizado a {nuevo_status}")
+        else:
+            logger.warning(f"No se encontró recordatorio con ID {recordatorio_id}")
+        
+        return success
     
-    def eliminar(self, recordatorio_id: int) -> bool:
-        """Eliminar un recordatorio"""
-        with self.db.get_connection() as conn:
-            cursor = conn.execute("""
+    def eliminar(self, recordatorio_id: int, user_id: Optional[int] = None) -> bool:
+        """Eliminar un recordatorio (user_id: el dueño, si se conoce)"""
+        def escribir(db: Database, conn: sqlite3.Connection) -> bool:
+            row = conn.execute("""
                 DELETE FROM recordatorios WHERE id = ?
-            """, (recordatorio_id,))
+                RETURNING user_id
+            """, (recordatorio_id,)).fetchone()
             
-            success = cursor.rowcount > 0
-            conn.commit()
-            
-            if success:
-                logger.info(f"Recordatorio {recordatorio_id} eliminado")
-            else:
-                logger.warning(f"No se encontró recordatorio con ID {recordatorio_id}")
-            
-            return success
+            if row is None:
+                return False
+            db.invalidar_cache("recordatorios", row["user_id"])
+            return True
+        
+        success = _escribir_en_alguna(_bases_para(self.db, user_id), escribir)
+        
+        if success:
+            logger.info(f"Recordatorio {recordatorio_id} eliminado")
+        else:
+            logger.warning(f"No se encontró recordatorio con ID {recordatorio_id}")
+        
+        return success
     
-    def obtener_pendientes_hasta(self, fecha_limite: datetime) -> List[Dict[str, Any]]:
-        """Obtener recordatorios pendientes hasta una fecha"""
-        with self.db.get_connection() as conn:
-            cursor = conn.execute("""
-                SELECT * FROM recordatorios 
-                WHERE status = 'pendiente' 
-                AND fecha_recordatorio <= ?
-                ORDER BY fecha_recordatorio ASC
-            """, (fecha_limite,))
-            
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+    def obtener_pendientes_hasta(self, fecha_limite: Fecha, 
+                                 sin_notificar: bool = False) -> List[RecordatorioRow]:
+        """
+        Obtener recordatorios pendientes hasta una fecha (de todos los usuarios)
+        
+        Args:
+            fecha_limite: Fecha máxima de recordatorio (datetime o epoch)
+            sin_notificar: Sólo los que todavía no se entregaron
+        """
+        query = """
+            SELECT * FROM recordatorios 
+            WHERE status = 'pendiente' 
+            AND fecha_recordatorio <= ?
+        """
+        if sin_notificar:
+            query += " AND fecha_notificacion IS NULL"
+        query += " ORDER BY fecha_recordatorio ASC"
+        
+        limite = a_epoch(fecha_limite)
+        por_base = []
+        for db in self.db.todas():
+            with db.connection() as conn:
+                cursor = conn.execute(query, (limite,))
+                
+                cursor.row_factory = _FILAS_RECORDATORIO
+                por_base.append(cursor.fetchall())
+        
+        if len(por_base) == 1:
+            return por_base[0]
+        return list(heapq.merge(*por_base, key=lambda r: r.fecha_recordatorio))
+    
+    def marcar_notificado(self, recordatorio_id: int, user_id: Optional[int] = None) -> bool:
+        """
+        Registrar que el recordatorio ya se entregó
+        
+        Returns:
+            False si no existe, no está pendiente o ya estaba notificado
+        """
+        def escribir(db: Database, conn: sqlite3.Connection) -> bool:
+            row = conn.execute("""
+                UPDATE recordatorios 
+                SET fecha_notificacion = ?
+                WHERE id = ? AND status = 'pendiente' AND fecha_notificacion IS NULL
+                RETURNING user_id
+            """, (ahora_epoch(), recordatorio_id)).fetchone()
+            
+            if row is None:
+                return False
+            db.invalidar_cache("recordatorios", row["user_id"])
+            return True
+        
+        return _escribir_en_alguna(_bases_para(self.db, user_id), escribir)
 
-class Tarea:
+class Tarea(_Modelo):
     """Modelo para manejar tareas (TO-DOs sin fecha específica)"""
     
-    def __init__(self, db: Database):
-        self.db = db
-    
     def crear(self, contenido: str, user_id: int, prioridad: str = 'media', 
               categoria: str = 'general') -> int:
         """
@@ -257,31 +843,77 @@ class Tarea:
         Returns:
             ID de la tarea creada
         """
-        with self.db.get_connection() as conn:
+        db = self.db.para_usuario(user_id)
+        
+        valor_prioridad = _prioridad_valor(prioridad)
+        
+        def escribir(conn: sqlite3.Connection) -> int:
             cursor = conn.execute("""
                 INSERT INTO tareas 
                 (contenido, prioridad, categoria, user_id)
                 VALUES (?, ?, ?, ?)
-            """, (contenido, prioridad, categoria, user_id))
-            
-            tarea_id = cursor.lastrowid
-            conn.commit()
+            """, (contenido, valor_prioridad, categoria, user_id))
             
-            logger.info(f"Tarea creada - ID: {tarea_id}, Usuario: {user_id}")
-            return tarea_id
+            db.invalidar_cache("tareas", user_id)
+            return cursor.lastrowid
+        
+        tarea_id = db.execute_write(escribir)
+        logger.info(f"Tarea creada - ID: {tarea_id}, Usuario: {user_id}")
+        return tarea_id
     
-    def obtener_por_id(self, tarea_id: int) -> Optional[Dict[str, Any]]:
-        """Obtener una tarea por ID"""
-        with self.db.get_connection() as conn:
-            cursor = conn.execute("""
-                SELECT * FROM tareas WHERE id = ?
-            """, (tarea_id,))
+    def crear_multiples(self, tareas: Sequence[Tuple[str, str, str]], user_id: int) -> List[int]:
+        """
+        Crear varias tareas en una sola transacción
+        
+        Args:
+            tareas: Lista de (contenido, prioridad, categoria)
+            user_id: ID del usuario de Telegram
             
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        Returns:
+            IDs de las tareas creadas, en el mismo orden
+        """
+        db = self.db.para_usuario(user_id)
+        
+        filas = [(contenido, _prioridad_valor(prioridad), categoria, user_id) 
+                 for contenido, prioridad, categoria in tareas]
+        
+        def escribir(conn: sqlite3.Connection) -> List[int]:
+            ids = _insertar_lote(conn, """
+                INSERT INTO tareas 
+                (contenido, prioridad, categoria, user_id)
+                VALUES (?, ?, ?, ?)
+            """, filas)
+            db.invalidar_cache("tareas", user_id)
+            return ids
+        
+        ids = db.execute_write(escribir)
+        logger.info(f"{len(ids)} tareas creadas - Usuario: {user_id}")
+        return ids
+    
+    def obtener_por_id(self, tarea_id: int, user_id: Optional[int] = None) -> Optional[TareaRow]:
+        """
+        Obtener una tarea por ID
+        
+        Args:
+            tarea_id: ID de la tarea
+            user_id: Dueño de la tarea, si se conoce (con sharding evita
+                buscarla en todos los shards)
+        """
+        for db in _bases_para(self.db, user_id):
+            with db.connection() as conn:
+                cursor = conn.execute("""
+                    SELECT * FROM tareas WHERE id = ?
+                """, (tarea_id,))
+                
+                cursor.row_factory = _FILAS_TAREA
+                tarea = cursor.fetchone()
+            if tarea is not None:
+                return tarea
+        return None
     
     def listar_por_usuario(self, user_id: int, status: Optional[str] = None, 
-                          categoria: Optional[str] = None) -> List[Dict[str, Any]]:
+                          categoria: Optional[str] = None, after_id: Optional[int] = None, 
+                          limit: Optional[int] = None) -> List[TareaRow]:
         """
         Listar tareas de un usuario
         
@@ -289,49 +921,101 @@ class Tarea:
             user_id: ID del usuario
             status: Filtrar por status (opcional)
             categoria: Filtrar por categoría (opcional)
+            after_id: Devolver las que siguen a este ID en el orden del listado
+                (paginación por cursor, opcional)
+            limit: Cantidad máxima de resultados (opcional)
         """
-        query = "SELECT * FROM tareas WHERE user_id = ?"
-        params = [user_id]
+        db = self.db.para_usuario(user_id)
         
-        if status:
-            query += " AND status = ?"
-            params.append(status)
+        def cargar() -> List[TareaRow]:
+            query = "SELECT * FROM tareas WHERE user_id = ?"
+            params = [user_id]
+            
+            if status:
+                query += " AND status = ?"
+                params.append(status)
+                
+            if categoria:
+                query += " AND categoria = ?"
+                params.append(categoria)
             
-        if categoria:
-            query += " AND categoria = ?"
-            params.append(categoria)
+            with db.connection() as conn:
+                if after_id is not None:
+                    cursor_row = _fila_cursor(conn, "tareas", "prioridad, fecha_creacion", after_id)
+                    if cursor_row is None:
+                        return []
+                    prioridad, fecha_creacion, cursor_id = cursor_row
+                    query += """ AND (prioridad < ? OR (prioridad = ? AND (fecha_creacion, id) > (?, ?)))"""
+                    params.extend([prioridad, prioridad, fecha_creacion, cursor_id])
+                
+                query += " ORDER BY prioridad DESC, fecha_creacion ASC, id ASC"
+                
+                if limit is not None:
+                    query += " LIMIT ?"
+                    params.append(limit)
+                
+                cursor = conn.execute(query, params)
+                cursor.row_factory = _FILAS_TAREA
+                return cursor.fetchall()
         
-        query += " ORDER BY prioridad DESC, fecha_creacion ASC"
+        return db.cacheado("tareas", user_id, (status, categoria, after_id, limit), cargar)
+    
+    def iterar_por_usuario(self, user_id: int, status: Optional[str] = None, 
+                           categoria: Optional[str] = None, 
+                           tamano_pagina: int = 100) -> Iterator[TareaRow]:
+        """Recorrer las tareas de un usuario de a páginas, sin cargarlas todas en memoria"""
+        return _iterar_paginas(self.listar_por_usuario, tamano_pagina, 
+                               user_id=user_id, status=status, categoria=categoria)
+    
+    def listar_historial(self, user_id: int, status: Optional[str] = None, 
+                         limit: Optional[int] = None, 
+                         categoria: Optional[str] = None) -> List[TareaRow]:
+        """
+        Listar las tareas finalizadas, incluidas las archivadas
+        
+        Args:
+            user_id: ID del usuario
+            status: completado o cancelado (opcional, por defecto ambos)
+            limit: Cantidad máxima de resultados (opcional)
+            categoria: Filtrar por categoría (opcional)
         
-        with self.db.get_connection() as conn:
-            cursor = conn.execute(query, params)
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+        Returns:
+            De la más reciente a la más vieja; las archivadas traen fecha_archivado
+        """
+        return _listar_historial(self.db.para_usuario(user_id), "tareas", _FILAS_TAREA, 
+                                 user_id, status, limit, categoria)
     
-    def actualizar_status(self, tarea_id: int, nuevo_status: str) -> bool:
+    def actualizar_status(self, tarea_id: int, nuevo_status: str, 
+                          user_id: Optional[int] = None) -> bool:
         """
         Actualizar el status de una tarea
         
         Args:
             tarea_id: ID de la tarea
             nuevo_status: pendiente, completado, cancelado
+            user_id: Dueño de la tarea, si se conoce (ver obtener_por_id)
         """
-        with self.db.get_connection() as conn:
-            cursor = conn.execute("""
+        def escribir(db: Database, conn: sqlite3.Connection) -> bool:
+            row = conn.execute("""
                 UPDATE tareas 
-                SET status = ?, fecha_modificacion = CURRENT_TIMESTAMP
+                SET status = ?, fecha_modificacion = ?
                 WHERE id = ?
-            """, (nuevo_status, tarea_id))
-            
-            success = cursor.rowcount > 0
-            conn.commit()
+                RETURNING user_id
+            """, (nuevo_status, ahora_epoch(), tarea_id)).fetchone()
             
-            if success:
-                logger.info(f"Tarea {tarea_id} actualizada a {nuevo_status}")
-            else:
-                logger.warning(f"No se encontró tarea con ID {tarea_id}")
-            
-            return success
+            if row is None:
+                return False
+            db.invalidar_cache("tareas", row["user_id"])
+            return True
+        
+        success = _escribir_en_alguna(_bases_para(self.db, user_id), escribir)
+        
+        if success:
+            logger.info(f"Tarea {tarea_id} actualizada a {nuevo_status}")
+        else:
+            logger.warning(f"No se encontró tarea con ID {tarea_id}")
+        
+        return success
     
     def completar_multiples(self, contenidos_parciales: List[str], user_id: int) -> Dict[str, Any]:
         """
@@ -344,45 +1028,87 @@ class Tarea:
         Returns:
             Dict con resultados: completadas, no_encontradas
         """
+        db = self.db.para_usuario(user_id)
+        
         completadas = []
         no_encontradas = []
         
-        for contenido_parcial in contenidos_parciales:
-            # Buscar tareas que contengan el texto (case insensitive)
-            with self.db.get_connection() as conn:
-                cursor = conn.execute("""
-                    SELECT * FROM tareas 
-                    WHERE user_id = ? 
-                    AND status = 'pendiente' 
-                    AND LOWER(contenido) LIKE LOWER(?)
-                    ORDER BY fecha_creacion ASC
-                    LIMIT 1
-                """, (user_id, f"%{contenido_parcial}%"))
-                
-                tarea = cursor.fetchone()
+        # Todo el lote en una sola transacción: una lectura de las pendientes,
+        # el matching en memoria y un único UPDATE
+        def escribir(conn: sqlite3.Connection):
+            pendientes = conn.execute("""
+                SELECT id, contenido FROM tareas 
+                WHERE user_id = ? 
+                AND status = 'pendiente'
+                ORDER BY fecha_creacion ASC, id ASC
+            """, (user_id,)).fetchall()
+            
+            contenidos = [(tarea['id'], tarea['contenido'], tarea['contenido'].lower())
+                          for tarea in pendientes]
+            ids_completados = set()
+            
+            for contenido_parcial in contenidos_parciales:
+                # La tarea pendiente más antigua que contenga el texto (case insensitive)
+                busqueda = contenido_parcial.lower()
+                tarea = next((t for t in contenidos
+                              if t[0] not in ids_completados and busqueda in t[2]), None)
                 
                 if tarea:
-                    # Marcar como completada
-                    success = self.actualizar_status(tarea['id'], 'completado')
-                    if success:
-                        completadas.append({
-                            'id': tarea['id'],
-                            'contenido': tarea['contenido'],
-                            'busqueda': contenido_parcial
-                        })
-                    else:
-                        no_encontradas.append(contenido_parcial)
+                    ids_completados.add(tarea[0])
+                    completadas.append({
+                        'id': tarea[0],
+                        'contenido': tarea[1],
+                        'busqueda': contenido_parcial
+                    })
                 else:
                     no_encontradas.append(contenido_parcial)
+            
+            if ids_completados:
+                placeholders = ", ".join("?" for _ in ids_completados)
+                conn.execute(f"""
+                    UPDATE tareas 
+                    SET status = 'completado', fecha_modificacion = ?
+                    WHERE id IN ({placeholders})
+                """, (ahora_epoch(), *ids_completados))
+                db.invalidar_cache("tareas", user_id)
+        
+        db.execute_write(escribir)
+        
+        if completadas:
+            logger.info(f"{len(completadas)} tareas completadas - Usuario: {user_id}")
         
         return {
             'completadas': completadas,
             'no_encontradas': no_encontradas
         }
     
-    def buscar_por_contenido(self, texto_busqueda: str, user_id: int) -> List[Dict[str, Any]]:
-        """Buscar tareas por contenido (útil para completar múltiples)"""
-        with self.db.get_connection() as conn:
+    def buscar_por_contenido(self, texto_busqueda: str, user_id: int) -> List[TareaRow]:
+        """
+        Buscar tareas por contenido (útil para completar múltiples)
+        
+        Con FTS5 los resultados vienen ordenados por relevancia (bm25) e
+        incluyen un fragmento con las coincidencias marcadas entre corchetes.
+        """
+        db = self.db.para_usuario(user_id)
+        
+        consulta = _fts_query(texto_busqueda, user_id) if db.fts_enabled else None
+        
+        if consulta:
+            with db.connection() as conn:
+                cursor = conn.execute("""
+                    SELECT t.*,
+                           bm25(tareas_fts, 1.0, 0.0) AS relevancia,
+                           snippet(tareas_fts, 0, '[', ']', '…', 12) AS fragmento
+                    FROM tareas_fts
+                    JOIN tareas t ON t.id = tareas_fts.rowid
+                    WHERE tareas_fts MATCH ? AND t.user_id = ?
+                    ORDER BY relevancia
+                """, (consulta, user_id))
+                
+                cursor.row_factory = _FILAS_TAREA
+                return cursor.fetchall()
+        
+        with db.connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM tareas 
                 WHERE user_id = ? 
@@ -390,15 +1116,12 @@ class Tarea:
                 ORDER BY fecha_creacion ASC
             """, (user_id, f"%{texto_busqueda}%"))
             
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            cursor.row_factory = _FILAS_TAREA
+            return cursor.fetchall()
 
-class Nota:
+class Nota(_Modelo):
     """Modelo para manejar notas/anotaciones"""
     
-    def __init__(self, db: Database):
-        self.db = db
-    
     def crear(self, contenido: str, user_id: int, categoria: str = 'general') -> int:
         """
         Crear una nueva nota
@@ -411,47 +1134,101 @@ class Nota:
         Returns:
             ID de la nota creada
         """
-        with self.db.get_connection() as conn:
+        db = self.db.para_usuario(user_id)
+        
+        def escribir(conn: sqlite3.Connection) -> int:
             cursor = conn.execute("""
                 INSERT INTO notas (contenido, categoria, user_id)
                 VALUES (?, ?, ?)
             """, (contenido, categoria, user_id))
             
-            nota_id = cursor.lastrowid
-            conn.commit()
+            db.invalidar_cache("notas", user_id)
+            return cursor.lastrowid
+        
+        nota_id = db.execute_write(escribir)
+        logger.info(f"Nota creada - ID: {nota_id}, Usuario: {user_id}")
+        return nota_id
+    
+    def crear_multiples(self, notas: Sequence[Tuple[str, str]], user_id: int) -> List[int]:
+        """
+        Crear varias notas en una sola transacción
+        
+        Args:
+            notas: Lista de (contenido, categoria)
+            user_id: ID del usuario
             
-            logger.info(f"Nota creada - ID: {nota_id}, Usuario: {user_id}")
-            return nota_id
+        Returns:
+            IDs de las notas creadas, en el mismo orden
+        """
+        db = self.db.para_usuario(user_id)
+        
+        filas = [(contenido, categoria, user_id) for contenido, categoria in notas]
+        
+        def escribir(conn: sqlite3.Connection) -> List[int]:
+            ids = _insertar_lote(conn, """
+                INSERT INTO notas (contenido, categoria, user_id)
+                VALUES (?, ?, ?)
+            """, filas)
+            db.invalidar_cache("notas", user_id)
+            return ids
+        
+        ids = db.execute_write(escribir)
+        logger.info(f"{len(ids)} notas creadas - Usuario: {user_id}")
+        return ids
     
-    def listar_por_usuario(self, user_id: int, categoria: str = None) -> List[Dict[str, Any]]:
+    def listar_por_usuario(self, user_id: int, categoria: str = None, 
+                          after_id: Optional[int] = None, 
+                          limit: Optional[int] = None) -> List[NotaRow]:
         """
-        Listar notas de un usuario
+        Listar notas de un usuario, de la más nueva a la más vieja
         
         Args:
             user_id: ID del usuario
             categoria: Filtrar por categoría (opcional)
+            after_id: Devolver las que siguen a este ID en el orden del listado
+                (paginación por cursor, opcional)
+            limit: Cantidad máxima de resultados (opcional)
             
         Returns:
             Lista de notas
         """
-        with self.db.get_connection() as conn:
+        db = self.db.para_usuario(user_id)
+        
+        def cargar() -> List[NotaRow]:
+            query = "SELECT * FROM notas WHERE user_id = ?"
+            params = [user_id]
+            
             if categoria:
-                cursor = conn.execute("""
-                    SELECT * FROM notas 
-                    WHERE user_id = ? AND categoria = ?
-                    ORDER BY fecha_creacion DESC
-                """, (user_id, categoria))
-            else:
-                cursor = conn.execute("""
-                    SELECT * FROM notas 
-                    WHERE user_id = ?
-                    ORDER BY fecha_creacion DESC
-                """, (user_id,))
+                query += " AND categoria = ?"
+                params.append(categoria)
             
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            with db.connection() as conn:
+                if after_id is not None:
+                    cursor_row = _fila_cursor(conn, "notas", "fecha_creacion", after_id)
+                    if cursor_row is None:
+                        return []
+                    query += " AND (fecha_creacion, id) < (?, ?)"
+                    params.extend(cursor_row)
+                
+                query += " ORDER BY fecha_creacion DESC, id DESC"
+                
+                if limit is not None:
+                    query += " LIMIT ?"
+                    params.append(limit)
+                
+                cursor = conn.execute(query, params)
+                cursor.row_factory = _FILAS_NOTA
+                return cursor.fetchall()
+        
+        return db.cacheado("notas", user_id, (categoria, after_id, limit), cargar)
     
-    def buscar_por_contenido(self, texto_busqueda: str, user_id: int) -> List[Dict[str, Any]]:
+    def iterar_por_usuario(self, user_id: int, categoria: str = None, 
+                           tamano_pagina: int = 100) -> Iterator[NotaRow]:
+        """Recorrer las notas de un usuario de a páginas, sin cargarlas todas en memoria"""
+        return _iterar_paginas(self.listar_por_usuario, tamano_pagina, 
+                               user_id=user_id, categoria=categoria)
+    
+    def buscar_por_contenido(self, texto_busqueda: str, user_id: int) -> List[NotaRow]:
         """
         Buscar notas por contenido
         
@@ -460,9 +1237,28 @@ class Nota:
             user_id: ID del usuario
             
         Returns:
-            Lista de notas que coinciden
+            Lista de notas que coinciden, de la más relevante a la menos
         """
-        with self.db.get_connection() as conn:
+        db = self.db.para_usuario(user_id)
+        
+        consulta = _fts_query(texto_busqueda, user_id) if db.fts_enabled else None
+        
+        if consulta:
+            with db.connection() as conn:
+                cursor = conn.execute("""
+                    SELECT n.*,
+                           bm25(notas_fts, 1.0, 0.0) AS relevancia,
+                           snippet(notas_fts, 0, '[', ']', '…', 12) AS fragmento
+                    FROM notas_fts
+                    JOIN notas n ON n.id = notas_fts.rowid
+                    WHERE notas_fts MATCH ? AND n.user_id = ?
+                    ORDER BY relevancia
+                """, (consulta, user_id))
+                
+                cursor.row_factory = _FILAS_NOTA
+                return cursor.fetchall()
+        
+        with db.connection() as conn:
             cursor = conn.execute("""
                 SELECT * FROM notas 
                 WHERE user_id = ? 
@@ -470,8 +1266,8 @@ class Nota:
                 ORDER BY fecha_creacion DESC
             """, (user_id, f"%{texto_busqueda}%"))
             
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            cursor.row_factory = _FILAS_NOTA
+            return cursor.fetchall()
     
     def eliminar(self, nota_id: int, user_id: int) -> bool:
         """
@@ -484,23 +1280,187 @@ class Nota:
         Returns:
             True si se eliminó, False si no
         """
-        with self.db.get_connection() as conn:
+        db = self.db.para_usuario(user_id)
+        
+        def escribir(conn: sqlite3.Connection) -> bool:
             cursor = conn.execute("""
                 DELETE FROM notas 
                 WHERE id = ? AND user_id = ?
             """, (nota_id, user_id))
             
-            conn.commit()
-            
-            if cursor.rowcount > 0:
-                logger.info(f"Nota eliminada - ID: {nota_id}, Usuario: {user_id}")
-                return True
-            else:
-                logger.warning(f"No se pudo eliminar nota - ID: {nota_id}, Usuario: {user_id}")
+            if cursor.rowcount == 0:
                 return False
+            db.invalidar_cache("notas", user_id)
+            return True
+        
+        if db.execute_write(escribir):
+            logger.info(f"Nota eliminada - ID: {nota_id}, Usuario: {user_id}")
+            return True
+        else:
+            logger.warning(f"No se pudo eliminar nota - ID: {nota_id}, Usuario: {user_id}")
+            return False
+
+class MensajeConversacion(_Modelo):
+    """Mensajes de las conversaciones con la IA (sólo se agregan filas)"""
+    
+    def agregar(self, mensajes: Sequence[Dict[str, Any]], user_id: int, 
+                reemplazar: bool = False) -> List[int]:
+        """
+        Guardar mensajes de una conversación en una sola transacción
+        
+        Args:
+            mensajes: Mensajes en el formato de OpenAI (role, content,
+                tool_calls, tool_call_id); el de system no se guarda
+            user_id: ID del usuario
+            reemplazar: Borrar antes los mensajes anteriores del usuario
+                (la conversación empezó de nuevo)
+            
+        Returns:
+            IDs de los mensajes guardados, en el mismo orden
+        """
+        db = self.db.para_usuario(user_id)
+        
+        filas = [(
+            user_id,
+            mensaje["role"],
+            mensaje.get("content"),
+            json.dumps(mensaje["tool_calls"]) if mensaje.get("tool_calls") else None,
+            mensaje.get("tool_call_id")
+        ) for mensaje in mensajes if mensaje["role"] != "system"]
+        
+        def escribir(conn: sqlite3.Connection) -> List[int]:
+            if reemplazar:
+                conn.execute("DELETE FROM mensajes_conversacion WHERE user_id = ?", (user_id,))
+            return _insertar_lote(conn, """
+                INSERT INTO mensajes_conversacion (user_id, rol, contenido, tool_calls, tool_call_id)
+                VALUES (?, ?, ?, ?, ?)
+            """, filas)
+        
+        return db.execute_write(escribir)
+    
+    def ultimos(self, user_id: int, limite: int) -> List[Dict[str, Any]]:
+        """
+        Últimos mensajes de un usuario, del más viejo al más nuevo
+        
+        Returns:
+            Mensajes en el formato de OpenAI
+        """
+        db = self.db.para_usuario(user_id)
+        
+        with db.connection() as conn:
+            cursor = conn.execute("""
+                SELECT rol, contenido, tool_calls, tool_call_id FROM mensajes_conversacion 
+                WHERE user_id = ? 
+                ORDER BY id DESC 
+                LIMIT ?
+            """, (user_id, limite))
+            cursor.row_factory = None
+            filas = cursor.fetchall()
+        
+        mensajes = []
+        for rol, contenido, tool_calls, tool_call_id in reversed(filas):
+            mensaje = {"role": rol, "content": contenido}
+            if tool_calls is not None:
+                mensaje["tool_calls"] = json.loads(tool_calls)
+            if tool_call_id is not None:
+                mensaje["tool_call_id"] = tool_call_id
+            mensajes.append(mensaje)
+        return mensajes
+    
+    def borrar_usuario(self, user_id: int) -> int:
+        """Borrar la conversación guardada de un usuario (devuelve cuántos mensajes)"""
+        db = self.db.para_usuario(user_id)
+        
+        def escribir(conn: sqlite3.Connection) -> int:
+            return conn.execute("DELETE FROM mensajes_conversacion WHERE user_id = ?", 
+                                (user_id,)).rowcount
+        
+        return db.execute_write(escribir)
+
+def _crear_database():
+    """Instancia global: una sola base, o shards por usuario si DB_SHARDS > 0"""
+    opciones = {
+        "write_behind": os.getenv('DB_WRITE_BEHIND', 'false').lower() in ('1', 'true'),
+        "grupo_max_ms": float(os.getenv('DB_WRITE_GROUP_MS', '0')),
+    }
+    if os.getenv('DB_QUERY_STATS', 'false').lower() in ('1', 'true'):
+        # Una sola instancia: con sharding la comparten todos los shards
+        opciones["estadisticas"] = EstadisticasSQL(
+            float(os.getenv('DB_SLOW_QUERY_MS', DEFAULT_UMBRAL_LENTO_MS))
+        )
+    shards = int(os.getenv('DB_SHARDS', '0'))
+    if shards > 0:
+        from .shards import ShardedDatabase, DEFAULT_SHARD_MAP
+        return ShardedDatabase(os.getenv('DB_SHARD_MAP', DEFAULT_SHARD_MAP), total=shards, **opciones)
+    return Database(url=Config.DATABASE_URL, **opciones)
+
+# Base global, creada con _crear_database() la primera vez que se usa
+_database: Optional[Database] = None
+_database_lock = threading.Lock()
+
+# Base de usar_database(): una contextvar, así llega también a los hilos del
+# executor de async_models y no se mezcla entre tests que corren en paralelo
+_database_contexto: ContextVar[Optional[Database]] = ContextVar("database", default=None)
+
+def obtener_database() -> Database:
+    """Base que usan los modelos sin base propia (la crea si todavía no existe)"""
+    global _database
+    db = _database_contexto.get()
+    if db is not None:
+        return db
+    
+    db = _database
+    if db is None:
+        with _database_lock:
+            if _database is None:
+                _database = _crear_database()
+            db = _database
+    return db
+
+def configurar_database(db: Optional[Database]) -> Optional[Database]:
+    """
+    Reemplazar la base global
+    
+    Args:
+        db: Nueva base (ej: Database(":memory:")). Con None se vuelve a crear
+            la de la configuración la próxima vez que se use
+    
+    Returns:
+        La base anterior, si se había creado (cerrarla queda a cargo de quien llama)
+    """
+    global _database
+    with _database_lock:
+        anterior, _database = _database, db
+    return anterior
+
+@contextmanager
+def usar_database(db: Database) -> Iterator[Database]:
+    """
+    Hacer que los modelos globales usen `db` dentro del bloque
+    
+    Sólo afecta al contexto actual (el hilo o la tarea de asyncio, y lo que
+    se lance desde ahí con AsyncModel): ej. cada test con su propia base.
+    """
+    token = _database_contexto.set(db)
+    try:
+        yield db
+    finally:
+        _database_contexto.reset(token)
+
+def cerrar_database():
+    """Cerrar la base global, si llegó a crearse (llamar al apagar el bot)"""
+    db = configurar_database(None)
+    if db is not None:
+        db.close()
+
+def __getattr__(nombre: str):
+    # Compatibilidad con `from .models import database` (crea la base al importar)
+    if nombre == "database":
+        return obtener_database()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
-# Instancia global de la base de datos
-database = Database()
-recordatorio_model = Recordatorio(database)
-tarea_model = Tarea(database)
-nota_model = Nota(database)
\ No newline at end of file
+# Modelos globales: usan la base de obtener_database() en cada operación
+recordatorio_model = Recordatorio()
+tarea_model = Tarea()
+nota_model = Nota()
+mensaje_conversacion_model = MensajeConversacion()
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+Motores de almacenamiento de Database
+
+Database no abre las conexiones por su cuenta: se las pide a un motor, que
+se elige según la URL de la base (Config.DATABASE_URL).
+
+- SQLiteEngine: sqlite3 directo sobre un archivo, sin pool. Es el camino
+  rápido y el que se usa con una URL `sqlite:///ruta`. Con la ruta
+  ":memory:" la base vive en memoria (útil para tests y benchmarks).
+- SQLAlchemyEngine: conexiones DBAPI prestadas por un pool de SQLAlchemy
+  Core (QueuePool, también para SQLite en memoria). Se usa con cualquier
+  otra URL, ej: `sqlite+pysqlite:///ruta` o `sqlite://`.
+
+Con sqlite3 directo cada hilo se queda con su conexión (per_thread); con un
+pool, Database pide prestada una conexión por lectura, transacción o unidad
+de trabajo y la devuelve al terminar.
+
+Los modelos trabajan con la conexión del driver tal cual (execute,
+in_transaction, row_factory) y su SQL es dialecto SQLite (FTS5, PRAGMAs,
+datetime()), así que por ahora el motor SQLAlchemy sólo acepta URLs sqlite.
+"""
+import itertools
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional, Type
+
+from loguru import logger
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+# Se llama con cada conexión nueva del driver (PRAGMAs, row_factory)
+Preparar = Callable[[sqlite3.Connection], None]
+
+MEMORIA = ":memory:"
+
+# Nombres únicos para las bases en memoria de cada motor
+_bases_en_memoria = itertools.count(1)
+
+def _uri_en_memoria() -> str:
+    """
+    Base en memoria con nombre en el VFS memdb
+
+    Cada conexión a ":memory:" sería una base vacía distinta; a esta URI se
+    conectan todas las del motor, cada una con su transacción (locks
+    normales, no los de shared cache), igual que sobre un archivo.
+    """
+    return f"file:/nelida-{os.getpid()}-{next(_bases_en_memoria)}?vfs=memdb"
+
+class StorageEngine:
+    """Origen de las conexiones de Database"""
+
+    # Archivo de la base, si la base vive en uno
+    path: Optional[str] = None
+
+    # Si cada hilo se queda con su conexión (True) o se piden prestadas por
+    # operación y se devuelven al terminar (False, con un pool)
+    per_thread: bool = True
+
+    def connect(self) -> sqlite3.Connection:
+        """Conexión lista para usar (devolverla con release)"""
+        raise NotImplementedError
+
+    def release(self, conn: sqlite3.Connection):
+        """Devolver una conexión obtenida con connect"""
+        raise NotImplementedError
+
+    def dispose(self):
+        """Liberar los recursos del motor (las conexiones ya devueltas)"""
+
+class SQLiteEngine(StorageEngine):
+    """sqlite3 directo: cada connect abre una conexión y release la cierra"""
+
+    def __init__(self, path: str, preparar: Preparar,
+                 factory: Type[sqlite3.Connection] = sqlite3.Connection):
+        """
+        Args:
+            path: Archivo de la base, o ":memory:" para una base en memoria
+            preparar: Se aplica a cada conexión nueva
+            factory: Clase de las conexiones (ej: ConexionInstrumentada)
+        """
+        self._preparar = preparar
+        self._factory = factory
+        self._ancla: Optional[sqlite3.Connection] = None
+
+        if path == MEMORIA:
+            # La conexión ancla mantiene viva la base hasta dispose()
+            self.path = None
+            self._uri = _uri_en_memoria()
+            self._ancla = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        else:
+            self.path = path
+            self._uri = None
+
+    def connect(self) -> sqlite3.Connection:
+        # check_same_thread=False para poder cerrarlas desde close() al apagar
+        if self._uri is not None:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False,
+                                   factory=self._factory)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False, factory=self._factory)
+        self._preparar(conn)
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        conn.close()
+
+    def dispose(self):
+        ancla, self._ancla = self._ancla, None
+        if ancla is not None:
+            ancla.close()
+
+    def __repr__(self) -> str:
+        return f"SQLiteEngine({self.path or MEMORIA!r})"
+
+class SQLAlchemyEngine(StorageEngine):
+    """Conexiones tomadas de un pool de SQLAlchemy Core"""
+
+    per_thread = False
+
+    def __init__(self, url: str, preparar: Preparar,
+                 factory: Type[sqlite3.Connection] = sqlite3.Connection, pool_size: int = 5,
+                 max_overflow: int = 10, pool_timeout: float = 30):
+        """
+        Args:
+            url: URL de SQLAlchemy (dialecto sqlite)
+            preparar: Se aplica una vez a cada conexión que abre el pool
+            factory: Clase de las conexiones del driver (ej: ConexionInstrumentada)
+            pool_size: Conexiones que el pool mantiene abiertas
+            max_overflow: Conexiones extra permitidas en picos
+            pool_timeout: Segundos que se espera una conexión libre
+        """
+        url_sa = make_url(url)
+        self.url = url_sa
+        memoria = url_sa.database in (None, "", ":memory:")
+        self.path = None if memoria else url_sa.database
+
+        opciones = {"poolclass": QueuePool, "pool_size": pool_size,
+                    "max_overflow": max_overflow, "pool_timeout": pool_timeout}
+        self._ancla: Optional[sqlite3.Connection] = None
+        if memoria:
+            # Las conexiones del pool van a una base con nombre en memdb (ver
+            # _uri_en_memoria); el ancla la mantiene viva hasta dispose()
+            uri = _uri_en_memoria()
+            self._ancla = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            opciones["creator"] = lambda: sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                                          factory=factory)
+        self.engine = create_engine(url_sa, connect_args={"check_same_thread": False,
+                                                          "factory": factory},
+                                    **opciones)
+        event.listen(self.engine, "connect", lambda conn, registro: preparar(conn))
+
+        # Conexiones prestadas -> proxies del pool a los que hay que devolverlas
+        self._prestadas: Dict[int, List] = {}
+        self._lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        proxy = self.engine.raw_connection()
+        conn = proxy.driver_connection
+        with self._lock:
+            self._prestadas.setdefault(id(conn), []).append(proxy)
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        with self._lock:
+            proxies = self._prestadas.get(id(conn))
+            proxy = proxies.pop() if proxies else None
+            if proxies == []:
+                del self._prestadas[id(conn)]
+        if proxy is None:
+            logger.warning("Se devolvió al pool una conexión que no había prestado")
+            return
+        proxy.close()
+
+    def dispose(self):
+        self.engine.dispose()
+        ancla, self._ancla = self._ancla, None
+        if ancla is not None:
+            ancla.close()
+
+    def __repr__(self) -> str:
+        return f"SQLAlchemyEngine({self.url.render_as_string(hide_password=True)!r})"
+
+def crear_motor(url: str, preparar: Preparar,
+                factory: Type[sqlite3.Connection] = sqlite3.Connection,
+                **opciones_pool) -> StorageEngine:
+    """
+    Elegir el motor para una URL de base de datos
+
+    `sqlite:///ruta` usa sqlite3 directo; cualquier otra URL sqlite (con
+    driver explícito, en memoria o con parámetros) pasa por SQLAlchemy.
+
+    Raises:
+        ValueError: Si la URL no es de SQLite
+    """
+    url_sa = make_url(url)
+    if url_sa.get_backend_name() != "sqlite":
+        raise ValueError(f"Base de datos no soportada: {url_sa.get_backend_name()} "
+                         "(los modelos usan SQL del dialecto SQLite)")
+
+    if (url_sa.drivername == "sqlite" and not url_sa.query
+            and url_sa.database not in (None, "", ":memory:")):
+        return SQLiteEngine(url_sa.database, preparar, factory)
+    return SQLAlchemyEngine(url, preparar, factory, **opciones_pool)
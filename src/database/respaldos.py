@@ -0,0 +1,171 @@
+"""
+Respaldos en caliente de la base con la API de backup de SQLite
+
+Copiar el archivo mientras el bot escribe puede dejar una copia corrupta
+(y sin el contenido del WAL). Acá la copia se hace con sqlite3.backup() de a
+tandas de páginas, con una pausa entre tandas: cada paso toma la base sólo
+un momento y las escrituras del bot siguen mientras tanto.
+
+Cada respaldo es un directorio con la fecha (data/backups/20261017-033000/)
+con un archivo por base (uno por shard si hay sharding). Se conservan los
+últimos `conservar`.
+"""
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from loguru import logger
+
+DEFAULT_DIR_RESPALDOS = "data/backups"
+DEFAULT_CONSERVAR = 7
+
+# 64 páginas de 4 KB por paso (256 KB) y 10 ms de pausa entre pasos
+PAGINAS_POR_PASO = 64
+PAUSA_ENTRE_PASOS = 0.01
+
+# Si otra conexión escribe, SQLite reinicia la copia incremental desde el
+# principio. Después de tantos reinicios se copia lo que falta de una vez
+# (en WAL una lectura larga no bloquea a los que escriben)
+MAX_REINICIOS = 3
+
+_NOMBRE_RESPALDO = re.compile(r"^\d{8}-\d{6}$")
+
+# Un respaldo por vez
+_en_curso = threading.Lock()
+
+# progreso(archivo, páginas copiadas, páginas totales)
+Progreso = Callable[[str, int, int], None]
+
+class RespaldoEnCurso(RuntimeError):
+    """Ya hay un respaldo corriendo"""
+
+class _DemasiadosReinicios(Exception):
+    pass
+
+def respaldar(database: Any, directorio: str = DEFAULT_DIR_RESPALDOS,
+              conservar: int = DEFAULT_CONSERVAR, paginas_por_paso: int = PAGINAS_POR_PASO,
+              pausa: float = PAUSA_ENTRE_PASOS, progreso: Optional[Progreso] = None) -> Dict[str, Any]:
+    """
+    Respaldar todas las bases (todos los shards) sin detener el bot
+
+    Args:
+        database: Database o ShardedDatabase
+        directorio: Dónde guardar los respaldos
+        conservar: Cuántos respaldos mantener (los más viejos se borran)
+        paginas_por_paso: Páginas copiadas en cada paso
+        pausa: Segundos de espera entre pasos
+        progreso: Se llama después de cada paso
+
+    Returns:
+        Dict con directorio, archivos, bytes, segundos y reinicios
+
+    Raises:
+        RespaldoEnCurso: Si ya hay otro respaldo corriendo
+    """
+    if not _en_curso.acquire(blocking=False):
+        raise RespaldoEnCurso("Ya hay un respaldo en curso")
+
+    try:
+        inicio = time.monotonic()
+        destino = os.path.join(directorio, datetime.now().strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(destino, exist_ok=True)
+
+        archivos = []
+        reinicios = 0
+        for db in database.todas():
+            nombre = os.path.basename(db.db_path) if db.db_path else "nelida.db"
+            ruta = os.path.join(destino, nombre)
+            reinicios += _copiar(db, ruta, paginas_por_paso, pausa, progreso)
+            archivos.append(ruta)
+
+        resultado = {
+            "directorio": destino,
+            "archivos": archivos,
+            "bytes": sum(os.path.getsize(ruta) for ruta in archivos),
+            "segundos": time.monotonic() - inicio,
+            "reinicios": reinicios,
+        }
+        borrados = rotar(directorio, conservar)
+        logger.info(f"💾 Respaldo en {destino}: {len(archivos)} archivo(s), "
+                    f"{resultado['bytes'] / 1024 / 1024:.1f} MB en {resultado['segundos']:.1f} s"
+                    f"{f', {borrados} respaldos viejos borrados' if borrados else ''}")
+        return resultado
+    finally:
+        _en_curso.release()
+
+def _copiar(db: Any, ruta: str, paginas_por_paso: int, pausa: float,
+            progreso: Optional[Progreso]) -> int:
+    """
+    Copiar una base a `ruta` con la API de backup
+
+    La copia se escribe en un archivo temporal, se verifica con quick_check
+    y recién entonces se renombra: un respaldo a medias nunca queda con el
+    nombre final.
+
+    Returns:
+        Cantidad de veces que SQLite reinició la copia
+    """
+    nombre = os.path.basename(ruta)
+    temporal = f"{ruta}.parcial"
+    reinicios = 0
+    restantes_antes = None
+
+    def avance(status: int, restantes: int, total: int):
+        nonlocal reinicios, restantes_antes
+        if restantes_antes is not None and restantes > restantes_antes:
+            reinicios += 1
+            if reinicios > MAX_REINICIOS:
+                raise _DemasiadosReinicios()
+        restantes_antes = restantes
+        if progreso is not None:
+            progreso(nombre, total - restantes, total)
+
+    # Conexión propia: la copia no ocupa la conexión de ningún hilo del bot
+    origen = db._connect()
+    copia = sqlite3.connect(temporal)
+    try:
+        try:
+            origen.backup(copia, pages=paginas_por_paso, progress=avance, sleep=pausa)
+        except _DemasiadosReinicios:
+            logger.warning(f"Respaldo de {nombre}: la base cambió {MAX_REINICIOS} veces "
+                           "durante la copia, se copia de una vez")
+            origen.backup(copia)
+
+        resultado = copia.execute("PRAGMA quick_check").fetchone()[0]
+        if resultado != "ok":
+            raise sqlite3.DatabaseError(f"El respaldo de {nombre} no pasó quick_check: {resultado}")
+    except BaseException:
+        copia.close()
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    else:
+        copia.close()
+        os.replace(temporal, ruta)
+    finally:
+        db._release(origen)
+
+    return reinicios
+
+def listar_respaldos(directorio: str = DEFAULT_DIR_RESPALDOS) -> List[str]:
+    """Directorios de respaldo, del más viejo al más nuevo"""
+    if not os.path.isdir(directorio):
+        return []
+    return sorted(os.path.join(directorio, nombre) for nombre in os.listdir(directorio)
+                  if _NOMBRE_RESPALDO.match(nombre))
+
+def rotar(directorio: str = DEFAULT_DIR_RESPALDOS, conservar: int = DEFAULT_CONSERVAR) -> int:
+    """
+    Borrar los respaldos más viejos, dejando los últimos `conservar`
+
+    Returns:
+        Cantidad de respaldos borrados
+    """
+    viejos = listar_respaldos(directorio)[:-conservar] if conservar > 0 else []
+    for ruta in viejos:
+        shutil.rmtree(ruta, ignore_errors=True)
+    return len(viejos)
@@ -0,0 +1,353 @@
+"""
+Sharding por usuario: los datos de cada usuario viven en uno de N archivos
+
+Con una sola base, el lock de escritura de SQLite serializa los chats de
+todos los usuarios. ShardedDatabase reparte a los usuarios entre varios
+archivos (crc32 del user_id módulo N, salvo los fijados en el mapa) y cada
+shard es un Database completo, con sus conexiones, su caché y su hilo
+escritor: usuarios de distintos shards escriben en paralelo.
+
+El mapa de shards es un JSON:
+
+    {
+        "shards": ["data/shards/nelida_00.db", "data/shards/nelida_01.db"],
+        "usuarios": {"123456": 1}
+    }
+
+"usuarios" fija usuarios a un shard (ej: uno muy activo en un shard propio).
+
+Cada shard entrega IDs de su propio rango (shard i: desde i << 40), así un
+ID identifica una única fila aunque haya varios shards y las búsquedas por
+ID sin user_id pueden recorrerlos todos.
+
+Rebalanceo y migración (con el bot apagado):
+
+    python -m src.database.shards rebalancear 8
+    python -m src.database.shards migrar data/nelida.db
+    python -m src.database.shards fijar 123456 3
+"""
+import argparse
+import json
+import os
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from .migrations import ARCHIVE_TABLES
+from .models import Database
+
+DEFAULT_SHARD_MAP = "data/shards.json"
+
+# Tablas con datos de usuario e IDs AUTOINCREMENT
+TABLAS_USUARIO = ("recordatorios", "tareas", "notas", "mensajes_conversacion")
+
+# Bits del rango de IDs de cada shard
+BITS_RANGO_ID = 40
+
+class ShardedDatabase:
+    """Varias bases SQLite, una por grupo de usuarios"""
+
+    def __init__(self, mapa_path: str = DEFAULT_SHARD_MAP, total: Optional[int] = None,
+                 **opciones_db: Any):
+        """
+        Args:
+            mapa_path: Archivo JSON con el mapa de shards
+            total: Cantidad de shards si el mapa todavía no existe (se crea);
+                para cambiarla en un mapa existente, usar rebalancear()
+            opciones_db: Argumentos para el Database de cada shard
+        """
+        self.mapa_path = mapa_path
+        self._opciones_db = opciones_db
+        # Estadísticas de consultas compartidas por los shards (si se pasaron)
+        self.estadisticas = opciones_db.get("estadisticas")
+        self._abiertas: Dict[int, Database] = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(mapa_path):
+            with open(mapa_path, encoding="utf-8") as f:
+                mapa = json.load(f)
+            self.rutas: List[str] = mapa["shards"]
+            self.fijados: Dict[int, int] = {int(u): int(i) for u, i in mapa.get("usuarios", {}).items()}
+            if total is not None and total != len(self.rutas):
+                logger.warning(f"El mapa {mapa_path} tiene {len(self.rutas)} shards y se pidieron "
+                               f"{total}: se usa el mapa (cambiarlo con rebalancear)")
+        else:
+            if not total:
+                raise ValueError(f"No existe el mapa de shards {mapa_path} y no se indicó cuántos crear")
+            self.rutas = rutas_por_defecto(mapa_path, total)
+            self.fijados = {}
+            self.guardar_mapa()
+
+        logger.info(f"Base con {len(self.rutas)} shards ({mapa_path})")
+
+    def guardar_mapa(self):
+        """Escribir el mapa de shards (reemplazo atómico del archivo)"""
+        directorio = os.path.dirname(self.mapa_path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        temporal = f"{self.mapa_path}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"shards": self.rutas,
+                       "usuarios": {str(u): i for u, i in sorted(self.fijados.items())}},
+                      f, indent=2)
+        os.replace(temporal, self.mapa_path)
+
+    def indice_de(self, user_id: int) -> int:
+        """Shard que le corresponde a un usuario"""
+        indice = self.fijados.get(user_id)
+        if indice is not None:
+            return indice
+        return zlib.crc32(str(user_id).encode()) % len(self.rutas)
+
+    def shard(self, indice: int) -> Database:
+        """Database del shard `indice` (se abre la primera vez que se pide)"""
+        db = self._abiertas.get(indice)
+        if db is None:
+            with self._lock:
+                db = self._abiertas.get(indice)
+                if db is None:
+                    db = Database(self.rutas[indice], **self._opciones_db)
+                    _reservar_rango_ids(db, indice)
+                    self._abiertas[indice] = db
+        return db
+
+    def para_usuario(self, user_id: int) -> Database:
+        """Shard donde viven los datos de un usuario"""
+        return self.shard(self.indice_de(user_id))
+
+    def todas(self, abiertas: bool = False) -> List[Database]:
+        """
+        Todos los shards
+
+        Args:
+            abiertas: Sólo los que ya están abiertos (ej: para estadísticas)
+        """
+        if abiertas:
+            with self._lock:
+                return [self._abiertas[i] for i in sorted(self._abiertas)]
+        return [self.shard(i) for i in range(len(self.rutas))]
+
+    def close(self):
+        """Cerrar todos los shards abiertos"""
+        with self._lock:
+            abiertas = list(self._abiertas.values())
+            self._abiertas.clear()
+        for db in abiertas:
+            db.close()
+
+def rutas_por_defecto(mapa_path: str, total: int) -> List[str]:
+    """Rutas de los shards junto al mapa: shards/nelida_00.db, ..."""
+    directorio = os.path.join(os.path.dirname(mapa_path), "shards")
+    return [os.path.join(directorio, f"nelida_{i:02d}.db") for i in range(total)]
+
+def _rango_ids(indice: int) -> range:
+    return range(indice << BITS_RANGO_ID, (indice + 1) << BITS_RANGO_ID)
+
+def _reservar_rango_ids(db: Database, indice: int):
+    """Hacer que el shard entregue IDs de su rango (no toca los ya entregados)"""
+    inicio = _rango_ids(indice).start
+    if inicio == 0:
+        return
+    with db.transaction() as conn:
+        for tabla in TABLAS_USUARIO:
+            conn.execute("""
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT ?, 0 WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = ?)
+            """, (tabla, tabla))
+            conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ? AND seq < ?",
+                         (inicio, tabla, inicio))
+
+def _ajustar_secuencias(sharded: ShardedDatabase, otras: List[Database] = ()):
+    """
+    Después de mover filas, dejar cada shard entregando IDs de su rango
+
+    Al insertar filas con ID explícito SQLite sube la secuencia del destino
+    hasta ese ID, que puede ser del rango de otro shard. Se recalcula: el
+    próximo ID de cada rango es el mayor ya usado en ese rango en cualquier
+    base (incluidas las tablas de archivo, que conservan los IDs).
+    """
+    bases = sharded.todas() + list(otras)
+    for indice, db in enumerate(sharded.todas()):
+        rango = _rango_ids(indice)
+        for tabla in TABLAS_USUARIO:
+            tablas = [tabla] + ([f"{tabla}_archivo"] if tabla in ARCHIVE_TABLES else [])
+            maximo = rango.start
+            for base in bases:
+                with base.connection() as conn:
+                    for t in tablas:
+                        usado = conn.execute(f"SELECT MAX(id) FROM {t} WHERE id >= ? AND id < ?",
+                                             (rango.start, rango.stop)).fetchone()[0]
+                        if usado is not None:
+                            maximo = max(maximo, usado)
+            with db.transaction() as conn:
+                conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (maximo, tabla))
+
+def _usuarios(db: Database) -> List[int]:
+    """Usuarios con datos en una base (incluidos los archivados)"""
+    tablas = list(TABLAS_USUARIO) + [f"{t}_archivo" for t in ARCHIVE_TABLES]
+    union = " UNION ".join(f"SELECT user_id FROM {t}" for t in tablas)
+    with db.connection() as conn:
+        return [fila[0] for fila in conn.execute(union).fetchall()]
+
+def mover_usuario(origen: Database, destino: Database, user_id: int,
+                  borrar_origen: bool = True) -> int:
+    """
+    Copiar las filas de un usuario a otra base y borrarlas del origen
+
+    Primero se confirma la copia y después el borrado: si se corta en el
+    medio, volver a correrlo termina el movimiento (el destino se limpia
+    antes de copiar). Los IDs se conservan.
+
+    Args:
+        borrar_origen: False para sólo copiar
+
+    Returns:
+        Cantidad de filas movidas
+    """
+    tablas = list(TABLAS_USUARIO) + [f"{t}_archivo" for t in ARCHIVE_TABLES]
+    datos = {}
+    with origen.connection() as conn_origen:
+        for tabla in tablas:
+            cursor = conn_origen.execute(f"SELECT * FROM {tabla} WHERE user_id = ?", (user_id,))
+            cursor.row_factory = None
+            datos[tabla] = ([d[0] for d in cursor.description], cursor.fetchall())
+
+    with destino.transaction() as conn:
+        for tabla, (columnas, filas) in datos.items():
+            conn.execute(f"DELETE FROM {tabla} WHERE user_id = ?", (user_id,))
+            if filas:
+                marcas = ", ".join("?" for _ in columnas)
+                conn.executemany(f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({marcas})", filas)
+
+    if borrar_origen:
+        with origen.transaction() as conn:
+            for tabla in tablas:
+                conn.execute(f"DELETE FROM {tabla} WHERE user_id = ?", (user_id,))
+
+    for db in (origen, destino):
+        for tabla in TABLAS_USUARIO:
+            db.cache.invalidate(tabla, user_id)
+    return sum(len(filas) for _, filas in datos.values())
+
+def rebalancear(sharded: ShardedDatabase, total: int) -> Dict[int, int]:
+    """
+    Cambiar la cantidad de shards y mover a los usuarios que cambian de shard
+
+    Los usuarios fijados se quedan donde están (si su shard sigue existiendo).
+    Correr con el bot apagado.
+
+    Returns:
+        Filas movidas por usuario
+    """
+    if total < 1:
+        raise ValueError("Tiene que haber al menos un shard")
+
+    anteriores = sharded.todas()
+    nuevas = rutas_por_defecto(sharded.mapa_path, total)
+    sharded.rutas = sharded.rutas[:total] + nuevas[len(sharded.rutas):]
+    sharded.fijados = {u: i for u, i in sharded.fijados.items() if i < total}
+
+    movidos = {}
+    for db in anteriores:
+        for user_id in _usuarios(db):
+            destino = sharded.para_usuario(user_id)
+            if destino is not db:
+                movidos[user_id] = mover_usuario(db, destino, user_id)
+
+    # Los shards que sobran quedan vacíos: dejan de estar en el mapa
+    sobrantes = anteriores[total:]
+    with sharded._lock:
+        for indice in range(total, len(anteriores)):
+            sharded._abiertas.pop(indice, None)
+    _ajustar_secuencias(sharded, sobrantes)
+    for db in sobrantes:
+        db.close()
+
+    sharded.guardar_mapa()
+    logger.info(f"Rebalanceo a {total} shards: {len(movidos)} usuarios movidos")
+    return movidos
+
+def migrar_desde(sharded: ShardedDatabase, db_path: str) -> Dict[int, int]:
+    """
+    Repartir entre los shards los datos de una base sin sharding
+
+    La base original no se modifica (sólo se le aplican las migraciones
+    pendientes): se copia de a un usuario. Correr con el bot apagado.
+
+    Returns:
+        Filas copiadas por usuario
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(db_path)
+
+    origen = Database(db_path)
+    copiados = {}
+    try:
+        for user_id in _usuarios(origen):
+            copiados[user_id] = mover_usuario(origen, sharded.para_usuario(user_id), user_id,
+                                              borrar_origen=False)
+        _ajustar_secuencias(sharded, [origen])
+    finally:
+        origen.close()
+
+    logger.info(f"Migración desde {db_path}: {len(copiados)} usuarios en {len(sharded.rutas)} shards")
+    return copiados
+
+def fijar_usuario(sharded: ShardedDatabase, user_id: int, indice: int) -> int:
+    """
+    Fijar un usuario a un shard y mover sus datos ahí
+
+    Returns:
+        Cantidad de filas movidas
+    """
+    if not 0 <= indice < len(sharded.rutas):
+        raise ValueError(f"Shard inexistente: {indice}")
+    origen = sharded.para_usuario(user_id)
+    sharded.fijados[user_id] = indice
+    destino = sharded.shard(indice)
+    movidas = mover_usuario(origen, destino, user_id) if destino is not origen else 0
+    _ajustar_secuencias(sharded)
+    sharded.guardar_mapa()
+    logger.info(f"Usuario {user_id} fijado al shard {indice} ({movidas} filas movidas)")
+    return movidas
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Administración de los shards de la base")
+    parser.add_argument("--mapa", default=os.getenv("DB_SHARD_MAP", DEFAULT_SHARD_MAP),
+                        help="Archivo JSON con el mapa de shards")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    rebalanceo = comandos.add_parser("rebalancear", help="Cambiar la cantidad de shards")
+    rebalanceo.add_argument("total", type=int)
+
+    migracion = comandos.add_parser("migrar", help="Repartir una base sin sharding en los shards")
+    migracion.add_argument("db_path")
+    migracion.add_argument("--total", type=int, default=int(os.getenv("DB_SHARDS", "0")) or None,
+                           help="Cantidad de shards si el mapa no existe")
+
+    fijado = comandos.add_parser("fijar", help="Fijar un usuario a un shard")
+    fijado.add_argument("user_id", type=int)
+    fijado.add_argument("indice", type=int)
+
+    args = parser.parse_args(argv)
+    total = args.total if args.comando == "migrar" else None
+    if args.comando == "rebalancear" and not os.path.exists(args.mapa):
+        total = args.total
+    sharded = ShardedDatabase(args.mapa, total=total)
+    try:
+        if args.comando == "rebalancear":
+            movidos = rebalancear(sharded, args.total)
+            print(f"{len(movidos)} usuarios movidos, {sum(movidos.values())} filas")
+        elif args.comando == "migrar":
+            copiados = migrar_desde(sharded, args.db_path)
+            print(f"{len(copiados)} usuarios copiados, {sum(copiados.values())} filas")
+        else:
+            movidas = fijar_usuario(sharded, args.user_id, args.indice)
+            print(f"Usuario {args.user_id} en el shard {args.indice} ({movidas} filas movidas)")
+    finally:
+        sharded.close()
+
+if __name__ == "__main__":
+    main()
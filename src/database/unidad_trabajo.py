@@ -0,0 +1,162 @@
+"""
+Unidad de trabajo: todas las escrituras de un turno en una sola transacción
+
+Mientras hay una unidad activa (una contextvar, así llega también a los
+hilos del executor de async_models), Database hace que las lecturas y
+escrituras de los modelos usen la conexión de la unidad. La transacción
+empieza con la primera escritura y se confirma al salir del bloque; si el
+bloque lanza una excepción o se marca como fallida, se deshace entera.
+
+Si varias operaciones del turno corren a la vez (ej: las funciones que pidió
+la IA), cada una puede saber cuántas escrituras hizo, y cuántas fallaron
+(aunque haya atrapado la excepción), con contar_escrituras().
+
+Una vez terminada, la unidad no acepta más escrituras (UnidadTerminada): un
+hilo que siguió corriendo después del turno no puede abrir una transacción
+que nadie va a confirmar. El trabajo que puede sobrevivir al bloque (ej: un
+hilo que no se puede cortar) se lanza con contexto_sin_unidad().
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextvars import Context, ContextVar, copy_context
+from typing import Any, Iterator, Optional, Set, Tuple
+from loguru import logger
+
+_unidad_actual: ContextVar[Optional["UnidadDeTrabajo"]] = ContextVar("unidad_de_trabajo", default=None)
+_contador_actual: ContextVar[Optional["ContadorEscrituras"]] = ContextVar("contador_escrituras", default=None)
+
+class UnidadTerminada(RuntimeError):
+    """Se quiso escribir en una unidad de trabajo ya confirmada o deshecha"""
+
+class ContadorEscrituras:
+    """Escrituras hechas y fallidas dentro de un bloque contar_escrituras()"""
+    __slots__ = ("escrituras", "fallidas")
+
+    def __init__(self):
+        self.escrituras = 0
+        self.fallidas = 0
+
+class UnidadDeTrabajo:
+    """Conexión y transacción compartidas por todas las operaciones de un turno"""
+
+    def __init__(self, db: Any):
+        self.db = db
+        self.conn: Optional[sqlite3.Connection] = None
+        # Las operaciones del turno pueden llegar desde distintos hilos
+        self.lock = threading.RLock()
+        self.escrituras = 0
+        self.motivo_fallo: Optional[str] = None
+        self.terminada = False
+        self._invalidaciones: Set[Tuple[str, int]] = set()
+
+    @property
+    def fallida(self) -> bool:
+        return self.motivo_fallo is not None
+
+    def marcar_fallida(self, motivo: str):
+        """Hacer que la unidad se deshaga al terminar (se queda el primer motivo)"""
+        if self.motivo_fallo is None:
+            self.motivo_fallo = motivo
+
+    def empezar(self) -> sqlite3.Connection:
+        """
+        Conexión de la unidad con la transacción de escritura abierta
+
+        Raises:
+            UnidadTerminada: Si la unidad ya se confirmó o deshizo
+        """
+        if self.terminada:
+            raise UnidadTerminada("La unidad de trabajo ya terminó: la escritura llegó tarde")
+        if self.conn is None:
+            self.conn = self.db._connect()
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def registrar_escritura(self):
+        """Contar una escritura confirmada en la unidad (y en el contador del contexto)"""
+        self.escrituras += 1
+        contador = _contador_actual.get()
+        if contador is not None:
+            contador.escrituras += 1
+
+    def registrar_falla(self):
+        """Contar una escritura deshecha por un error (en el contador del contexto)"""
+        contador = _contador_actual.get()
+        if contador is not None:
+            contador.fallidas += 1
+
+    def invalidar_cache(self, tabla: str, user_id: int):
+        """Postergar la invalidación de la caché hasta el commit"""
+        self._invalidaciones.add((tabla, user_id))
+
+    def _terminar(self, confirmar: bool):
+        self.terminada = True
+        if self.conn is None:
+            return
+        try:
+            if confirmar:
+                self.conn.commit()
+                for tabla, user_id in self._invalidaciones:
+                    self.db.cache.invalidate(tabla, user_id)
+            else:
+                self.conn.rollback()
+                if self.escrituras:
+                    logger.warning(f"Unidad de trabajo deshecha ({self.escrituras} escrituras): "
+                                   f"{self.motivo_fallo or 'excepción'}")
+        finally:
+            self.db._release(self.conn)
+            self.conn = None
+
+@contextmanager
+def unidad_de_trabajo(db: Any) -> Iterator[UnidadDeTrabajo]:
+    """
+    Agrupar en una transacción las operaciones del bloque sobre `db`
+
+    Si ya hay una unidad activa para esa base, el bloque se suma a ella.
+    """
+    actual = _unidad_actual.get()
+    if actual is not None and actual.db is db:
+        yield actual
+        return
+
+    unidad = UnidadDeTrabajo(db)
+    token = _unidad_actual.set(unidad)
+    try:
+        yield unidad
+    except BaseException:
+        with unidad.lock:
+            unidad._terminar(confirmar=False)
+        raise
+    else:
+        with unidad.lock:
+            unidad._terminar(confirmar=not unidad.fallida)
+    finally:
+        _unidad_actual.reset(token)
+
+@contextmanager
+def contar_escrituras() -> Iterator[ContadorEscrituras]:
+    """
+    Contar las escrituras del bloque en la unidad de trabajo
+
+    El contador va en una contextvar: cada tarea de asyncio (y los hilos del
+    executor que llama) cuenta sólo las suyas aunque corran a la vez.
+    """
+    contador = ContadorEscrituras()
+    token = _contador_actual.set(contador)
+    try:
+        yield contador
+    finally:
+        _contador_actual.reset(token)
+
+def contexto_sin_unidad() -> Context:
+    """Copia del contexto actual sin la unidad de trabajo (el resto de las contextvars sigue)"""
+    ctx = copy_context()
+    ctx.run(_unidad_actual.set, None)
+    return ctx
+
+def unidad_actual(db: Any) -> Optional[UnidadDeTrabajo]:
+    """Unidad de trabajo activa para `db` en este contexto, si hay una"""
+    unidad = _unidad_actual.get()
+    return unidad if unidad is not None and unidad.db is db else None
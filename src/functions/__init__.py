@@ -0,0 +1,13 @@
+"""
+Funciones de Nélida: las herramientas para la IA, las notificaciones y el despachador
+"""
+
+# Módulos con herramientas declaradas con @herramienta (se importan en la primera conversación)
+MODULOS_HERRAMIENTAS = (
+    "src.functions.recordatorios",
+    "src.functions.busquedas",
+    "src.functions.fecha_tiempo",
+    "src.functions.rss_feeds",
+    "src.functions.tareas",
+    "src.functions.notas",
+)
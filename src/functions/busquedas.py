@@ -1,5 +1,7 @@
 """
 Funciones de búsqueda en internet para function calling con OpenAI
+
+Son sincrónicas (requests bloquea): SimpleAI las ejecuta en su pool de hilos.
 """
 import os
 from typing import Dict, Any, List, Optional
@@ -8,6 +10,7 @@ import requests
 from bs4 import BeautifulSoup
 from loguru import logger
 
+from ..ai.herramientas import herramienta
 from ..utils.bot_logger import bot_logger
 
 class GoogleSearchClient:
@@ -159,7 +162,9 @@ def _should_trigger_search(text: str) -> bool:
     
     return False
 
-async def buscar_en_internet(query: str, num_resultados: int = 5, user_id: int = None) -> Dict[str, Any]:
+# requests tiene su propio timeout de 10-15 s; el de la herramienta cubre además Google y el parseo
+@herramienta(timeout=20)
+def buscar_en_internet(query: str, num_resultados: int = 5, user_id: int = None) -> Dict[str, Any]:
     """
     Buscar información en internet
     
@@ -223,7 +228,8 @@ async def buscar_en_internet(query: str, num_resultados: int = 5, user_id: int =
             "error": f"Error realizando búsqueda: {error_msg}"
         }
 
-async def obtener_contenido_pagina(url: str, user_id: int = None) -> Dict[str, Any]:
+@herramienta(timeout=20)
+def obtener_contenido_pagina(url: str, user_id: int = None) -> Dict[str, Any]:
     """
     Obtener el contenido de una página web específica
     
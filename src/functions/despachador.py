@@ -0,0 +1,191 @@
+"""
+Despachador de recordatorios: entrega cada recordatorio a su hora por Telegram
+
+Los recordatorios pendientes de las próximas horas se cargan en un heap
+ordenado por fecha y el despachador duerme exactamente hasta el primero.
+Los que se crean mientras tanto entran al heap por el aviso del modelo
+(Recordatorio.al_crear), sin consultar la base periódicamente; sólo se
+vuelve a leer la base al terminar la ventana cargada.
+
+Al arrancar se entregan los que quedaron sin notificar mientras el bot
+estaba apagado (hasta `max_atraso`; los más viejos se marcan sin enviar).
+"""
+import asyncio
+import heapq
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Set, Tuple
+from loguru import logger
+from telegram import Bot
+from telegram.error import TelegramError
+
+from ..database.async_models import AsyncModel
+from ..database.models import Recordatorio, recordatorio_model
+from ..utils.fechas import formatear
+
+# (cuándo entregarlo, id, user_id, fecha_recordatorio), en segundos epoch:
+# cuándo es la fecha del recordatorio, o la del próximo intento si falló el envío
+Agendado = Tuple[float, int, int, int]
+
+class ReminderDispatcher:
+    """Entrega de recordatorios a su hora con un heap en memoria"""
+
+    def __init__(self, bot: Bot, modelo: Recordatorio = recordatorio_model,
+                 horizonte: timedelta = timedelta(hours=6),
+                 max_atraso: timedelta = timedelta(hours=24),
+                 reintentos: int = 3, espera_reintento: timedelta = timedelta(minutes=1)):
+        """
+        Args:
+            bot: Bot de Telegram con el que se envían los mensajes
+            modelo: Modelo de recordatorios
+            horizonte: Cuánto hacia adelante se cargan los pendientes
+            max_atraso: Los recordatorios más atrasados que esto (ej: el bot
+                estuvo apagado días) se marcan como notificados sin enviarlos
+            reintentos: Veces que se reintenta un envío fallido
+            espera_reintento: Cuánto esperar antes de reintentar
+        """
+        self.bot = bot
+        self.modelo = modelo
+        self._modelo_async = AsyncModel(modelo)
+        self.horizonte = horizonte
+        self.max_atraso = max_atraso
+        self.reintentos = reintentos
+        self.espera_reintento = espera_reintento
+
+        self._heap: List[Agendado] = []
+        self._agendados: Set[Tuple[int, int]] = set()
+        self._intentos: Dict[int, int] = {}
+        self._hasta = 0.0
+        self._despertar: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self.entregados = 0
+
+    async def start(self):
+        """Cargar los pendientes (incluidos los atrasados) y empezar a despachar"""
+        if self._tarea is not None:
+            logger.warning("El despachador de recordatorios ya está corriendo")
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._despertar = asyncio.Event()
+        self.modelo.al_crear.append(self._al_crear)
+        await self._cargar()
+        self._tarea = asyncio.create_task(self._bucle(), name="despachador-recordatorios")
+        logger.info(f"⏰ Despachador de recordatorios iniciado ({len(self._heap)} agendados)")
+
+    async def stop(self):
+        """Dejar de despachar (lo pendiente se retoma al volver a arrancar)"""
+        if self._al_crear in self.modelo.al_crear:
+            self.modelo.al_crear.remove(self._al_crear)
+        tarea, self._tarea = self._tarea, None
+        if tarea is not None:
+            tarea.cancel()
+            try:
+                await tarea
+            except asyncio.CancelledError:
+                pass
+        self._loop = None
+        logger.info("🛑 Despachador de recordatorios detenido")
+
+    def _al_crear(self, recordatorio_id: int, user_id: int, contenido: str, fecha: int):
+        """Aviso del modelo (llega desde el hilo que creó el recordatorio)"""
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self.agendar, recordatorio_id, user_id, fecha)
+
+    def agendar(self, recordatorio_id: int, user_id: int, fecha: int,
+                cuando: Optional[float] = None):
+        """
+        Agregar un recordatorio al heap (llamar desde el event loop)
+
+        Args:
+            fecha: fecha_recordatorio (segundos epoch)
+            cuando: Cuándo entregarlo, si no es en `fecha` (reintentos)
+        """
+        cuando = fecha if cuando is None else cuando
+        if cuando > self._hasta or (recordatorio_id, fecha) in self._agendados:
+            # Fuera de la ventana (lo levanta la próxima carga) o ya agendado
+            return
+
+        heapq.heappush(self._heap, (cuando, recordatorio_id, user_id, fecha))
+        self._agendados.add((recordatorio_id, fecha))
+        if self._heap[0][1] == recordatorio_id and self._despertar is not None:
+            # Es el nuevo primero: el bucle tiene que recalcular cuánto dormir
+            self._despertar.set()
+
+    async def _cargar(self):
+        """Cargar los pendientes sin notificar hasta el fin de la nueva ventana"""
+        self._hasta = time.time() + self.horizonte.total_seconds()
+        pendientes = await self._modelo_async.obtener_pendientes_hasta(int(self._hasta), sin_notificar=True)
+        for recordatorio in pendientes:
+            self.agendar(recordatorio['id'], recordatorio['user_id'], recordatorio['fecha_recordatorio'])
+
+    async def _bucle(self):
+        while True:
+            try:
+                ahora = time.time()
+                if self._heap and self._heap[0][0] <= ahora:
+                    _, recordatorio_id, user_id, fecha = heapq.heappop(self._heap)
+                    self._agendados.discard((recordatorio_id, fecha))
+                    await self._entregar(recordatorio_id, user_id, fecha)
+                    continue
+
+                if ahora >= self._hasta:
+                    await self._cargar()
+                    continue
+
+                proximo = min(self._heap[0][0], self._hasta) if self._heap else self._hasta
+                self._despertar.clear()
+                try:
+                    await asyncio.wait_for(self._despertar.wait(), proximo - ahora)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Error en el despachador de recordatorios: {e}")
+                await asyncio.sleep(self.espera_reintento.total_seconds())
+
+    async def _entregar(self, recordatorio_id: int, user_id: int, fecha: int):
+        """Enviar un recordatorio vencido, si sigue pendiente y sin notificar"""
+        # Releer la fila: pudo completarse, borrarse o no haberse confirmado
+        actual = await self._modelo_async.obtener_por_id(recordatorio_id, user_id)
+        if actual is None or actual['status'] != 'pendiente' or actual['fecha_notificacion']:
+            return
+
+        fecha_actual = actual['fecha_recordatorio']
+        if fecha_actual != fecha:
+            # El heap tenía otra fecha para ese ID: vale la de la base
+            self.agendar(recordatorio_id, actual['user_id'], fecha_actual)
+            return
+
+        atraso = timedelta(seconds=time.time() - fecha)
+        if atraso > self.max_atraso:
+            logger.warning(f"Recordatorio {recordatorio_id} vencido hace {atraso}, se marca sin enviar")
+            await self._modelo_async.marcar_notificado(recordatorio_id, user_id)
+            return
+
+        texto = f"⏰ Recordatorio: {actual['contenido']}"
+        if atraso > timedelta(minutes=5):
+            texto += f"\n(era para el {formatear(fecha, '%d/%m a las %H:%M')}, perdón la demora)"
+
+        try:
+            await self.bot.send_message(chat_id=user_id, text=texto)
+        except TelegramError as e:
+            intentos = self._intentos.get(recordatorio_id, 0) + 1
+            if intentos > self.reintentos:
+                logger.error(f"❌ No se pudo entregar el recordatorio {recordatorio_id}: {e}")
+                self._intentos.pop(recordatorio_id, None)
+                return
+            logger.warning(f"Error enviando el recordatorio {recordatorio_id} "
+                           f"(intento {intentos}): {e}")
+            self._intentos[recordatorio_id] = intentos
+            self.agendar(recordatorio_id, user_id, fecha,
+                         cuando=time.time() + self.espera_reintento.total_seconds())
+            return
+
+        self._intentos.pop(recordatorio_id, None)
+        await self._modelo_async.marcar_notificado(recordatorio_id, user_id)
+        self.entregados += 1
+        logger.info(f"⏰ Recordatorio {recordatorio_id} entregado a {user_id}")
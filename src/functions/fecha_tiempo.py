@@ -5,8 +5,10 @@ from datetime import datetime, timedelta
 import pytz
 from typing import Dict, Any
 
+from ..ai.herramientas import herramienta
 from ..utils.bot_logger import bot_logger
 
+@herramienta
 def obtener_fecha_actual(user_id: int = None) -> Dict[str, Any]:
     """
     Obtener la fecha y hora actual en Argentina
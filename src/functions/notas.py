@@ -5,8 +5,13 @@ from typing import Dict, Any
 from datetime import datetime
 from loguru import logger
 
-from ..database.models import nota_model
+from ..ai.herramientas import herramienta
+from ..database.async_models import async_nota_model
 
+# Tope de notas por página (también en el esquema de listar_notas)
+MAX_LIMITE = 100
+
+@herramienta(usa_base=True)
 async def crear_nota(contenido: str, user_id: int, categoria: str = "general") -> Dict[str, Any]:
     """
     Crear una nueva nota/anotación
@@ -36,7 +41,7 @@ async def crear_nota(contenido: str, user_id: int, categoria: str = "general") -
                 categoria = categoria_detectada
         
         # Crear la nota
-        nota_id = nota_model.crear(
+        nota_id = await async_nota_model.crear(
             contenido=contenido_limpio,
             user_id=user_id,
             categoria=categoria
@@ -57,27 +62,41 @@ async def crear_nota(contenido: str, user_id: int, categoria: str = "general") -
             "message": f"Error al guardar la nota: {str(e)}"
         }
 
-async def listar_notas(user_id: int, categoria: str = None) -> Dict[str, Any]:
+@herramienta(usa_base=True)
+async def listar_notas(user_id: int, categoria: str = None, limite: int = 50, 
+                       despues_de_id: int = None) -> Dict[str, Any]:
     """
-    Listar notas del usuario
+    Listar notas del usuario, de a una página por vez
     
     Args:
         user_id: ID del usuario
         categoria: Filtrar por categoría específica
+        limite: Cantidad máxima de notas a devolver
+        despues_de_id: ID de la última nota de la página anterior
     
     Returns:
         Dict con lista de notas
     """
     try:
-        notas = nota_model.listar_por_usuario(
+        limite = min(max(limite, 1), MAX_LIMITE)
+        
+        # Pedir una fila de más para saber si hay otra página
+        notas = await async_nota_model.listar_por_usuario(
             user_id=user_id,
-            categoria=categoria
+            categoria=categoria,
+            after_id=despues_de_id,
+            limit=limite + 1
         )
         
+        hay_mas = len(notas) > limite
+        notas = notas[:limite]
+        
         return {
             "success": True,
-            "notas": notas,
+            "notas": [nota.to_dict() for nota in notas],
             "total": len(notas),
+            "hay_mas": hay_mas,
+            "siguiente_despues_de_id": notas[-1]['id'] if hay_mas else None,
             "categoria_filtro": categoria
         }
         
@@ -88,6 +107,7 @@ async def listar_notas(user_id: int, categoria: str = None) -> Dict[str, Any]:
             "message": f"Error al listar notas: {str(e)}"
         }
 
+@herramienta(usa_base=True)
 async def buscar_notas(texto_busqueda: str, user_id: int) -> Dict[str, Any]:
     """
     Buscar notas por contenido
@@ -100,11 +120,11 @@ async def buscar_notas(texto_busqueda: str, user_id: int) -> Dict[str, Any]:
         Dict con notas encontradas
     """
     try:
-        notas = nota_model.buscar_por_contenido(texto_busqueda, user_id)
+        notas = await async_nota_model.buscar_por_contenido(texto_busqueda, user_id)
         
         return {
             "success": True,
-            "notas": notas,
+            "notas": [nota.to_dict() for nota in notas],
             "total": len(notas),
             "busqueda": texto_busqueda
         }
@@ -116,6 +136,7 @@ async def buscar_notas(texto_busqueda: str, user_id: int) -> Dict[str, Any]:
             "message": f"Error al buscar notas: {str(e)}"
         }
 
+@herramienta(usa_base=True)
 async def eliminar_nota(nota_id: int, user_id: int) -> Dict[str, Any]:
     """
     Eliminar una nota específica
@@ -128,7 +149,7 @@ async def eliminar_nota(nota_id: int, user_id: int) -> Dict[str, Any]:
         Dict con resultado de la eliminación
     """
     try:
-        success = nota_model.eliminar(nota_id, user_id)
+        success = await async_nota_model.eliminar(nota_id, user_id)
         
         if success:
             return {
@@ -219,6 +240,16 @@ NOTA_FUNCTIONS = {
                         "type": "string",
                         "enum": ["general", "trabajo", "personal", "ideas", "estudio"],
                         "description": "Filtrar por categoría específica"
+                    },
+                    "limite": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": MAX_LIMITE,
+                        "description": f"Cantidad máxima de notas a mostrar (por defecto 50, hasta {MAX_LIMITE})"
+                    },
+                    "despues_de_id": {
+                        "type": "integer",
+                        "description": "Para ver la página siguiente: el valor 'siguiente_despues_de_id' de la respuesta anterior"
                     }
                 }
             }
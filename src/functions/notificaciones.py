@@ -6,13 +6,18 @@ import asyncio
 import schedule
 import time
 import threading
+from collections import Counter
 from datetime import datetime, timedelta
+from itertools import groupby
 from typing import Optional
 from loguru import logger
 from telegram import Bot
 from telegram.error import TelegramError
 
-from ..database.models import tarea_model
+from ..database.models import obtener_database, tarea_model
+from ..database.mantenimiento import (archivar_finalizados, borrar_conversaciones_viejas, compactar,
+                                      DEFAULT_DIAS_ARCHIVO, DEFAULT_DIAS_CONVERSACION)
+from ..database.respaldos import respaldar, DEFAULT_DIR_RESPALDOS, DEFAULT_CONSERVAR
 
 class NotificationScheduler:
     """Scheduler para notificaciones automáticas"""
@@ -22,6 +27,12 @@ class NotificationScheduler:
         self.admin_user_id = admin_user_id
         self.notification_start = os.getenv('NOTIFICATION_TIME_START', '10:20')
         self.notification_end = os.getenv('NOTIFICATION_TIME_END', '10:40')
+        self.maintenance_time = os.getenv('MAINTENANCE_TIME', '04:00')
+        self.archive_after_days = int(os.getenv('ARCHIVE_AFTER_DAYS', DEFAULT_DIAS_ARCHIVO))
+        self.ai_history_days = int(os.getenv('AI_HISTORY_KEEP_DAYS', DEFAULT_DIAS_CONVERSACION))
+        self.backup_time = os.getenv('BACKUP_TIME', '03:30')
+        self.backup_dir = os.getenv('BACKUP_DIR', DEFAULT_DIR_RESPALDOS)
+        self.backup_keep = int(os.getenv('BACKUP_KEEP', DEFAULT_CONSERVAR))
         self.is_running = False
         self.scheduler_thread = None
         
@@ -38,6 +49,12 @@ class NotificationScheduler:
         # Programar notificación diaria
         schedule.every().day.at(self.notification_start).do(self._send_daily_tasks_notification)
         
+        # Mantenimiento de la base: archivado + ANALYZE diario, VACUUM los domingos
+        schedule.every().day.at(self.maintenance_time).do(self._run_database_maintenance)
+        
+        # Respaldo diario en caliente de la base
+        schedule.every().day.at(self.backup_time).do(self._run_database_backup)
+        
         # Iniciar el scheduler en un hilo separado
         self.scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
         self.scheduler_thread.start()
@@ -113,23 +130,42 @@ class NotificationScheduler:
             logger.error(f"❌ Error enviando notificación diaria: {e}")
             logger.error(f"🔍 Detalles del error: admin_user_id={self.admin_user_id}, hora={datetime.now()}")
     
+    def _run_database_maintenance(self):
+        """Archivar tareas y recordatorios finalizados, borrar conversaciones viejas y compactar la base"""
+        try:
+            # Con sharding, cada shard se mantiene por separado
+            for db in obtener_database().todas():
+                archivadas = archivar_finalizados(db, self.archive_after_days)
+                borrar_conversaciones_viejas(db, self.ai_history_days)
+                compactar(db, vacuum=datetime.now().weekday() == 6)
+                logger.info(f"🧹 Mantenimiento de {db.db_path or 'la base'} completado - archivadas: {archivadas}")
+        except Exception as e:
+            logger.error(f"❌ Error en el mantenimiento de la base: {e}")
+    
+    def _run_database_backup(self):
+        """Respaldar la base y rotar los respaldos viejos"""
+        try:
+            respaldar(obtener_database(), self.backup_dir, self.backup_keep)
+        except Exception as e:
+            logger.error(f"❌ Error respaldando la base: {e}")
+    
     def _crear_mensaje_tareas_pendientes(self, tareas: list) -> str:
         """Crear mensaje con resumen de tareas pendientes"""
         if not tareas:
             return "🎉 ¡Buen día! No tenés tareas pendientes por ahora. ¡Perfecto para empezar el día tranquilo!"
         
-        # Contar tareas por prioridad
-        alta_prioridad = [t for t in tareas if t['prioridad'] == 'alta']
-        media_prioridad = [t for t in tareas if t['prioridad'] == 'media']
-        baja_prioridad = [t for t in tareas if t['prioridad'] == 'baja']
-        
-        # Contar tareas por categoría
-        categorias = {}
-        for tarea in tareas:
-            cat = tarea['categoria']
-            if cat not in categorias:
-                categorias[cat] = 0
-            categorias[cat] += 1
+        # Las tareas ya vienen ordenadas por prioridad (alta, media, baja):
+        # una sola pasada las agrupa por prioridad y las cuenta por categoría
+        por_prioridad = {}
+        categorias = Counter()
+        for prioridad, grupo in groupby(tareas, key=lambda t: t['prioridad']):
+            grupo = list(grupo)
+            por_prioridad[prioridad] = grupo
+            categorias.update(t['categoria'] for t in grupo)
+        
+        alta_prioridad = por_prioridad.get('alta', [])
+        media_prioridad = por_prioridad.get('media', [])
+        baja_prioridad = por_prioridad.get('baja', [])
         
         # Construir mensaje
         mensaje = f"🌅 **Buenos días! Resumen de tareas pendientes**\n\n"
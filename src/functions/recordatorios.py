@@ -6,8 +6,13 @@ import re
 from typing import Dict, Any, List
 from loguru import logger
 
-from ..database.models import recordatorio_model
+from ..ai.herramientas import herramienta
+from ..database.async_models import async_recordatorio_model
 from ..utils.bot_logger import bot_logger
+from ..utils.fechas import ahora_local, formatear
+
+# Tope de recordatorios por respuesta (también en el esquema de listar_recordatorios)
+MAX_LIMITE = 100
 
 def parse_fecha_inteligente(texto_fecha: str) -> datetime:
     """
@@ -15,8 +20,11 @@ def parse_fecha_inteligente(texto_fecha: str) -> datetime:
     
     Args:
         texto_fecha: Texto describiendo la fecha (ej: "mañana", "viernes", "próxima semana")
+    
+    Returns:
+        Fecha con la zona horaria de Buenos Aires
     """
-    now = datetime.now()
+    now = ahora_local()
     texto_lower = texto_fecha.lower().strip()
     
     # Casos específicos
@@ -47,6 +55,7 @@ def parse_fecha_inteligente(texto_fecha: str) -> datetime:
     # Por defecto, mañana
     return now + timedelta(days=1)
 
+@herramienta(usa_base=True)
 async def crear_recordatorio(contenido: str, fecha_texto: str = "mañana", prioridad: str = "media", user_id: int = None) -> Dict[str, Any]:
     """
     Crear un nuevo recordatorio
@@ -62,7 +71,7 @@ async def crear_recordatorio(contenido: str, fecha_texto: str = "mañana", prior
         fecha_recordatorio = parse_fecha_inteligente(fecha_texto)
         
         # Crear en la base de datos
-        recordatorio_id = recordatorio_model.crear(
+        recordatorio_id = await async_recordatorio_model.crear(
             contenido=contenido,
             fecha_recordatorio=fecha_recordatorio,
             user_id=user_id,
@@ -95,17 +104,36 @@ async def crear_recordatorio(contenido: str, fecha_texto: str = "mañana", prior
             "error": str(e)
         }
 
-async def listar_recordatorios(solo_pendientes: bool = False, user_id: int = None) -> Dict[str, Any]:
+@herramienta(usa_base=True)
+async def listar_recordatorios(solo_pendientes: bool = False, incluir_archivo: bool = False, 
+                               limite: int = 50, user_id: int = None) -> Dict[str, Any]:
     """
     Listar recordatorios del usuario
     
     Args:
         solo_pendientes: Si mostrar solo los pendientes
+        incluir_archivo: Incluir los finalizados hace tiempo (archivados)
+        limite: Cantidad máxima de recordatorios a devolver
         user_id: ID del usuario (se pasa automáticamente)
     """
     try:
-        status_filter = "pendiente" if solo_pendientes else None
-        recordatorios = recordatorio_model.listar_por_usuario(user_id, status=status_filter)
+        limite = min(max(limite, 1), MAX_LIMITE)
+        
+        # Una fila de más para saber si quedan otros
+        if incluir_archivo and not solo_pendientes:
+            # Pendientes + historial (finalizados, archivados incluidos)
+            recordatorios = await async_recordatorio_model.listar_por_usuario(
+                user_id, status="pendiente", limit=limite + 1
+            )
+            recordatorios += await async_recordatorio_model.listar_historial(user_id, limit=limite + 1)
+        else:
+            status_filter = "pendiente" if solo_pendientes else None
+            recordatorios = await async_recordatorio_model.listar_por_usuario(
+                user_id, status=status_filter, limit=limite + 1
+            )
+        
+        hay_mas = len(recordatorios) > limite
+        recordatorios = recordatorios[:limite]
         
         # Formatear para la respuesta
         recordatorios_formateados = []
@@ -113,7 +141,7 @@ async def listar_recordatorios(solo_pendientes: bool = False, user_id: int = Non
             recordatorios_formateados.append({
                 "id": rec['id'],
                 "contenido": rec['contenido'],
-                "fecha": rec['fecha_recordatorio'],
+                "fecha": formatear(rec['fecha_recordatorio']),
                 "prioridad": rec['prioridad'],
                 "status": rec['status']
             })
@@ -129,6 +157,7 @@ async def listar_recordatorios(solo_pendientes: bool = False, user_id: int = Non
             "success": True,
             "recordatorios": recordatorios_formateados,
             "total": len(recordatorios),
+            "hay_mas": hay_mas,
             "tipo": tipo
         }
         
@@ -139,6 +168,7 @@ async def listar_recordatorios(solo_pendientes: bool = False, user_id: int = Non
             "error": str(e)
         }
 
+@herramienta(usa_base=True)
 async def completar_recordatorio(recordatorio_id: int, user_id: int = None) -> Dict[str, Any]:
     """
     Marcar un recordatorio como completado
@@ -149,7 +179,7 @@ async def completar_recordatorio(recordatorio_id: int, user_id: int = None) -> D
     """
     try:
         # Verificar que el recordatorio existe y es del usuario
-        recordatorio = recordatorio_model.obtener_por_id(recordatorio_id)
+        recordatorio = await async_recordatorio_model.obtener_por_id(recordatorio_id, user_id)
         if not recordatorio or recordatorio['user_id'] != user_id:
             return {
                 "success": False,
@@ -157,7 +187,7 @@ async def completar_recordatorio(recordatorio_id: int, user_id: int = None) -> D
             }
         
         # Actualizar status
-        success = recordatorio_model.actualizar_status(recordatorio_id, "completado")
+        success = await async_recordatorio_model.actualizar_status(recordatorio_id, "completado", user_id)
         
         if success:
             bot_logger.log_function_call(
@@ -227,6 +257,17 @@ RECORDATORIO_FUNCTIONS = {
                         "type": "boolean",
                         "description": "Si mostrar solo los recordatorios pendientes o todos",
                         "default": False
+                    },
+                    "incluir_archivo": {
+                        "type": "boolean",
+                        "description": "Incluir recordatorios finalizados viejos que ya se archivaron. Usar sólo si piden el historial o algo de hace tiempo",
+                        "default": False
+                    },
+                    "limite": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": MAX_LIMITE,
+                        "description": f"Cantidad máxima de recordatorios a mostrar (por defecto 50, hasta {MAX_LIMITE})"
                     }
                 },
                 "required": []
@@ -1,6 +1,9 @@
 """
 Sistema RSS para noticias argentinas
 Feeds de medios locales para noticias actualizadas en tiempo real
+
+Las funciones son sincrónicas (feedparser bloquea): SimpleAI las ejecuta en
+su pool de hilos.
 """
 import feedparser
 from datetime import datetime, timedelta
@@ -8,6 +11,7 @@ from typing import Dict, Any, List, Optional
 import pytz
 from loguru import logger
 
+from ..ai.herramientas import herramienta
 from ..utils.bot_logger import bot_logger
 
 class RSSManager:
@@ -244,7 +248,8 @@ class RSSManager:
 # Instancia global del manager RSS
 rss_manager = RSSManager()
 
-async def obtener_noticias_hoy(limite: int = 8, user_id: int = None) -> Dict[str, Any]:
+@herramienta
+def obtener_noticias_hoy(limite: int = 8, user_id: int = None) -> Dict[str, Any]:
     """
     Obtener las noticias más importantes de hoy de medios argentinos
     
@@ -306,7 +311,8 @@ async def obtener_noticias_hoy(limite: int = 8, user_id: int = None) -> Dict[str
             "error": f"Error obteniendo noticias: {error_msg}"
         }
 
-async def obtener_noticias_categoria(categoria: str, limite: int = 5, user_id: int = None) -> Dict[str, Any]:
+@herramienta
+def obtener_noticias_categoria(categoria: str, limite: int = 5, user_id: int = None) -> Dict[str, Any]:
     """
     Obtener noticias de una categoría específica
     
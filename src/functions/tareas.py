@@ -5,8 +5,13 @@ import re
 from typing import List, Dict, Any
 from datetime import datetime
 from loguru import logger
-from ..database.models import tarea_model
+from ..ai.herramientas import herramienta
+from ..database.async_models import async_tarea_model
 
+# Tope de tareas por página (también en el esquema de listar_tareas)
+MAX_LIMITE = 100
+
+@herramienta(usa_base=True)
 async def crear_tareas_multiples(texto_tareas: str, user_id: int) -> Dict[str, Any]:
     """
     Crear múltiples tareas desde una sola frase
@@ -28,22 +33,20 @@ async def crear_tareas_multiples(texto_tareas: str, user_id: int) -> Dict[str, A
                 "message": "No pude identificar tareas específicas en el texto, nene"
             }
         
+        # Detectar prioridad y categoría para cada tarea individual
+        tareas_detectadas = [
+            (tarea_texto, detectar_prioridad(tarea_texto), detectar_categoria(tarea_texto))
+            for tarea_texto in tareas_individuales
+        ]
+        
         tareas_creadas = []
         errores = []
         
-        for tarea_texto in tareas_individuales:
-            # Detectar prioridad y categoría para cada tarea individual
-            prioridad = detectar_prioridad(tarea_texto)
-            categoria = detectar_categoria(tarea_texto)
+        try:
+            # Todas las tareas en un solo INSERT masivo y un solo commit
+            tarea_ids = await async_tarea_model.crear_multiples(tareas_detectadas, user_id)
             
-            try:
-                tarea_id = tarea_model.crear(
-                    contenido=tarea_texto,
-                    user_id=user_id,
-                    prioridad=prioridad,
-                    categoria=categoria
-                )
-                
+            for tarea_id, (tarea_texto, prioridad, categoria) in zip(tarea_ids, tareas_detectadas):
                 tareas_creadas.append({
                     "id": tarea_id,
                     "contenido": tarea_texto,
@@ -51,8 +54,8 @@ async def crear_tareas_multiples(texto_tareas: str, user_id: int) -> Dict[str, A
                     "categoria": categoria
                 })
                 
-            except Exception as e:
-                errores.append(f"Error creando '{tarea_texto}': {str(e)}")
+        except Exception as e:
+            errores.append(f"Error creando las tareas: {str(e)}")
         
         return {
             "success": len(tareas_creadas) > 0,
@@ -69,6 +72,7 @@ async def crear_tareas_multiples(texto_tareas: str, user_id: int) -> Dict[str, A
             "message": f"Error al crear las tareas: {str(e)}"
         }
 
+@herramienta(usa_base=True)
 async def crear_tarea(contenido: str, user_id: int, prioridad: str = "media", 
                      categoria: str = "general") -> Dict[str, Any]:
     """
@@ -104,7 +108,7 @@ async def crear_tarea(contenido: str, user_id: int, prioridad: str = "media",
             categoria = categoria_detectada
         
         # Crear la tarea
-        tarea_id = tarea_model.crear(
+        tarea_id = await async_tarea_model.crear(
             contenido=contenido_limpio,
             user_id=user_id,
             prioridad=prioridad,
@@ -127,30 +131,49 @@ async def crear_tarea(contenido: str, user_id: int, prioridad: str = "media",
             "message": f"Error al crear la tarea: {str(e)}"
         }
 
+@herramienta(usa_base=True)
 async def listar_tareas(user_id: int, status: str = "pendiente", 
-                       categoria: str = None) -> Dict[str, Any]:
+                       categoria: str = None, limite: int = 50, 
+                       despues_de_id: int = None, 
+                       incluir_archivo: bool = False) -> Dict[str, Any]:
     """
-    Listar tareas del usuario
+    Listar tareas del usuario, de a una página por vez
     
     Args:
         user_id: ID del usuario
         status: Estado de las tareas (pendiente, completado, cancelado)
         categoria: Filtrar por categoría específica
+        limite: Cantidad máxima de tareas a devolver
+        despues_de_id: ID de la última tarea de la página anterior
+        incluir_archivo: Incluir las finalizadas hace tiempo (archivadas)
     
     Returns:
         Dict con lista de tareas
     """
     try:
-        tareas = tarea_model.listar_por_usuario(
+        limite = min(max(limite, 1), MAX_LIMITE)
+        
+        if incluir_archivo and status != "pendiente":
+            return await _listar_historial_tareas(user_id, status, categoria, limite)
+        
+        # Pedir una fila de más para saber si hay otra página
+        tareas = await async_tarea_model.listar_por_usuario(
             user_id=user_id,
             status=status if status != "todas" else None,
-            categoria=categoria
+            categoria=categoria,
+            after_id=despues_de_id,
+            limit=limite + 1
         )
         
+        hay_mas = len(tareas) > limite
+        tareas = tareas[:limite]
+        
         return {
             "success": True,
-            "tareas": tareas,
+            "tareas": [tarea.to_dict() for tarea in tareas],
             "total": len(tareas),
+            "hay_mas": hay_mas,
+            "siguiente_despues_de_id": tareas[-1]['id'] if hay_mas else None,
             "status_filtro": status,
             "categoria_filtro": categoria
         }
@@ -162,6 +185,36 @@ async def listar_tareas(user_id: int, status: str = "pendiente",
             "message": f"Error al listar tareas: {str(e)}"
         }
 
+async def _listar_historial_tareas(user_id: int, status: str, 
+                                   categoria: str, limite: int) -> Dict[str, Any]:
+    """Listar tareas finalizadas incluyendo el archivo (las más recientes, sin paginar)"""
+    # Filtro y LIMIT en SQL: una fila de más para saber si quedan otras
+    tareas = await async_tarea_model.listar_historial(
+        user_id, status=status if status != "todas" else None, 
+        limit=limite + 1, categoria=categoria
+    )
+    
+    if status == "todas":
+        pendientes = await async_tarea_model.listar_por_usuario(
+            user_id=user_id, status="pendiente", categoria=categoria, limit=limite + 1
+        )
+        tareas = pendientes + tareas
+    
+    hay_mas = len(tareas) > limite
+    tareas = tareas[:limite]
+    
+    return {
+        "success": True,
+        "tareas": [tarea.to_dict() for tarea in tareas],
+        "total": len(tareas),
+        "hay_mas": hay_mas,
+        "siguiente_despues_de_id": None,
+        "status_filtro": status,
+        "categoria_filtro": categoria,
+        "incluye_archivo": True
+    }
+
+@herramienta(usa_base=True)
 async def completar_tareas_multiples(texto_completado: str, user_id: int) -> Dict[str, Any]:
     """
     Marcar múltiples tareas como completadas basándose en texto libre
@@ -184,7 +237,7 @@ async def completar_tareas_multiples(texto_completado: str, user_id: int) -> Dic
             }
         
         # Completar tareas basándose en las palabras clave
-        resultado = tarea_model.completar_multiples(palabras_clave, user_id)
+        resultado = await async_tarea_model.completar_multiples(palabras_clave, user_id)
         
         return {
             "success": True,
@@ -201,6 +254,7 @@ async def completar_tareas_multiples(texto_completado: str, user_id: int) -> Dic
             "message": f"Error al completar tareas: {str(e)}"
         }
 
+@herramienta(usa_base=True)
 async def buscar_tareas(texto_busqueda: str, user_id: int) -> Dict[str, Any]:
     """
     Buscar tareas por contenido
@@ -213,11 +267,11 @@ async def buscar_tareas(texto_busqueda: str, user_id: int) -> Dict[str, Any]:
         Dict con tareas encontradas
     """
     try:
-        tareas = tarea_model.buscar_por_contenido(texto_busqueda, user_id)
+        tareas = await async_tarea_model.buscar_por_contenido(texto_busqueda, user_id)
         
         return {
             "success": True,
-            "tareas": tareas,
+            "tareas": [tarea.to_dict() for tarea in tareas],
             "total": len(tareas),
             "busqueda": texto_busqueda
         }
@@ -479,6 +533,20 @@ TAREA_FUNCTIONS = {
                         "type": "string",
                         "enum": ["general", "trabajo", "casa", "salud", "estudios"],
                         "description": "Filtrar por categoría específica"
+                    },
+                    "limite": {
+                        "type": "integer",
+                        "minimum": 1,
+                        "maximum": MAX_LIMITE,
+                        "description": f"Cantidad máxima de tareas a mostrar (por defecto 50, hasta {MAX_LIMITE})"
+                    },
+                    "despues_de_id": {
+                        "type": "integer",
+                        "description": "Para ver la página siguiente: el valor 'siguiente_despues_de_id' de la respuesta anterior"
+                    },
+                    "incluir_archivo": {
+                        "type": "boolean",
+                        "description": "Incluir tareas finalizadas viejas que ya se archivaron. Usar sólo si piden el historial o algo de hace tiempo"
                     }
                 }
             }
@@ -2,6 +2,7 @@
 Sistema de logging específico para acciones del bot
 """
 import os
+from contextlib import contextmanager
 from datetime import datetime
 from loguru import logger
 
@@ -26,6 +27,31 @@ class BotLogger:
             level="INFO",
             filter=lambda record: record["extra"].get("bot_action", False)
         )
+        
+        # Consultas SQL lentas (ver src/database/instrumentacion.py)
+        self._sink_lentas = self._agregar_sink_lentas("logs/slow_queries.log")
+    
+    def _agregar_sink_lentas(self, ruta: str) -> int:
+        """Agrega el sink de consultas lentas en la ruta dada y devuelve su id"""
+        return logger.add(
+            ruta,
+            format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {message}",
+            rotation="10 MB",
+            retention="30 days",
+            level="WARNING",
+            filter=lambda record: record["extra"].get("consulta_lenta", False)
+        )
+    
+    @contextmanager
+    def consultas_lentas_en(self, ruta: str):
+        """Manda las consultas lentas a otro archivo mientras dure el bloque (para los tests)"""
+        logger.remove(self._sink_lentas)
+        self._sink_lentas = self._agregar_sink_lentas(ruta)
+        try:
+            yield ruta
+        finally:
+            logger.remove(self._sink_lentas)
+            self._sink_lentas = self._agregar_sink_lentas("logs/slow_queries.log")
     
     def log_simple_response(self, user_id: int, username: str, input_msg: str, output_msg: str):
         """Log para respuestas simples (sin IA)"""
@@ -53,6 +79,16 @@ class BotLogger:
             f"Usuario {user_id} (@{username}) - FUNCIÓN_{function_name.upper()} - {status}{details_str}"
         )
     
+    def log_sql_stats(self, resumen: list, lentas: int):
+        """Log del resumen de tiempos por sentencia SQL (EstadisticasSQL.resumen)"""
+        for fila in resumen:
+            logger.bind(bot_action=True).info(
+                f"SQL - {fila['cantidad']} ejecuciones, total {fila['total_ms']:.1f} ms, "
+                f"p50 {fila['p50_ms']:.2f} / p95 {fila['p95_ms']:.2f} / p99 {fila['p99_ms']:.2f} ms - "
+                f"{fila['sentencia']}"
+            )
+        logger.bind(bot_action=True).info(f"SQL - {lentas} consultas lentas desde el último reinicio")
+    
     def log_user_session(self, user_id: int, username: str, action: str):
         """Log para acciones de sesión (inicio, comandos, etc.)"""
         logger.bind(bot_action=True).info(
@@ -0,0 +1,65 @@
+"""
+Fechas de la base: segundos epoch (UTC) y conversión a la hora de Buenos Aires
+
+En la base todas las columnas fecha_* son INTEGER con segundos desde epoch
+en UTC: los rangos y los ORDER BY son comparaciones de enteros y no
+dependen del formato del texto ni de la zona horaria del servidor.
+
+Las fechas sin zona (naive) que vienen del usuario o del parser de
+lenguaje natural se interpretan en la hora de Buenos Aires.
+"""
+from datetime import datetime, timezone
+from typing import Optional, Union
+import time
+
+import pytz
+
+ZONA_HORARIA = pytz.timezone('America/Argentina/Buenos_Aires')
+
+FORMATO_FECHA = "%d/%m/%Y %H:%M"
+
+Fecha = Union[datetime, int, float]
+
+def ahora_local() -> datetime:
+    """Fecha y hora actual en Buenos Aires (con zona)"""
+    return datetime.now(ZONA_HORARIA)
+
+def ahora_epoch() -> int:
+    """Segundos epoch actuales"""
+    return int(time.time())
+
+def a_epoch(fecha: Optional[Fecha]) -> Optional[int]:
+    """
+    Convertir una fecha a segundos epoch (UTC)
+
+    Args:
+        fecha: datetime (sin zona = hora de Buenos Aires), segundos epoch
+            o texto ISO de las bases anteriores ("2026-10-17 09:30:00")
+    """
+    if fecha is None:
+        return None
+    if isinstance(fecha, (int, float)):
+        return int(fecha)
+    if isinstance(fecha, str):
+        fecha = datetime.fromisoformat(fecha)
+    if fecha.tzinfo is None:
+        fecha = ZONA_HORARIA.localize(fecha)
+    return int(fecha.timestamp())
+
+def utc_a_epoch(texto: Optional[str]) -> Optional[int]:
+    """Texto de CURRENT_TIMESTAMP de SQLite (en UTC) a segundos epoch"""
+    if texto is None:
+        return None
+    return int(datetime.fromisoformat(texto).replace(tzinfo=timezone.utc).timestamp())
+
+def desde_epoch(segundos: Optional[int]) -> Optional[datetime]:
+    """Segundos epoch a datetime en la hora de Buenos Aires"""
+    if segundos is None:
+        return None
+    return datetime.fromtimestamp(segundos, ZONA_HORARIA)
+
+def formatear(segundos: Optional[int], formato: str = FORMATO_FECHA) -> str:
+    """Segundos epoch como texto en la hora de Buenos Aires (ej: 17/10/2026 09:30)"""
+    if segundos is None:
+        return ""
+    return desde_epoch(segundos).strftime(formato)
@@ -0,0 +1,47 @@
+"""
+Motores de almacenamiento contra los que corren los tests de la base
+
+- sqlite3: el camino rápido, sqlite3 directo sobre un archivo
+- sqlite3-memoria: sqlite3 directo con Database(":memory:"), sin disco
+- sqlalchemy: pool QueuePool de SQLAlchemy sobre un archivo
+- sqlalchemy-memoria: SQLite en memoria detrás del pool de SQLAlchemy, en el
+  lugar de una base de servidor: sin archivo y con conexiones prestadas por
+  operación, cada una con su transacción
+"""
+import os
+import sys
+import tempfile
+from typing import Iterator, Sequence, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Database
+
+BACKENDS = ("sqlite3", "sqlite3-memoria", "sqlalchemy", "sqlalchemy-memoria")
+
+# Los que tienen un archivo: varias conexiones de verdad (WAL, lectores en paralelo)
+BACKENDS_ARCHIVO = ("sqlite3", "sqlalchemy")
+
+def crear_database(backend: str, tmp_dir: str, **kwargs) -> Database:
+    """Database de prueba con el motor `backend`"""
+    ruta = os.path.join(tmp_dir, "nelida_test.db")
+    if backend == "sqlite3":
+        return Database(ruta, **kwargs)
+    if backend == "sqlite3-memoria":
+        return Database(":memory:", **kwargs)
+    if backend == "sqlalchemy":
+        return Database(url=f"sqlite+pysqlite:///{ruta}", **kwargs)
+    if backend == "sqlalchemy-memoria":
+        return Database(url="sqlite://", **kwargs)
+    raise ValueError(f"Backend desconocido: {backend}")
+
+def para_cada_backend(backends: Sequence[str] = BACKENDS, **kwargs) -> Iterator[Tuple[str, Database]]:
+    """Una base nueva por backend; se cierra al pasar al siguiente"""
+    for backend in backends:
+        print(f"\n🗄️ Backend: {backend}")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db = crear_database(backend, tmp_dir, **kwargs)
+            try:
+                yield backend, db
+            finally:
+                db.close()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: filas con __slots__ (TareaRow) contra dict(sqlite3.Row)
+
+Lista 10.000 tareas de un usuario y compara tiempo y memoria de armar las
+filas, y el tiempo de serializarlas a JSON como hace SimpleAI.
+"""
+import sys
+import os
+import gc
+import json
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Database, Tarea, _FILAS_TAREA, _PRIORIDAD_TEXTO
+
+CANTIDAD = 10_000
+REPETICIONES = 5
+USER_ID = 1
+
+QUERY = "SELECT * FROM tareas WHERE user_id = ? ORDER BY prioridad DESC, fecha_creacion ASC, id ASC"
+
+def como_dicts(conn: sqlite3.Connection):
+    """La forma anterior: un dict nuevo por fila"""
+    filas = []
+    for row in conn.execute(QUERY, (USER_ID,)).fetchall():
+        tarea = dict(row)
+        tarea['prioridad'] = _PRIORIDAD_TEXTO.get(tarea['prioridad'], tarea['prioridad'])
+        filas.append(tarea)
+    return filas
+
+def como_slots(conn: sqlite3.Connection):
+    """La forma actual: row_factory que arma TareaRow"""
+    cursor = conn.execute(QUERY, (USER_ID,))
+    cursor.row_factory = _FILAS_TAREA
+    return cursor.fetchall()
+
+def medir(nombre: str, conn: sqlite3.Connection, listar, a_json):
+    """Imprimir el mejor tiempo de armado y de json.dumps, y la memoria retenida"""
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        filas = listar(conn)
+        tiempos.append(time.perf_counter() - inicio)
+        del filas
+
+    gc.collect()
+    tracemalloc.start()
+    filas = listar(conn)
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tiempos_json = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        json.dumps({"tareas": a_json(filas)})
+        tiempos_json.append(time.perf_counter() - inicio)
+    tiempo_json = min(tiempos_json)
+
+    print(f"{nombre:<22} armado {min(tiempos) * 1000:7.1f} ms | "
+          f"memoria {memoria / 1024 / 1024:6.2f} MB | json {tiempo_json * 1000:6.1f} ms")
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db = Database(os.path.join(tmp_dir, "bench.db"))
+        prioridades = ["alta", "media", "baja"]
+        Tarea(db).crear_multiples(
+            [(f"Tarea de prueba número {i}", prioridades[i % 3], "general") for i in range(CANTIDAD)],
+            USER_ID
+        )
+
+        conn = db.get_connection()
+        print(f"📏 {CANTIDAD} tareas, mejor de {REPETICIONES} corridas\n")
+        medir("dict(sqlite3.Row)", conn, como_dicts, lambda filas: filas)
+        medir("TareaRow (__slots__)", conn, como_slots, lambda filas: [f.to_dict() for f in filas])
+
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -28,7 +28,7 @@ async def debug_noticias():
     print()
     
     try:
-        resultado = await buscar_en_internet(query_esperado, 5, 12345)
+        resultado = buscar_en_internet(query_esperado, 5, 12345)
         
         if resultado['success']:
             print(f"✅ Búsqueda exitosa - {len(resultado['resultados'])} resultados")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test del archivado de tareas y recordatorios finalizados, del borrado de conversaciones
+viejas y de la compactación
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Recordatorio, Tarea, MensajeConversacion
+from backends import para_cada_backend
+from src.database.mantenimiento import archivar_finalizados, ejecutar_mantenimiento
+
+def test_archivado():
+    """Probar que sólo se archivan las finalizadas viejas y que siguen en el historial"""
+    print("🗃️ Probando archivado de finalizadas...")
+
+    for backend, db in para_cada_backend():
+        recordatorios = Recordatorio(db)
+        tareas = Tarea(db)
+        user_id = 555
+
+        vieja, reciente, pendiente, cancelada = tareas.crear_multiples([
+            ("Pagar el ABL", "alta", "casa"),
+            ("Renovar el DNI", "media", "general"),
+            ("Arreglar la persiana", "baja", "casa"),
+            ("Curso de guitarra", "baja", "estudios"),
+        ], user_id)
+        tareas.actualizar_status(vieja, "completado")
+        tareas.actualizar_status(reciente, "completado")
+        tareas.actualizar_status(cancelada, "cancelado")
+
+        rec_id = recordatorios.crear("Vacuna del perro", datetime.now() - timedelta(days=90), user_id)
+        recordatorios.actualizar_status(rec_id, "completado")
+
+        # Envejecer las finalizadas excepto "reciente"
+        with db.transaction() as conn:
+            conn.execute("""
+                UPDATE tareas SET fecha_modificacion = CAST(strftime('%s', 'now', '-60 days') AS INTEGER)
+                WHERE id IN (?, ?)
+            """, (vieja, cancelada))
+            conn.execute("""
+                UPDATE recordatorios SET fecha_modificacion = CAST(strftime('%s', 'now', '-60 days') AS INTEGER)
+            """)
+
+        # 1. Archivar
+        print("\n1️⃣ Archivando finalizadas de más de 30 días...")
+        tareas.listar_por_usuario(user_id)  # queda en caché
+        archivadas = archivar_finalizados(db, dias=30)
+        print(f"✅ {archivadas}")
+        assert archivadas == {"recordatorios": 1, "tareas": 2}
+
+        ids_activos = {t['id'] for t in tareas.listar_por_usuario(user_id)}
+        assert ids_activos == {reciente, pendiente}
+        assert recordatorios.listar_por_usuario(user_id) == []
+        assert tareas.buscar_por_contenido("ABL", user_id) == []
+
+        # 2. Volver a correrlo no mueve nada
+        assert archivar_finalizados(db, dias=30) == {"recordatorios": 0, "tareas": 0}
+
+        # 3. El historial sigue viendo las archivadas
+        print("\n2️⃣ Consultando el historial...")
+        historial = tareas.listar_historial(user_id)
+        # Más reciente primero; a igual fecha, desempata el ID
+        assert [t['id'] for t in historial] == [reciente, cancelada, vieja]
+        assert historial[0]['fecha_archivado'] is None
+        assert all(t['fecha_archivado'] for t in historial[1:])
+        assert [t['id'] for t in tareas.listar_historial(user_id, status="cancelado")] == [cancelada]
+        assert [r['id'] for r in recordatorios.listar_historial(user_id)] == [rec_id]
+        # Filtro y límite en la consulta, sobre las dos tablas
+        assert [t['id'] for t in tareas.listar_historial(user_id, limit=2)] == [reciente, cancelada]
+        assert [t['id'] for t in tareas.listar_historial(user_id, categoria="casa")] == [vieja]
+        print(f"✅ {len(historial)} tareas en el historial")
+
+        # 4. Compactar (y borrar los mensajes de conversación viejos)
+        print("\n3️⃣ Compactando...")
+        mensajes = MensajeConversacion(db)
+        vieja_charla, = mensajes.agregar([{"role": "user", "content": "Hola, Nélida"}], user_id)
+        mensajes.agregar([{"role": "user", "content": "¿Qué tengo hoy?"}], user_id)
+        with db.transaction() as conn:
+            conn.execute("""
+                UPDATE mensajes_conversacion SET fecha_creacion = CAST(strftime('%s', 'now', '-60 days') AS INTEGER)
+                WHERE id = ?
+            """, (vieja_charla,))
+
+        ejecutar_mantenimiento(db, dias=30)
+        assert len(tareas.listar_historial(user_id)) == 3
+        assert mensajes.ultimos(user_id, 10) == [{"role": "user", "content": "¿Qué tengo hoy?"}]
+
+    print("\n✅ Test de archivado completado")
+
+if __name__ == "__main__":
+    test_archivado()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test de la búsqueda de texto completo (FTS5) en notas y tareas
+"""
+import sys
+import os
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Nota, Tarea
+from backends import para_cada_backend
+
+def test_busqueda_fts():
+    """Probar búsqueda sin acentos, ranking, fragmentos y sincronización por triggers"""
+    print("🔍 Probando búsqueda de texto completo...")
+
+    for backend, db in para_cada_backend():
+        notas = Nota(db)
+        tareas = Tarea(db)
+        user_id = 1001
+        otro_user_id = 2002
+
+        if not db.fts_enabled:
+            print("⚠️ FTS5 no disponible en este SQLite, se omite el test")
+            return
+
+        notas.crear("Turno con el médico clínico el jueves", user_id)
+        notas.crear("El médico dijo que camine más; preguntarle al médico por los análisis", user_id)
+        notas.crear("Comprar medialunas para la reunión", user_id)
+        notas.crear("Médico de guardia del edificio", otro_user_id)
+
+        # 1. Sin acentos y por prefijo
+        print("\n1️⃣ Buscando 'medico' sin acento...")
+        resultados = notas.buscar_por_contenido("medico", user_id)
+        for nota in resultados:
+            print(f"   - {nota['fragmento']} (bm25={nota['relevancia']:.2e})")
+        assert len(resultados) == 2
+        assert all(n['user_id'] == user_id for n in resultados)
+
+        # 2. La nota con más menciones aparece primero
+        print("\n2️⃣ Verificando ranking...")
+        assert "análisis" in resultados[0]['contenido']
+        assert "[médico]" in resultados[0]['fragmento']
+        print("✅ Ranking por bm25 correcto")
+
+        # 3. Prefijo
+        print("\n3️⃣ Buscando prefijo 'media'...")
+        assert [n['contenido'] for n in notas.buscar_por_contenido("media", user_id)] == [
+            "Comprar medialunas para la reunión"
+        ]
+
+        # 4. Los triggers mantienen el índice al eliminar
+        print("\n4️⃣ Eliminando y volviendo a buscar...")
+        nota_id = resultados[0]['id']
+        notas.eliminar(nota_id, user_id)
+        assert [n['id'] for n in notas.buscar_por_contenido("medico", user_id)] != [nota_id]
+        assert len(notas.buscar_por_contenido("medico", user_id)) == 1
+
+        # 5. Tareas
+        print("\n5️⃣ Buscando tareas...")
+        tarea_id = tareas.crear("Llamar al dentista", user_id)
+        assert [t['id'] for t in tareas.buscar_por_contenido("DENTISTA", user_id)] == [tarea_id]
+        assert tareas.buscar_por_contenido("dentista", otro_user_id) == []
+        assert tareas.buscar_por_contenido("¿?", user_id) == []
+
+    print("\n✅ Test de búsqueda completado")
+
+if __name__ == "__main__":
+    test_busqueda_fts()
@@ -25,7 +25,7 @@ async def test_busquedas():
     try:
         # Test 1: Búsqueda básica
         print("\n1️⃣ Probando búsqueda básica...")
-        resultado = await buscar_en_internet("Python programming", num_resultados=3, user_id=12345)
+        resultado = buscar_en_internet("Python programming", num_resultados=3, user_id=12345)
         
         if resultado['success']:
             print(f"✅ Búsqueda exitosa usando: {resultado['metodo']}")
@@ -40,7 +40,7 @@ async def test_busquedas():
         
         # Test 2: Búsqueda en español
         print("\n2️⃣ Probando búsqueda en español...")
-        resultado2 = await buscar_en_internet("noticias Argentina", num_resultados=2, user_id=12345)
+        resultado2 = buscar_en_internet("noticias Argentina", num_resultados=2, user_id=12345)
         
         if resultado2['success']:
             print(f"✅ Búsqueda en español exitosa")
@@ -52,7 +52,7 @@ async def test_busquedas():
         if resultado['success'] and resultado['resultados']:
             print("\n3️⃣ Probando lectura de página...")
             primera_url = resultado['resultados'][0]['link']
-            contenido = await obtener_contenido_pagina(primera_url, user_id=12345)
+            contenido = obtener_contenido_pagina(primera_url, user_id=12345)
             
             if contenido['success']:
                 print(f"✅ Página leída exitosamente")
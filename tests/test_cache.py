@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test de la caché de lecturas por usuario y de su invalidación en las escrituras
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.cache import ReadCache
+from src.database.models import Recordatorio, Tarea, Nota
+from backends import para_cada_backend
+
+def test_cache_modelos():
+    """Probar aciertos de caché e invalidación después de cada escritura"""
+    print("🗄️ Probando caché de listados...")
+
+    for backend, db in para_cada_backend():
+        recordatorios = Recordatorio(db)
+        tareas = Tarea(db)
+        notas = Nota(db)
+        user_id = 4242
+        otro_user_id = 4343
+
+        # 1. La segunda lectura sale de la caché
+        print("\n1️⃣ Leyendo dos veces...")
+        tarea_id = tareas.crear("Regar las plantas", user_id)
+        tareas.crear("Pasear al perro", otro_user_id)
+        assert len(tareas.listar_por_usuario(user_id, status="pendiente")) == 1
+        hits = db.cache.hits
+        assert len(tareas.listar_por_usuario(user_id, status="pendiente")) == 1
+        assert db.cache.hits == hits + 1
+        print(f"✅ {db.cache.stats()}")
+
+        # 2. Modificar el resultado devuelto no altera la caché
+        tareas.listar_por_usuario(user_id, status="pendiente").clear()
+        assert len(tareas.listar_por_usuario(user_id, status="pendiente")) == 1
+
+        # 3. Cada escritura invalida los listados del usuario
+        print("\n2️⃣ Escribiendo e invalidando...")
+        otro = tareas.listar_por_usuario(otro_user_id)
+        tareas.crear_multiples([("Comprar yerba", "alta", "casa")], user_id)
+        assert len(tareas.listar_por_usuario(user_id, status="pendiente")) == 2
+        tareas.actualizar_status(tarea_id, "completado")
+        assert len(tareas.listar_por_usuario(user_id, status="pendiente")) == 1
+        tareas.completar_multiples(["yerba"], user_id)
+        assert tareas.listar_por_usuario(user_id, status="pendiente") == []
+
+        # Los listados de otro usuario siguen cacheados
+        hits = db.cache.hits
+        assert tareas.listar_por_usuario(otro_user_id) == otro
+        assert db.cache.hits == hits + 1
+
+        rec_id = recordatorios.crear("Turno dentista", datetime.now() + timedelta(days=1), user_id)
+        assert len(recordatorios.listar_por_usuario(user_id)) == 1
+        recordatorios.actualizar_status(rec_id, "completado")
+        assert recordatorios.listar_por_usuario(user_id)[0]['status'] == "completado"
+        recordatorios.eliminar(rec_id)
+        assert recordatorios.listar_por_usuario(user_id) == []
+
+        nota_id = notas.crear("La clave del wifi está en la heladera", user_id)
+        assert len(notas.listar_por_usuario(user_id)) == 1
+        notas.eliminar(nota_id, user_id)
+        assert notas.listar_por_usuario(user_id) == []
+        print("✅ Las escrituras invalidan la caché")
+
+        # 4. Dentro de una transacción la invalidación espera al commit
+        print("\n3️⃣ Invalidando dentro de una transacción...")
+        notas.listar_por_usuario(user_id)
+        with db.transaction():
+            notas.crear("Nota en transacción", user_id)
+            assert db.cache.stats()['entries'] > 0
+            entradas = db.cache.stats()['entries']
+        assert db.cache.stats()['entries'] < entradas
+        assert len(notas.listar_por_usuario(user_id)) == 1
+        print("✅ Invalidación postergada hasta el commit")
+
+    print("\n✅ Test de caché de modelos completado")
+
+def test_cache_lru_y_version():
+    """Probar el tope de memoria (LRU) y que no se cachean lecturas viejas"""
+    print("🧮 Probando tope de memoria y versiones...")
+
+    filas = [{"id": i, "contenido": "x" * 100} for i in range(10)]
+    cache = ReadCache(max_bytes=5000)
+
+    # 1. LRU: al pasar el tope se desaloja la entrada menos usada
+    print("\n1️⃣ Llenando la caché...")
+    for user_id in range(5):
+        cache.get_or_load("notas", user_id, None, lambda: filas)
+    assert cache.bytes <= cache.max_bytes
+    assert cache.evictions > 0
+    print(f"✅ {cache.stats()}")
+
+    # 2. Una lectura que empezó antes de invalidar no guarda su resultado
+    print("\n2️⃣ Invalidando durante una carga...")
+    def cargar_e_invalidar():
+        cache.invalidate("notas", 99)
+        return [{"id": 1}]
+
+    cache.get_or_load("notas", 99, None, cargar_e_invalidar)
+    misses = cache.misses
+    cache.get_or_load("notas", 99, None, lambda: [{"id": 2}])
+    assert cache.misses == misses + 1
+    print("✅ La lectura vieja no quedó cacheada")
+
+    # 3. Sin lecturas en curso no quedan versiones guardadas (ni aunque falle la carga)
+    print("\n3️⃣ Invalidando muchos usuarios...")
+    for user_id in range(1000):
+        cache.get_or_load("tareas", user_id, None, lambda: [])
+        cache.invalidate("tareas", user_id)
+    def fallar():
+        raise RuntimeError("base caída")
+    try:
+        cache.get_or_load("tareas", 1, None, fallar)
+    except RuntimeError:
+        pass
+    assert cache._versiones == {} and cache._cargando == {}
+    print("✅ Las versiones no se acumulan")
+
+    # 4. clear() descarta todo
+    cache.clear()
+    assert cache.stats()['entries'] == 0 and cache.bytes == 0
+
+    print("\n✅ Test de LRU completado")
+
+if __name__ == "__main__":
+    test_cache_modelos()
+    test_cache_lru_y_version()
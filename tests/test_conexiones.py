@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test de las conexiones (de larga vida por hilo o prestadas por el pool) y los PRAGMAs
+"""
+import sys
+import os
+import threading
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Tarea
+from backends import para_cada_backend, BACKENDS_ARCHIVO
+
+def test_conexiones():
+    """Probar reutilización de conexiones, WAL y lecturas concurrentes"""
+    print("🧪 Probando conexiones a la base de datos...")
+
+    for backend, db in para_cada_backend(BACKENDS_ARCHIVO):
+        tareas = Tarea(db)
+        user_id = 4242
+
+        # 1. Misma conexión dentro del mismo hilo
+        print("\n1️⃣ Reutilización de conexión en el mismo hilo...")
+        with db.connection() as conn, db.transaction() as anidada:
+            assert conn is anidada is db.get_connection()
+        if db.engine.per_thread:
+            with db.connection() as otra:
+                assert otra is conn  # sqlite3 directo: la de larga vida del hilo
+        else:
+            # Con un pool vuelve al terminar el bloque
+            assert db.engine.engine.pool.checkedout() == 0
+        print("✅ El hilo reutiliza su conexión")
+
+        # 2. PRAGMAs aplicados
+        print("\n2️⃣ Verificando PRAGMAs...")
+        with db.connection() as conn:
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+        print(f"📄 journal_mode={journal_mode}, synchronous={synchronous}")
+        assert journal_mode == "wal"
+        assert synchronous == 1  # NORMAL
+
+        # 3. Lectura desde otro hilo mientras hay una escritura en curso
+        print("\n3️⃣ Lectura concurrente durante una escritura...")
+        tarea_id = tareas.crear("comprar yerba", user_id)
+        resultado = {}
+
+        def leer():
+            with db.connection() as conn_lector:
+                resultado["conn"] = conn_lector
+                resultado["tareas"] = tareas.listar_por_usuario(user_id)
+
+        with db.transaction() as conn:
+            conn.execute("UPDATE tareas SET contenido = 'comprar mate' WHERE id = ?", (tarea_id,))
+            lector = threading.Thread(target=leer)
+            lector.start()
+            lector.join(timeout=5)
+
+        assert resultado["conn"] is not conn
+        assert [t['contenido'] for t in resultado["tareas"]] == ["comprar yerba"]
+        assert tareas.obtener_por_id(tarea_id)['contenido'] == "comprar mate"
+        print("✅ El lector vio la versión confirmada sin bloquearse")
+
+        # 4. Rollback si la transacción falla
+        print("\n4️⃣ Rollback ante errores...")
+        try:
+            with db.transaction() as conn:
+                conn.execute("DELETE FROM tareas WHERE id = ?", (tarea_id,))
+                raise RuntimeError("falla simulada")
+        except RuntimeError:
+            pass
+        assert tareas.obtener_por_id(tarea_id) is not None
+        print("✅ La tarea sigue ahí después del rollback")
+
+        # 5. Cierre explícito
+        print("\n5️⃣ Cerrando conexiones...")
+        db.close()
+        with db.connection() as conn:
+            assert conn is not None
+        db.close()
+        print("✅ Conexiones cerradas")
+
+    print("\n✅ Test de conexiones completado")
+
+if __name__ == "__main__":
+    test_conexiones()
@@ -24,7 +24,7 @@ async def test_contexto_argentino():
     # Test 1: Búsqueda general de noticias
     print("1️⃣ Búsqueda: 'noticias importantes hoy'")
     print("   (Debería incluir noticias de Argentina)")
-    resultado1 = await buscar_en_internet("noticias importantes hoy Argentina", 2, 12345)
+    resultado1 = buscar_en_internet("noticias importantes hoy Argentina", 2, 12345)
     
     if resultado1['success']:
         print(f"✅ {len(resultado1['resultados'])} resultados encontrados")
@@ -39,7 +39,7 @@ async def test_contexto_argentino():
     # Test 2: Búsqueda de clima
     print("2️⃣ Búsqueda: 'clima mañana'")
     print("   (Debería buscar clima de Buenos Aires)")
-    resultado2 = await buscar_en_internet("clima mañana Buenos Aires", 2, 12345)
+    resultado2 = buscar_en_internet("clima mañana Buenos Aires", 2, 12345)
     
     if resultado2['success']:
         print(f"✅ {len(resultado2['resultados'])} resultados encontrados")
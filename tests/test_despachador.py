@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test del despachador de recordatorios: entrega a horario, atrasados, completados y reintentos
+"""
+import sys
+import os
+import asyncio
+import time
+from datetime import timedelta
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from telegram.error import NetworkError
+
+from src.database.models import Recordatorio
+from src.functions.despachador import ReminderDispatcher
+from src.utils.fechas import ahora_local, a_epoch
+from backends import para_cada_backend
+
+class BotFalso:
+    """Registra los mensajes enviados; puede fallar las primeras `fallas` veces"""
+
+    def __init__(self, fallas: int = 0):
+        self.enviados = []
+        self.fallas = fallas
+
+    async def send_message(self, chat_id: int, text: str):
+        if self.fallas > 0:
+            self.fallas -= 1
+            raise NetworkError("sin conexión")
+        self.enviados.append((chat_id, text, time.time()))
+
+async def esperar(condicion, limite: float = 5.0):
+    """Esperar hasta que se cumpla la condición (o fallar al pasar el límite)"""
+    fin = asyncio.get_running_loop().time() + limite
+    while not condicion():
+        assert asyncio.get_running_loop().time() < fin, "se agotó la espera"
+        await asyncio.sleep(0.02)
+
+async def escenario_sin_entregas(modelo: Recordatorio) -> BotFalso:
+    """Arrancar y parar el despachador sin esperar ninguna entrega"""
+    bot = BotFalso()
+    despachador = ReminderDispatcher(bot, modelo)
+    await despachador.start()
+    await asyncio.sleep(0.2)
+    await despachador.stop()
+    return bot
+
+def test_atrasados_al_arrancar():
+    """Probar que al arrancar se entregan los atrasados y se descartan los muy viejos"""
+    print("⏰ Probando recordatorios atrasados...")
+
+    for backend, db in para_cada_backend():
+        modelo = Recordatorio(db)
+        user_id = 50
+        ahora = ahora_local()
+        atrasado = modelo.crear("Llamar al dentista", ahora - timedelta(hours=2), user_id)
+        viejo = modelo.crear("Algo de la semana pasada", ahora - timedelta(days=7), user_id)
+        completado = modelo.crear("Ya hecho", ahora - timedelta(minutes=1), user_id)
+        modelo.actualizar_status(completado, "completado", user_id)
+        futuro = modelo.crear("Mañana", ahora + timedelta(days=1), user_id)
+
+        async def escenario():
+            bot = BotFalso()
+            despachador = ReminderDispatcher(bot, modelo)
+            await despachador.start()
+            try:
+                await esperar(lambda: despachador.entregados == 1)
+                await asyncio.sleep(0.1)
+            finally:
+                await despachador.stop()
+            return bot
+
+        bot = asyncio.run(escenario())
+        (chat_id, texto, _), = bot.enviados
+        print(f"📨 {texto!r}")
+        assert chat_id == user_id and "Llamar al dentista" in texto and "demora" in texto
+
+        assert modelo.obtener_por_id(atrasado, user_id)['fecha_notificacion']
+        assert modelo.obtener_por_id(viejo, user_id)['fecha_notificacion']
+        assert not modelo.obtener_por_id(futuro, user_id)['fecha_notificacion']
+        assert not modelo.obtener_pendientes_hasta(ahora, sin_notificar=True)
+
+        # Al volver a arrancar no se repite nada
+        bot = asyncio.run(escenario_sin_entregas(modelo))
+        assert not bot.enviados
+
+    print("\n✅ Test de atrasados completado")
+
+def test_entrega_a_horario():
+    """Probar que un recordatorio creado con el despachador andando llega a su hora"""
+    print("🎯 Probando entrega a horario...")
+
+    for backend, db in para_cada_backend():
+        modelo = Recordatorio(db)
+        user_id = 60
+
+        async def escenario():
+            bot = BotFalso()
+            despachador = ReminderDispatcher(bot, modelo)
+            await despachador.start()
+            try:
+                # Se crea desde otro hilo, como lo hace el bot con AsyncModel
+                # (las fechas se guardan en segundos: al menos un segundo por delante)
+                cuando = ahora_local() + timedelta(seconds=2)
+                cancelado = await asyncio.to_thread(modelo.crear, "Cancelado", cuando, user_id)
+                await asyncio.to_thread(modelo.actualizar_status, cancelado, "cancelado", user_id)
+                primero = await asyncio.to_thread(modelo.crear, "Sacar la ropa", cuando, user_id)
+
+                await esperar(lambda: bot.enviados)
+                await asyncio.sleep(0.1)
+                return bot, cuando, primero
+            finally:
+                await despachador.stop()
+
+        bot, cuando, primero = asyncio.run(escenario())
+        (chat_id, texto, enviado), = bot.enviados
+        # fecha_recordatorio tiene resolución de segundos
+        atraso = enviado - a_epoch(cuando)
+        print(f"📨 {texto!r} con {atraso * 1000:.0f} ms de diferencia")
+        assert "Sacar la ropa" in texto and "demora" not in texto
+        assert 0 <= atraso < 1
+        assert modelo.obtener_por_id(primero, user_id)['fecha_notificacion']
+
+    print("\n✅ Test de entrega a horario completado")
+
+def test_reintentos():
+    """Probar que un envío fallido se reintenta y, agotados los reintentos, se abandona"""
+    print("🔁 Probando reintentos...")
+
+    for backend, db in para_cada_backend(("sqlite3",)):
+        modelo = Recordatorio(db)
+        ahora = ahora_local()
+        reintentado = modelo.crear("Con reintento", ahora, 70)
+
+        async def escenario(bot):
+            despachador = ReminderDispatcher(bot, modelo, reintentos=2,
+                                             espera_reintento=timedelta(milliseconds=50))
+            await despachador.start()
+            try:
+                await esperar(lambda: bot.fallas == 0 and (bot.enviados or despachador._intentos == {}))
+                await asyncio.sleep(0.2)
+            finally:
+                await despachador.stop()
+
+        # Falla dos veces y a la tercera sale
+        bot = BotFalso(fallas=2)
+        asyncio.run(escenario(bot))
+        assert len(bot.enviados) == 1
+        assert modelo.obtener_por_id(reintentado, 70)['fecha_notificacion']
+
+        # Falla siempre: queda sin notificar para el próximo arranque
+        abandonado = modelo.crear("Sin suerte", ahora, 71)
+        bot = BotFalso(fallas=3)
+        asyncio.run(escenario(bot))
+        assert not bot.enviados
+        assert not modelo.obtener_por_id(abandonado, 71)['fecha_notificacion']
+        print("✅ Agotados los reintentos, el recordatorio sigue pendiente de notificar")
+
+    print("\n✅ Test de reintentos completado")
+
+if __name__ == "__main__":
+    test_atrasados_al_arrancar()
+    test_entrega_a_horario()
+    test_reintentos()
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Test del executor de herramientas: corutinas y funciones comunes, hilos, timeouts, latencias,
+validación de argumentos y carga perezosa de los módulos
+"""
+import sys
+import os
+import asyncio
+import functools
+import tempfile
+import textwrap
+import threading
+import time
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.ai.herramientas import ToolExecutor, TiempoAgotado, ArgumentosInvalidos
+from src.functions import MODULOS_HERRAMIENTAS
+from src.database.models import Tarea, tarea_model, usar_database
+from src.database.unidad_trabajo import unidad_de_trabajo
+from backends import para_cada_backend
+
+def bloqueante(segundos: float, user_id: int = None):
+    """Como requests o feedparser: bloquea el hilo"""
+    time.sleep(segundos)
+    return {"success": True, "hilo": threading.current_thread().name}
+
+async def corutina(segundos: float):
+    await asyncio.sleep(segundos)
+    return {"success": True}
+
+class Llamable:
+    async def __call__(self):
+        return "ok"
+
+def test_deteccion():
+    """Probar que al registrar se detecta si la función es corutina y si recibe user_id"""
+    print("🔍 Probando detección de funciones...")
+
+    tools = ToolExecutor()
+    try:
+        assert tools.register("bloqueante", bloqueante, {}).es_corutina is False
+        assert tools.register("corutina", corutina, {}).es_corutina is True
+        assert tools.register("parcial", functools.partial(corutina, 0), {}).es_corutina is True
+        assert tools.register("llamable", Llamable(), {}).es_corutina is True
+        assert tools["bloqueante"].acepta_user_id and not tools["corutina"].acepta_user_id
+        assert "corutina" in tools and "otra" not in tools and len(tools) == 4
+    finally:
+        tools.shutdown()
+
+    print("\n✅ Test de detección completado")
+
+def test_funciones_comunes_en_hilos():
+    """Probar que las funciones bloqueantes no frenan el event loop"""
+    print("🧵 Probando funciones comunes en el pool de hilos...")
+
+    tools = ToolExecutor(hilos=4)
+    tools.register("bloqueante", bloqueante, {})
+
+    async def escenario():
+        latidos = 0
+
+        async def latir():
+            nonlocal latidos
+            while True:
+                await asyncio.sleep(0.01)
+                latidos += 1
+
+        latido = asyncio.create_task(latir())
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(tools.run("bloqueante", {"segundos": 0.3}) for _ in range(3)))
+        duracion = time.perf_counter() - inicio
+        latido.cancel()
+        return resultados, duracion, latidos
+
+    try:
+        resultados, duracion, latidos = asyncio.run(escenario())
+        print(f"⏱️ Tres llamadas de 0.3 s en {duracion:.2f} s; el loop latió {latidos} veces")
+        assert duracion < 0.55 and latidos >= 10
+        assert all(r["hilo"].startswith("nelida-tools") for r in resultados)
+    finally:
+        tools.shutdown()
+
+    print("\n✅ Test de hilos completado")
+
+def test_contexto_en_hilos():
+    """Probar que la base de usar_database llega a la función en el hilo"""
+    print("💉 Probando contexto en los hilos...")
+
+    def anotar(contenido: str, user_id: int):
+        return tarea_model.crear(contenido, user_id)
+
+    for backend, db in para_cada_backend(("sqlite3",)):
+        tools = ToolExecutor()
+        tools.register("anotar", anotar, {})
+
+        async def escenario():
+            with usar_database(db):
+                return await tools.run("anotar", {"contenido": "Regar las plantas", "user_id": 40})
+
+        try:
+            asyncio.run(escenario())
+            assert [t['contenido'] for t in Tarea(db).listar_por_usuario(40)] == ["Regar las plantas"]
+        finally:
+            tools.shutdown()
+
+    print("\n✅ Test de contexto completado")
+
+def test_hilo_vencido_fuera_de_la_unidad():
+    """Probar que un hilo vencido no escribe en la unidad de trabajo del turno"""
+    print("🧟 Probando hilo vencido...")
+
+    terminado = threading.Event()
+
+    def anotar_lento(contenido: str, user_id: int):
+        time.sleep(0.3)
+        try:
+            return tarea_model.crear(contenido, user_id)
+        finally:
+            terminado.set()
+
+    for backend, db in para_cada_backend(("sqlite3",)):
+        tools = ToolExecutor(timeout=0.1)
+        tools.register("anotar", anotar_lento, {})
+
+        async def escenario():
+            with usar_database(db), unidad_de_trabajo(db) as unidad:
+                try:
+                    await tools.run("anotar", {"contenido": "Llegó tarde"}, user_id=41)
+                    assert False, "tenía que vencer"
+                except TiempoAgotado:
+                    pass
+            return unidad
+
+        try:
+            unidad = asyncio.run(escenario())
+            assert terminado.wait(2)
+            # Escribió por su cuenta: ni en la unidad ya terminada ni con una transacción colgada
+            assert unidad.escrituras == 0
+            inicio = time.perf_counter()
+            Tarea(db).crear("Otro turno", 41)
+            assert time.perf_counter() - inicio < 1.0
+            assert len(Tarea(db).listar_por_usuario(41)) == 2
+        finally:
+            tools.shutdown()
+
+    print("\n✅ Test de hilo vencido completado")
+
+def test_timeouts_y_latencias():
+    """Probar el tiempo máximo por herramienta y las estadísticas"""
+    print("⌛ Probando timeouts y latencias...")
+
+    tools = ToolExecutor(timeout=0.2)
+    tools.register("bloqueante", bloqueante, {})
+    tools.register("corutina", corutina, {})
+    tools.register("paciente", bloqueante, {}, timeout=1.0)
+    tools.register("rota", lambda: 1 / 0, {})
+
+    async def escenario():
+        for nombre, segundos in (("bloqueante", 0.5), ("corutina", 0.5)):
+            inicio = time.perf_counter()
+            try:
+                await tools.run(nombre, {"segundos": segundos})
+                assert False, "tenía que vencer"
+            except TiempoAgotado as e:
+                print(f"⌛ {e}")
+                assert time.perf_counter() - inicio < 0.4
+        await tools.run("paciente", {"segundos": 0.3})
+        for _ in range(3):
+            await tools.run("corutina", {"segundos": 0.01})
+        try:
+            await tools.run("rota", {})
+        except ZeroDivisionError:
+            pass
+
+    try:
+        asyncio.run(escenario())
+        stats = {fila["herramienta"]: fila for fila in tools.stats()}
+        for fila in stats.values():
+            print(f"📊 {fila}")
+        assert stats["bloqueante"]["vencidas"] == 1
+        assert stats["corutina"]["llamadas"] == 4 and stats["corutina"]["vencidas"] == 1
+        assert stats["paciente"]["vencidas"] == 0 and stats["paciente"]["p50_ms"] >= 300
+        assert stats["rota"]["errores"] == 1
+        assert [f["p95_ms"] for f in tools.stats()] == sorted((f["p95_ms"] for f in tools.stats()), reverse=True)
+    finally:
+        tools.shutdown()
+
+    print("\n✅ Test de timeouts completado")
+
+ESQUEMA_TAREA = {
+    "type": "function",
+    "function": {
+        "name": "anotar",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "contenido": {"type": "string"},
+                "prioridad": {"type": "string", "enum": ["alta", "media", "baja"]},
+                "limite": {"type": "integer", "minimum": 1, "maximum": 100},
+                "urgente": {"type": "boolean"},
+            },
+            "required": ["contenido"]
+        }
+    }
+}
+
+def test_validacion_de_argumentos():
+    """Probar que los argumentos de la IA se validan y convierten según el esquema"""
+    print("🧾 Probando validación de argumentos...")
+
+    def anotar(contenido: str, user_id: int, prioridad: str = "media", limite: int = 50, urgente: bool = False):
+        return {"contenido": contenido, "user_id": user_id, "prioridad": prioridad,
+                "limite": limite, "urgente": urgente}
+
+    tools = ToolExecutor()
+    tools.register("anotar", anotar, ESQUEMA_TAREA)
+
+    async def escenario():
+        # Tipos que la IA manda mal, un null, y un user_id que no le corresponde
+        recibido = await tools.run("anotar", {"contenido": 42, "prioridad": "ALTA", "limite": "3",
+                                              "urgente": "true", "user_id": 666, "inventado": 1}, user_id=7)
+        assert recibido == {"contenido": "42", "user_id": 7, "prioridad": "alta", "limite": 3, "urgente": True}
+        recibido = await tools.run("anotar", {"contenido": "Pagar", "limite": 10.0, "prioridad": None}, user_id=7)
+        assert recibido["limite"] == 10 and recibido["prioridad"] == "media"
+
+        for argumentos in ({}, {"contenido": "x", "limite": "muchas"}, {"contenido": "x", "prioridad": "urgentísima"},
+                           {"contenido": "x", "urgente": "capaz"}, {"contenido": "x", "limite": -1},
+                           {"contenido": "x", "limite": "1000"}, ["contenido"]):
+            try:
+                await tools.run("anotar", argumentos, user_id=7)
+                assert False, f"tenía que rechazar {argumentos}"
+            except ArgumentosInvalidos as e:
+                print(f"🚫 {e}")
+
+    try:
+        asyncio.run(escenario())
+        assert tools.stats()[0]["errores"] == 7
+
+        # Un esquema con parámetros que la función no recibe se rechaza al registrar
+        try:
+            tools.register("corutina", corutina, ESQUEMA_TAREA)
+            assert False, "tenía que rechazar el esquema"
+        except ValueError as e:
+            print(f"🚫 {e}")
+    finally:
+        tools.shutdown()
+
+    print("\n✅ Test de validación completado")
+
+MODULO_DE_PRUEBA = textwrap.dedent('''
+    from src.ai.herramientas import herramienta
+
+    @herramienta
+    def saludar(nombre: str, user_id: int = None):
+        return f"Hola {nombre} ({user_id})"
+
+    @herramienta(nombre="despedir", timeout=5)
+    async def chau(nombre: str):
+        return f"Chau {nombre}"
+
+    @herramienta
+    def sin_esquema():
+        return "nunca"
+
+    PRUEBA_FUNCTIONS = {
+        name: {"type": "function", "function": {"name": name, "parameters": {
+            "type": "object", "properties": {"nombre": {"type": "string"}}, "required": ["nombre"]}}}
+        for name in ("saludar", "despedir")
+    }
+''')
+
+def test_carga_perezosa():
+    """Probar que los módulos de herramientas se importan recién al usarlas"""
+    print("💤 Probando carga perezosa...")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        with open(os.path.join(directorio, "herramientas_de_prueba.py"), "w") as archivo:
+            archivo.write(MODULO_DE_PRUEBA)
+        sys.path.insert(0, directorio)
+        tools = ToolExecutor()
+        try:
+            tools.register_modules(["herramientas_de_prueba", "modulo_que_no_existe"])
+            assert "herramientas_de_prueba" not in sys.modules
+
+            # La primera vez que se usa: se importa, y el que no existe o no tiene esquema se descarta
+            descripciones = tools.descriptions()
+            assert "herramientas_de_prueba" in sys.modules
+            assert [d["function"]["name"] for d in descripciones] == ["saludar", "despedir"]
+            assert tools.descriptions() is descripciones
+            assert "sin_esquema" not in tools and tools["despedir"].timeout == 5
+            assert tools["saludar"].acepta_user_id and not tools["despedir"].acepta_user_id
+
+            async def escenario():
+                return (await tools.run("saludar", {"nombre": "Nélida"}, user_id=3),
+                        await tools.run("despedir", {"nombre": "Nélida"}, user_id=3))
+
+            assert asyncio.run(escenario()) == ("Hola Nélida (3)", "Chau Nélida")
+        finally:
+            tools.shutdown()
+            sys.path.remove(directorio)
+            sys.modules.pop("herramientas_de_prueba", None)
+
+    # Las de Nélida: todas cargan y sus esquemas coinciden con las firmas
+    tools = ToolExecutor()
+    try:
+        tools.register_modules(MODULOS_HERRAMIENTAS)
+        nombres = [d["function"]["name"] for d in tools.descriptions()]
+        print(f"🔧 {len(nombres)} herramientas: {', '.join(nombres)}")
+        assert len(nombres) == 17 and len(set(nombres)) == 17
+        assert tools["buscar_en_internet"].timeout == 20 and not tools["buscar_en_internet"].es_corutina
+        assert tools["crear_tarea"].es_corutina and tools["crear_tarea"].acepta_user_id
+        # Sólo las de recordatorios, tareas y notas van en la unidad de trabajo del turno
+        assert [n for n in nombres if tools[n].usa_base] == [n for n in nombres if "recordatorio" in n
+                                                             or "tarea" in n or "nota" in n]
+    finally:
+        tools.shutdown()
+
+    print("\n✅ Test de carga perezosa completado")
+
+if __name__ == "__main__":
+    test_deteccion()
+    test_funciones_comunes_en_hilos()
+    test_contexto_en_hilos()
+    test_hilo_vencido_fuera_de_la_unidad()
+    test_timeouts_y_latencias()
+    test_validacion_de_argumentos()
+    test_carga_perezosa()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Test de las funciones pedidas por la IA en un mismo turno: se ejecutan a la vez,
+los resultados quedan en orden y una que falla no tumba a las otras
+"""
+import sys
+import os
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+
+from src.ai.simple_ai import SimpleAI
+from src.database.models import Tarea, usar_database
+from src.database.async_models import async_tarea_model
+from backends import para_cada_backend
+
+class ClienteFalso:
+    """Responde como chat.completions: primero pide las funciones, después contesta"""
+
+    def __init__(self, llamadas):
+        self.llamadas = llamadas
+        self.pedidos = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, messages, **kwargs):
+        self.pedidos.append(list(messages))
+        if len(self.pedidos) == 1:
+            mensaje = ChatCompletionMessage(role="assistant", content=None, tool_calls=[
+                ChatCompletionMessageToolCall(id=f"call_{i}", type="function",
+                                              function=Function(name=nombre, arguments=argumentos))
+                for i, (nombre, argumentos) in enumerate(self.llamadas)
+            ])
+        else:
+            mensaje = ChatCompletionMessage(role="assistant", content="Listo, querido")
+        return SimpleNamespace(choices=[SimpleNamespace(message=mensaje)])
+
+async def anotar_tarea(contenido: str, user_id: int):
+    await asyncio.sleep(0.3)
+    await async_tarea_model.crear(contenido, user_id)
+    return {"success": True, "message": f"Tarea '{contenido}' creada"}
+
+async def buscar_noticias():
+    await asyncio.sleep(0.3)
+    return {"success": True, "noticias": ["Sube el dólar"]}
+
+async def buscar_lento():
+    await asyncio.sleep(1.5)
+    return {"success": True, "resultados": []}
+
+async def romperse():
+    raise ValueError("se cayó la conexión")
+
+async def completar_tarea(tarea_id: int, user_id: int):
+    """Un resultado negativo normal: no hay nada que completar"""
+    if not await async_tarea_model.actualizar_status(tarea_id, "completado", user_id):
+        return {"success": False, "message": f"No encontré la tarea {tarea_id}"}
+    return {"success": True}
+
+async def marcar_raro(tarea_id: int, user_id: int):
+    """Atrapa el error de la escritura y lo devuelve como success False"""
+    try:
+        await async_tarea_model.actualizar_status(tarea_id, "inexistente", user_id)
+        return {"success": True}
+    except Exception as e:
+        return {"success": False, "message": f"Error: {e}"}
+
+def crear_ai(llamadas, **kwargs) -> SimpleAI:
+    ai = SimpleAI("sk-test", **kwargs)
+    ai.client = ClienteFalso(llamadas)
+    ai.register_function("anotar_tarea", anotar_tarea, {}, usa_base=True)
+    ai.register_function("buscar_noticias", buscar_noticias, {})
+    ai.register_function("buscar_lento", buscar_lento, {})
+    ai.register_function("romperse", romperse, {}, usa_base=True)
+    ai.register_function("completar_tarea", completar_tarea, {}, usa_base=True)
+    ai.register_function("marcar_raro", marcar_raro, {}, usa_base=True)
+    return ai
+
+def mensajes_tool(ai: SimpleAI):
+    """Mensajes "tool" que recibió OpenAI en la segunda llamada"""
+    return [m for m in ai.client.pedidos[-1] if m["role"] == "tool"]
+
+def test_funciones_en_paralelo():
+    """Probar que las funciones de un turno corren a la vez y en orden"""
+    print("⚡ Probando funciones en paralelo...")
+
+    for backend, db in para_cada_backend(("sqlite3",)):
+        with usar_database(db):
+            llamadas = [("buscar_noticias", "{}"),
+                        ("anotar_tarea", json.dumps({"contenido": "Pagar el gas"}))]
+
+            ai = crear_ai(llamadas)
+            inicio = time.perf_counter()
+            respuesta = asyncio.run(ai.get_response("Noticias y anotame pagar el gas", 90))
+            duracion = time.perf_counter() - inicio
+            print(f"⏱️ Dos funciones de 0.3 s en {duracion:.2f} s")
+
+            assert respuesta == "Listo, querido"
+            assert duracion < 0.55
+            tools = mensajes_tool(ai)
+            assert [m["tool_call_id"] for m in tools] == ["call_0", "call_1"]
+            assert json.loads(tools[0]["content"])["noticias"] == ["Sube el dólar"]
+            assert "Pagar el gas" in json.loads(tools[1]["content"])["message"]
+            assert [t['contenido'] for t in Tarea(db).listar_por_usuario(90)] == ["Pagar el gas"]
+
+            # Un turno con varias funciones deja el historial sano: el siguiente lo conserva
+            assert not ai._is_history_corrupted(90)
+            asyncio.run(ai.get_response("¿Y qué más?", 90))
+            assert len(mensajes_tool(ai)) == 2
+
+            # Con max_parallel_tools=1 vuelven a ir de a una
+            ai = crear_ai(llamadas, max_parallel_tools=1)
+            inicio = time.perf_counter()
+            asyncio.run(ai.get_response("Otra vez", 91))
+            assert time.perf_counter() - inicio >= 0.6
+
+    print("\n✅ Test de funciones en paralelo completado")
+
+def test_historial_corrupto():
+    """Probar la verificación de los pares tool_calls / tool"""
+    print("🩺 Probando historial corrupto...")
+
+    ai = SimpleAI("sk-test")
+    pedido = {"role": "assistant", "content": None, "tool_calls": [{"id": "a"}, {"id": "b"}]}
+    casos = [
+        ([pedido, {"role": "tool", "tool_call_id": "b"}, {"role": "tool", "tool_call_id": "a"},
+          {"role": "assistant", "content": "Listo"}], False),
+        ([pedido, {"role": "tool", "tool_call_id": "a"}, {"role": "assistant", "content": "Listo"}], True),
+        ([pedido, {"role": "tool", "tool_call_id": "a"}], True),
+        ([pedido, {"role": "tool", "tool_call_id": "a"}, {"role": "tool", "tool_call_id": "a"}], True),
+        ([{"role": "tool", "tool_call_id": "a"}], True),
+    ]
+    for mensajes, corrupto in casos:
+        conversacion = ai.conversation_history.start(97, "Sos Nélida")
+        for mensaje in [{"role": "user", "content": "hola"}] + mensajes:
+            ai.conversation_history.append(conversacion, mensaje)
+        assert ai._is_history_corrupted(97) is corrupto
+
+    print("\n✅ Test de historial corrupto completado")
+
+def test_fallas_aisladas():
+    """Probar que una función que falla no impide que las otras respondan"""
+    print("🧯 Probando fallas aisladas...")
+
+    for backend, db in para_cada_backend(("sqlite3",)):
+        with usar_database(db):
+            ai = crear_ai([("anotar_tarea", json.dumps({"contenido": "Llamar a la tía"})),
+                           ("romperse", "{}"),
+                           ("buscar_noticias", "{no es json"),
+                           ("buscar_noticias", "{}")])
+            respuesta = asyncio.run(ai.get_response("Hacé todo", 92))
+            assert respuesta == "Listo, querido"
+
+            tools = mensajes_tool(ai)
+            for m in tools:
+                print(f"🔧 {m['tool_call_id']}: {m['content'][:70]}")
+            assert [m["tool_call_id"] for m in tools] == ["call_0", "call_1", "call_2", "call_3"]
+            # La que escribió avisa que el turno se deshizo; buscar_noticias no usa
+            # la base, así que su error no cuenta para la unidad
+            assert json.loads(tools[0]["content"])["message"] == "No se guardó nada: se deshizo porque falló romperse"
+            assert "se cayó la conexión" in tools[1]["content"]
+            assert tools[2]["content"].startswith("Error ejecutando buscar_noticias")
+            assert json.loads(tools[3]["content"])["success"] is True
+            assert Tarea(db).listar_por_usuario(92) == []
+
+    print("\n✅ Test de fallas aisladas completado")
+
+def test_resultados_negativos():
+    """Probar que un success False normal no deshace el turno y una escritura fallida sí"""
+    print("🙅 Probando resultados negativos...")
+
+    for backend, db in para_cada_backend(("sqlite3",)):
+        with usar_database(db):
+            # "No encontré esa tarea" o una búsqueda fallida no tocan la tarea nueva
+            ai = crear_ai([("anotar_tarea", json.dumps({"contenido": "Sacar turno"})),
+                           ("completar_tarea", json.dumps({"tarea_id": 999})),
+                           ("buscar_noticias", "{no es json")])
+            asyncio.run(ai.get_response("Anotá, completá y buscá", 95))
+            tools = mensajes_tool(ai)
+            assert json.loads(tools[0]["content"])["success"] is True
+            assert json.loads(tools[1]["content"])["message"] == "No encontré la tarea 999"
+            assert [t['contenido'] for t in Tarea(db).listar_por_usuario(95)] == ["Sacar turno"]
+
+            # Una escritura que falló, aunque la función lo devuelva como success False, sí
+            tarea_id = Tarea(db).crear("Ya existente", 96)
+            ai = crear_ai([("anotar_tarea", json.dumps({"contenido": "No queda"})),
+                           ("marcar_raro", json.dumps({"tarea_id": tarea_id}))])
+            asyncio.run(ai.get_response("Anotá y marcá", 96))
+            tools = mensajes_tool(ai)
+            assert json.loads(tools[0]["content"])["message"] == "No se guardó nada: se deshizo porque falló marcar_raro"
+            assert [t['contenido'] for t in Tarea(db).listar_por_usuario(96)] == ["Ya existente"]
+
+    print("\n✅ Test de resultados negativos completado")
+
+def test_lock_fuera_de_la_unidad():
+    """Probar que una función lenta sin base no retiene el lock de escritura del turno"""
+    print("🔓 Probando lock de escritura...")
+
+    for backend, db in para_cada_backend(("sqlite3",)):
+        with usar_database(db):
+            ai = crear_ai([("anotar_tarea", json.dumps({"contenido": "Pagar el gas"})),
+                           ("buscar_lento", "{}")])
+
+            async def escenario():
+                turno = asyncio.create_task(ai.get_response("Anotá y buscá", 93))
+                await asyncio.sleep(0.6)
+                # La búsqueda sigue, pero la tarea ya está confirmada y otro chat escribe sin esperar
+                assert not turno.done()
+                assert [t['contenido'] for t in await asyncio.to_thread(Tarea(db).listar_por_usuario, 93)] == ["Pagar el gas"]
+                inicio = time.perf_counter()
+                await asyncio.to_thread(Tarea(db).crear, "Otro chat", 94)
+                espera = time.perf_counter() - inicio
+                return await turno, espera
+
+            respuesta, espera = asyncio.run(escenario())
+            print(f"⏱️ Otro chat escribió en {espera * 1000:.0f} ms")
+            assert respuesta == "Listo, querido" and espera < 0.5
+
+    print("\n✅ Test de lock de escritura completado")
+
+if __name__ == "__main__":
+    test_funciones_en_paralelo()
+    test_historial_corrupto()
+    test_fallas_aisladas()
+    test_resultados_negativos()
+    test_lock_fuera_de_la_unidad()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Test del historial de conversaciones: LRU, vencimiento, tope de bytes, system compartido
+y persistencia en la base
+"""
+import sys
+import os
+import asyncio
+import time
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.ai.historial import ConversationHistory
+from src.database.models import MensajeConversacion
+from src.database.async_models import AsyncModel
+from backends import para_cada_backend
+
+PERSONALIDAD = "Sos Nélida. " * 200
+
+def conversar(historial: ConversationHistory, user_id: int, *textos: str, prompt: str = PERSONALIDAD):
+    """Empezar (si hace falta) la conversación y agregarle mensajes del usuario"""
+    conversacion = historial.get(user_id) or historial.start(user_id, prompt)
+    for texto in textos:
+        historial.append(conversacion, {"role": "user", "content": texto})
+    return conversacion
+
+def test_system_compartido():
+    """Probar que el prompt de system no se copia por usuario"""
+    print("🎭 Probando system compartido...")
+
+    historial = ConversationHistory()
+    conversaciones = [conversar(historial, user_id, "hola") for user_id in range(50)]
+    neutra = conversar(historial, 99, "hola", prompt="Asistente neutro")
+
+    assert all(c.para_openai()[0] is conversaciones[0].sistema for c in conversaciones)
+    assert neutra.para_openai()[0]["content"] == "Asistente neutro"
+    stats = historial.stats()
+    print(f"📊 {stats}")
+    assert stats["users"] == 51 and stats["system_prompts"] == 2
+    # Los bytes son de los mensajes: 51 prompts de 2 KB no entrarían acá
+    assert stats["bytes"] < 51 * 1024
+
+    # Al irse el último que lo usa, se suelta el prompt
+    historial.discard(99)
+    assert historial.stats()["system_prompts"] == 1
+
+    print("\n✅ Test de system compartido completado")
+
+def test_lru_y_tope_de_bytes():
+    """Probar el desalojo por cantidad de usuarios y por bytes"""
+    print("🧹 Probando desalojo LRU...")
+
+    historial = ConversationHistory(max_usuarios=3)
+    for user_id in (1, 2, 3):
+        conversar(historial, user_id, "hola")
+    conversar(historial, 1, "sigo acá")     # el 1 pasa a ser el más reciente
+    conversar(historial, 4, "nuevo")
+    assert 2 not in historial and all(u in historial for u in (1, 3, 4))
+    assert historial.stats()["evictions"] == 1
+
+    historial = ConversationHistory(max_bytes=4096)
+    for user_id in range(10):
+        conversar(historial, user_id, "x" * 1000)
+    stats = historial.stats()
+    print(f"📊 {stats}")
+    assert stats["bytes"] <= 4096 and stats["evictions"] > 0
+    assert 9 in historial and 0 not in historial
+
+    # Una sola conversación más grande que el tope no se desaloja a sí misma
+    grande = conversar(historial, 20, "y" * 8000)
+    assert len(historial) == 1 and 20 in historial
+    assert len(grande.para_openai()) == 2
+
+    print("\n✅ Test de desalojo completado")
+
+def test_vencimiento_y_recorte():
+    """Probar el TTL de inactividad y que el recorte descuenta bytes"""
+    print("⌛ Probando vencimiento...")
+
+    historial = ConversationHistory(ttl_segundos=0.2)
+    conversar(historial, 1, "hola")
+    time.sleep(0.1)
+    conversar(historial, 2, "hola")
+    time.sleep(0.15)
+    assert 1 not in historial and 2 in historial
+    time.sleep(0.1)
+    assert historial.stats()["users"] == 0 and historial.stats()["expirations"] == 2
+    assert historial.bytes == 0
+
+    # Una conversación desalojada en medio del turno sigue sirviendo al turno
+    historial = ConversationHistory()
+    conversacion = conversar(historial, 5, *[f"mensaje {i}" for i in range(20)])
+    antes = historial.bytes
+    historial.trim(conversacion, 9)
+    assert len(conversacion.mensajes) == 9 and conversacion.mensajes[0]["content"] == "mensaje 11"
+    assert historial.bytes == conversacion.bytes < antes
+
+    # El recorte no deja respuestas de herramientas sin su pedido
+    historial.append(conversacion, {"role": "assistant", "content": None, "tool_calls": [{"id": "c1"}]})
+    historial.append(conversacion, {"role": "tool", "tool_call_id": "c1", "content": "ok"})
+    historial.append(conversacion, {"role": "assistant", "content": "listo"})
+    historial.trim(conversacion, 9)
+    assert [m["role"] for m in conversacion.mensajes] == ["user"] * 6 + ["assistant", "tool", "assistant"]
+    historial.trim(conversacion, 2)
+    assert conversacion.mensajes == []
+
+    historial.discard(5)
+    historial.append(conversacion, {"role": "assistant", "content": "respuesta"})
+    assert conversacion.mensajes[-1]["content"] == "respuesta"
+    assert historial.bytes == 0 and 5 not in historial
+
+    print("\n✅ Test de vencimiento completado")
+
+def test_historial_persistente():
+    """Probar que las conversaciones se guardan y se recuperan después de un reinicio"""
+    print("💾 Probando historial persistente...")
+
+    turno = [
+        {"role": "user", "content": "Recordame pagar la luz"},
+        {"role": "assistant", "content": None,
+         "tool_calls": [{"id": "c1", "type": "function",
+                         "function": {"name": "crear_recordatorio", "arguments": "{}"}}]},
+        {"role": "tool", "tool_call_id": "c1", "content": '{"success": true}'},
+        {"role": "assistant", "content": "Listo, nene"},
+    ]
+
+    for backend, db in para_cada_backend():
+        store = AsyncModel(MensajeConversacion(db))
+
+        async def escenario():
+            historial = ConversationHistory(store=store, max_mensajes=6)
+            assert await historial.load(80, PERSONALIDAD) is None
+
+            conversacion = historial.start(80, PERSONALIDAD)
+            for _ in range(3):
+                for mensaje in turno:
+                    historial.append(conversacion, mensaje)
+                historial.trim(conversacion)
+                await historial.save(conversacion)
+            assert conversacion.sin_guardar == []
+            otro = conversar(historial, 81, "hola")
+            await historial.save(otro)
+
+            # "Reinicio": un historial nuevo carga sólo los últimos mensajes,
+            # empezando por uno del usuario (los últimos 6 empiezan en un tool)
+            reiniciado = ConversationHistory(store=store, max_mensajes=6)
+            cargada = await reiniciado.load(80, "Otro prompt")
+            assert cargada.mensajes == turno
+            assert cargada.para_openai()[0]["content"] == "Otro prompt"
+            assert await reiniciado.load(80, "Otro prompt") is cargada
+            assert reiniciado.stats()["loads"] == 1 and 81 not in reiniciado
+
+            # Empezar de nuevo reemplaza lo guardado; delete lo borra
+            nueva = reiniciado.start(80, PERSONALIDAD)
+            reiniciado.append(nueva, {"role": "user", "content": "Empecemos de cero"})
+            await reiniciado.save(nueva)
+            assert await store.ultimos(80, 10) == [{"role": "user", "content": "Empecemos de cero"}]
+
+            await reiniciado.delete(81)
+            assert await store.ultimos(81, 10) == []
+            assert await store.ultimos(80, 10) != []
+
+        asyncio.run(escenario())
+
+    print("\n✅ Test de historial persistente completado")
+
+if __name__ == "__main__":
+    test_system_compartido()
+    test_lru_y_tope_de_bytes()
+    test_vencimiento_y_recorte()
+    test_historial_persistente()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test de la medición de consultas: normalización, percentiles y log de consultas lentas
+"""
+import sys
+import os
+import tempfile
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Tarea, Nota
+from src.utils.bot_logger import bot_logger
+from src.database.instrumentacion import EstadisticasSQL, normalizar
+from backends import para_cada_backend
+
+def test_normalizar():
+    """Probar que variantes de la misma consulta se agrupan juntas"""
+    print("🔤 Probando normalización...")
+
+    assert normalizar("""
+        SELECT * FROM tareas
+        WHERE id IN (?, ?,?) AND categoria = 'casa' LIMIT 10
+    """) == normalizar("SELECT * FROM tareas WHERE id IN (?, ?) AND categoria = 'trabajo' LIMIT 5")
+    assert normalizar("INSERT INTO notas (a, b) VALUES (?, ?), (?, ?), (?, ?)") == \
+        "INSERT INTO notas (a, b) VALUES (?, ...), ..."
+    # Los números dentro de identificadores no son literales
+    assert normalizar("SELECT * FROM notas_fts WHERE rank = 1") == "SELECT * FROM notas_fts WHERE rank = ?"
+
+    print("\n✅ Test de normalización completado")
+
+def test_estadisticas_por_sentencia():
+    """Probar que se cuentan las consultas de los modelos y se calculan los percentiles"""
+    print("⏱️ Probando estadísticas por sentencia...")
+
+    for backend, db in para_cada_backend(estadisticas=EstadisticasSQL(umbral_lento_ms=None)):
+        tareas, notas = Tarea(db), Nota(db)
+        for i in range(20):
+            tareas.crear(f"Tarea {i}", 3)
+            # Cada listado con caché vacía: el crear la invalidó
+            tareas.listar_por_usuario(3)
+        notas.crear_multiples([(f"Nota {i}", "general") for i in range(5)], 3)
+
+        resumen = db.estadisticas.resumen()
+        por_sentencia = {fila["sentencia"]: fila for fila in resumen}
+        insert = next(f for s, f in por_sentencia.items() if s.startswith("INSERT INTO tareas"))
+        listado = next(f for s, f in por_sentencia.items()
+                       if s.startswith("SELECT * FROM tareas WHERE user_id = ?"))
+        print(f"📊 {len(resumen)} sentencias; listado: {listado['cantidad']}× "
+              f"p50 {listado['p50_ms']:.3f} ms p99 {listado['p99_ms']:.3f} ms")
+
+        assert insert["cantidad"] == 20 and listado["cantidad"] == 20
+        assert any(s.startswith("INSERT INTO notas") for s in por_sentencia)
+        for fila in resumen:
+            assert 0 <= fila["p50_ms"] <= fila["p95_ms"] <= fila["p99_ms"] <= fila["max_ms"]
+        assert [f["total_ms"] for f in resumen] == sorted((f["total_ms"] for f in resumen), reverse=True)
+
+        db.estadisticas.reiniciar()
+        assert db.estadisticas.resumen() == []
+
+    print("\n✅ Test de estadísticas completado")
+
+def test_consultas_lentas():
+    """Probar que las consultas sobre el umbral van al log de consultas lentas"""
+    print("🐢 Probando log de consultas lentas...")
+
+    # El sink apunta a un archivo temporal: el test no toca logs/slow_queries.log
+    with tempfile.TemporaryDirectory() as directorio, \
+            bot_logger.consultas_lentas_en(os.path.join(directorio, "slow_queries.log")) as ruta:
+        for backend, db in para_cada_backend(("sqlite3",), estadisticas=EstadisticasSQL(umbral_lento_ms=10)):
+            tareas = Tarea(db)
+            tareas.crear("rápida", 4)
+            assert db.estadisticas.lentas == 0 and os.path.getsize(ruta) == 0
+
+            # Una consulta que tarda de verdad (CTE recursiva de cien mil filas, unos 30 ms)
+            with db.connection() as conn:
+                conn.execute("""
+                    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000)
+                    SELECT SUM(i) FROM n
+                """).fetchone()
+
+            with open(ruta, encoding="utf-8") as archivo:
+                lentas = archivo.readlines()
+            print(f"🐢 {lentas[0].strip()}")
+            assert db.estadisticas.lentas == 1 and len(lentas) == 1
+            assert "WITH RECURSIVE" in lentas[0] and "i < ?" in lentas[0]
+
+    print("\n✅ Test de consultas lentas completado")
+
+if __name__ == "__main__":
+    test_normalizar()
+    test_estadisticas_por_sentencia()
+    test_consultas_lentas()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test de la base inyectable: importar sin tocar disco, bases en memoria y usar_database
+"""
+import sys
+import os
+import asyncio
+import subprocess
+import tempfile
+import threading
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import (Database, Tarea, tarea_model, nota_model, obtener_database,
+                                 configurar_database, usar_database)
+from src.database.async_models import async_tarea_model
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def test_importar_sin_crear_base():
+    """Probar que importar los modelos y las funciones no crea data/nelida.db"""
+    print("📦 Probando importación sin efectos...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        subprocess.run(
+            [sys.executable, "-c",
+             "import src.database.models, src.database.async_models, "
+             "src.functions.tareas, src.functions.notas, src.functions.recordatorios"],
+            cwd=tmp_dir, env={**os.environ, "PYTHONPATH": RAIZ}, check=True
+        )
+        # (logs/ lo crea bot_logger al importarse)
+        assert "data" not in os.listdir(tmp_dir)
+
+    print("\n✅ Test de importación completado")
+
+def test_base_en_memoria():
+    """Probar que Database(":memory:") es una sola base para todos los hilos"""
+    print("🧠 Probando base en memoria...")
+
+    db = Database(":memory:")
+    otra = Database(":memory:")
+    try:
+        assert db.db_path is None
+        tareas = Tarea(db)
+        tareas.crear("Desde el hilo principal", 1)
+
+        hilo = threading.Thread(target=tareas.crear, args=("Desde otro hilo", 1))
+        hilo.start()
+        hilo.join()
+
+        assert len(tareas.listar_por_usuario(1)) == 2
+        assert Tarea(otra).listar_por_usuario(1) == []
+    finally:
+        db.close()
+        otra.close()
+
+    print("\n✅ Test de base en memoria completado")
+
+def test_usar_database():
+    """Probar que los modelos globales y las funciones async usan la base inyectada"""
+    print("💉 Probando inyección de la base...")
+
+    bases = [Database(":memory:") for _ in range(3)]
+    try:
+        # Cada hilo con su base, en paralelo, a través de los modelos globales
+        def trabajar(db: Database, cantidad: int):
+            with usar_database(db):
+                for i in range(cantidad):
+                    tarea_model.crear(f"Tarea {i}", 7)
+
+        hilos = [threading.Thread(target=trabajar, args=(db, n + 1)) for n, db in enumerate(bases)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        assert [len(Tarea(db).listar_por_usuario(7)) for db in bases] == [1, 2, 3]
+
+        # La base llega también a los hilos del executor de AsyncModel
+        async def escenario():
+            with usar_database(bases[0]):
+                await async_tarea_model.crear("Desde AsyncModel", 8)
+                return await async_tarea_model.listar_por_usuario(8)
+
+        creadas = asyncio.run(escenario())
+        assert [t['contenido'] for t in creadas] == ["Desde AsyncModel"]
+        assert Tarea(bases[1]).listar_por_usuario(8) == []
+
+        # configurar_database reemplaza la global para todo el proceso
+        anterior = configurar_database(bases[2])
+        try:
+            assert obtener_database() is bases[2]
+            nota_model.crear("Global", 9)
+            assert len(nota_model.listar_por_usuario(9)) == 1
+        finally:
+            configurar_database(anterior)
+    finally:
+        for db in bases:
+            db.close()
+
+    print("\n✅ Test de inyección completado")
+
+if __name__ == "__main__":
+    test_importar_sin_crear_base()
+    test_base_en_memoria()
+    test_usar_database()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test de las migraciones del esquema y de los planes de consulta de los modelos
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Database, Recordatorio, Tarea, Nota, MensajeConversacion
+from src.database.migrations import MIGRATIONS, version_actual, planes_sin_indice
+from src.utils.fechas import a_epoch, formatear
+
+def ejercitar_modelos(db: Database, user_id: int):
+    """Llamar a todos los métodos de los modelos que consultan la base"""
+    recordatorios = Recordatorio(db)
+    tareas = Tarea(db)
+    notas = Nota(db)
+
+    rec_id = recordatorios.crear("Pagar la luz", datetime.now() + timedelta(days=1), user_id)
+    recordatorios.crear_multiples([("Sacar turno", datetime.now(), "alta")], user_id)
+    recordatorios.obtener_por_id(rec_id)
+    recordatorios.listar_por_usuario(user_id)
+    recordatorios.listar_por_usuario(user_id, status="pendiente")
+    recordatorios.listar_por_usuario(user_id, status="pendiente", after_id=rec_id, limit=10)
+    recordatorios.obtener_pendientes_hasta(datetime.now() + timedelta(days=2))
+    recordatorios.obtener_pendientes_hasta(datetime.now(), sin_notificar=True)
+    recordatorios.marcar_notificado(rec_id, user_id)
+    recordatorios.listar_historial(user_id, limit=10)
+    recordatorios.actualizar_status(rec_id, "completado")
+    recordatorios.eliminar(rec_id)
+
+    tarea_id = tareas.crear("Llamar al plomero", user_id)
+    tareas.crear_multiples([("Comprar pan", "baja", "casa")], user_id)
+    tareas.obtener_por_id(tarea_id)
+    tareas.listar_por_usuario(user_id)
+    tareas.listar_por_usuario(user_id, status="pendiente")
+    tareas.listar_por_usuario(user_id, status="pendiente", categoria="casa")
+    tareas.listar_por_usuario(user_id, status="pendiente", after_id=tarea_id, limit=10)
+    tareas.buscar_por_contenido("plomero", user_id)
+    tareas.listar_historial(user_id)
+    tareas.listar_historial(user_id, status="completado", limit=10)
+    tareas.listar_historial(user_id, categoria="casa", limit=10)
+    tareas.completar_multiples(["pan"], user_id)
+    tareas.actualizar_status(tarea_id, "cancelado")
+
+    nota_id = notas.crear("El plomero se llama Rubén", user_id)
+    notas.crear_multiples([("Idea: huerta en el balcón", "ideas")], user_id)
+    notas.listar_por_usuario(user_id)
+    notas.listar_por_usuario(user_id, categoria="ideas")
+    notas.listar_por_usuario(user_id, after_id=nota_id, limit=10)
+    notas.buscar_por_contenido("ruben", user_id)
+    notas.eliminar(nota_id, user_id)
+
+    mensajes = MensajeConversacion(db)
+    mensajes.agregar([{"role": "user", "content": "Hola"}], user_id)
+    mensajes.agregar([{"role": "user", "content": "Chau"}], user_id, reemplazar=True)
+    mensajes.ultimos(user_id, 9)
+    mensajes.borrar_usuario(user_id)
+
+def test_migraciones_y_planes():
+    """Probar que las migraciones se aplican una vez y que toda consulta usa un índice"""
+    print("🧪 Probando migraciones y planes de consulta...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "nelida_test.db")
+
+        # 1. Base "vieja": tablas creadas antes de que existiera schema_version
+        print("\n1️⃣ Migrando una base sin schema_version...")
+        conn = sqlite3.connect(db_path)
+        MIGRATIONS[0][2](conn)
+        conn.commit()
+        conn.close()
+
+        db = Database(db_path)
+        ultima_version = MIGRATIONS[-1][0]
+        with db.connection() as conn:
+            assert version_actual(conn) == ultima_version
+            indices = {fila[0] for fila in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'"
+            )}
+        print(f"✅ Esquema en versión {ultima_version}, índices: {sorted(indices)}")
+        assert "idx_tareas_user_id" not in indices
+        db.close()
+
+        # 2. Abrir de nuevo no vuelve a aplicar nada
+        print("\n2️⃣ Reabriendo la base...")
+        db = Database(db_path)
+        with db.connection() as conn:
+            aplicadas = conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+        assert aplicadas == len(MIGRATIONS)
+        print("✅ Las migraciones no se repiten")
+
+        # 3. Capturar todas las sentencias de los modelos y revisar sus planes
+        print("\n3️⃣ Revisando EXPLAIN QUERY PLAN de cada consulta...")
+        sentencias = []
+        conn = db.get_connection()
+        conn.set_trace_callback(sentencias.append)
+        ejercitar_modelos(db, user_id=31337)
+        conn.set_trace_callback(None)
+
+        consultas = [
+            sql for sql in sentencias
+            if sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE"))
+            and "sqlite_master" not in sql and "last_insert_rowid" not in sql
+        ]
+        print(f"🔎 {len(consultas)} consultas capturadas")
+
+        escaneos = planes_sin_indice(conn, consultas)
+        for sql, detalle in escaneos:
+            print(f"❌ {detalle}: {' '.join(sql.split())}")
+        assert escaneos == []
+        print("✅ Todas las consultas usan un índice")
+
+        db.close()
+
+    print("\n✅ Test de migraciones completado")
+
+def test_fechas_epoch():
+    """Probar que la migración a epoch interpreta bien cada formato de fecha"""
+    print("🕐 Probando migración de fechas a epoch...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "nelida_test.db")
+
+        # 1. Base en la versión 6, con fechas en texto
+        conn = sqlite3.connect(db_path)
+        version_actual(conn)
+        for version, descripcion, func in MIGRATIONS:
+            if version <= 6:
+                func(conn)
+                conn.execute("INSERT INTO schema_version (version, descripcion) VALUES (?, ?)",
+                             (version, descripcion))
+        # fecha_recordatorio en hora de Buenos Aires (con y sin microsegundos);
+        # fecha_creacion de CURRENT_TIMESTAMP, en UTC
+        conn.executemany("""
+            INSERT INTO recordatorios (contenido, fecha_recordatorio, user_id, fecha_creacion)
+            VALUES (?, ?, 1, ?)
+        """, [
+            ("A las 9", "2026-10-17 09:00:00.250000", "2026-10-17 11:00:00"),
+            ("A las 9 y 5", "2026-10-17 09:05:00", "2026-10-17 11:00:00"),
+        ])
+        conn.execute("INSERT INTO notas (contenido, user_id, fecha_creacion) VALUES ('n', 1, '2026-10-17 12:00:00')")
+        conn.commit()
+        conn.close()
+
+        # 2. Migrar
+        db = Database(db_path)
+        with db.connection() as conn:
+            tipos = {fila[0] for fila in conn.execute("""
+                SELECT typeof(fecha_recordatorio) FROM recordatorios
+                UNION SELECT typeof(fecha_creacion) FROM recordatorios
+                UNION SELECT typeof(fecha_creacion) FROM notas
+            """)}
+        assert tipos == {"integer"}
+
+        a_las_9, a_las_9_y_5 = Recordatorio(db).listar_por_usuario(1)
+        assert a_las_9['fecha_recordatorio'] == a_epoch(datetime(2026, 10, 17, 9, 0))
+        assert formatear(a_las_9['fecha_recordatorio']) == "17/10/2026 09:00"
+        # 11:00 UTC son las 8:00 en Buenos Aires
+        assert formatear(a_las_9['fecha_creacion']) == "17/10/2026 08:00"
+        assert formatear(Nota(db).listar_por_usuario(1)[0]['fecha_creacion']) == "17/10/2026 09:00"
+        print(f"✅ {a_las_9.to_dict()}")
+
+        # El rango compara enteros: 9:00 entra y 9:05 no (como texto, ".250000" quedaba afuera)
+        pendientes = Recordatorio(db).obtener_pendientes_hasta(datetime(2026, 10, 17, 9, 0))
+        assert [r['contenido'] for r in pendientes] == ["A las 9"]
+        db.close()
+
+    print("\n✅ Test de fechas completado")
+
+if __name__ == "__main__":
+    test_migraciones_y_planes()
+    test_fechas_epoch()
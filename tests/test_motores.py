@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test de los motores de almacenamiento: elección por URL y pool de SQLAlchemy
+"""
+import sys
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Database, Nota
+from src.database.motores import SQLiteEngine, SQLAlchemyEngine, crear_motor
+from src.database.unidad_trabajo import unidad_de_trabajo
+
+def test_eleccion_de_motor():
+    """Probar qué motor corresponde a cada URL"""
+    print("🔌 Probando elección de motor por URL...")
+    preparar = lambda conn: None
+
+    motor = crear_motor("sqlite:///data/nelida.db", preparar)
+    assert isinstance(motor, SQLiteEngine) and motor.path == "data/nelida.db"
+
+    motor = crear_motor("sqlite+pysqlite:///data/nelida.db", preparar)
+    assert isinstance(motor, SQLAlchemyEngine) and motor.path == "data/nelida.db"
+    motor.dispose()
+
+    motor = crear_motor("sqlite://", preparar)
+    assert isinstance(motor, SQLAlchemyEngine) and motor.path is None
+    motor.dispose()
+
+    try:
+        crear_motor("postgresql://nelida@localhost/nelida", preparar)
+        assert False, "una URL que no es SQLite debería rechazarse"
+    except ValueError as e:
+        print(f"✅ Rechazada: {e}")
+
+def test_pool_sqlalchemy():
+    """Probar que las conexiones de las unidades de trabajo vuelven al pool"""
+    print("🏊 Probando el pool de SQLAlchemy...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ruta = os.path.join(tmp_dir, "nelida_test.db")
+        db = Database(url=f"sqlite+pysqlite:///{ruta}", pool_size=2)
+        pool = db.engine.engine.pool
+        notas = Nota(db)
+        user_id = 55
+
+        en_uso = pool.checkedout()
+        conexiones = set()
+        for i in range(5):
+            with unidad_de_trabajo(db) as unidad:
+                notas.crear(f"Nota {i}", user_id)
+                conexiones.add(id(unidad.conn))
+            assert pool.checkedout() == en_uso
+
+        print(f"📊 5 unidades de trabajo usaron {len(conexiones)} conexión(es) del pool")
+        assert len(conexiones) == 1  # siempre la misma conexión reciclada
+        assert len(notas.listar_por_usuario(user_id)) == 5
+
+        # Muchos hilos no se quedan con conexiones: vuelven al pool al terminar cada operación
+        with ThreadPoolExecutor(max_workers=20) as hilos:
+            list(hilos.map(lambda i: notas.crear(f"Desde un hilo {i}", user_id + 1), range(40)))
+            list(hilos.map(lambda i: notas.listar_por_usuario(user_id + 1), range(40)))
+        assert pool.checkedout() == en_uso
+        assert len(notas.listar_por_usuario(user_id + 1)) == 40
+
+        db.close()
+        assert pool.checkedout() == 0
+
+    print("\n✅ Test de motores completado")
+
+def test_aislamiento_en_memoria():
+    """Probar que en la base en memoria del pool cada hilo tiene su conexión y su transacción"""
+    print("🧱 Probando aislamiento en memoria...")
+
+    db = Database(url="sqlite://")
+    notas = Nota(db)
+    escribio = threading.Event()
+    seguir = threading.Event()
+    vistas = {}
+
+    def escribir_sin_confirmar():
+        with db.transaction() as conn:
+            vistas["escritor"] = conn
+            notas.crear("Sin confirmar", 60)
+            escribio.set()
+            seguir.wait(5)
+            raise RuntimeError("se deshace")
+
+    escritor = threading.Thread(target=lambda: _ignorar(escribir_sin_confirmar))
+    escritor.start()
+    assert escribio.wait(5)
+    # Otro hilo no se suma a la transacción del escritor ni ve sus filas
+    with db.connection() as conn:
+        assert conn is not vistas["escritor"]
+        assert notas.listar_por_usuario(60) == []
+    seguir.set()
+    escritor.join()
+    assert notas.listar_por_usuario(60) == []
+
+    notas.crear("Confirmada", 60)
+    assert [n['contenido'] for n in notas.listar_por_usuario(60)] == ["Confirmada"]
+    db.close()
+
+    print("\n✅ Test de aislamiento completado")
+
+def _ignorar(funcion):
+    try:
+        funcion()
+    except RuntimeError:
+        pass
+
+if __name__ == "__main__":
+    test_eleccion_de_motor()
+    test_pool_sqlalchemy()
+    test_aislamiento_en_memoria()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Test de la paginación por cursor (after_id, limit) y de los iteradores de los modelos
+"""
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Recordatorio, Tarea, Nota
+from backends import para_cada_backend
+
+def test_paginacion():
+    """Probar que recorrer por páginas da lo mismo que listar todo de una vez"""
+    print("📄 Probando paginación por cursor...")
+
+    for backend, db in para_cada_backend():
+        recordatorios = Recordatorio(db)
+        tareas = Tarea(db)
+        notas = Nota(db)
+        user_id = 777
+
+        # Muchas filas con la misma fecha de creación: el desempate es por ID
+        prioridades = ["alta", "media", "baja"]
+        tareas.crear_multiples(
+            [(f"Tarea {i}", prioridades[i % 3], "general") for i in range(25)], user_id
+        )
+        notas.crear_multiples([(f"Nota {i}", "general") for i in range(25)], user_id)
+        base = datetime.now()
+        recordatorios.crear_multiples(
+            [(f"Recordatorio {i}", base + timedelta(hours=i % 4), "media") for i in range(25)], user_id
+        )
+
+        for nombre, modelo in [("tareas", tareas), ("notas", notas), ("recordatorios", recordatorios)]:
+            print(f"\n🔁 {nombre}...")
+            completo = [fila['id'] for fila in modelo.listar_por_usuario(user_id)]
+
+            # Página por página con after_id
+            paginado = []
+            after_id = None
+            while True:
+                pagina = modelo.listar_por_usuario(user_id, after_id=after_id, limit=7)
+                paginado.extend(fila['id'] for fila in pagina)
+                if len(pagina) < 7:
+                    break
+                after_id = pagina[-1]['id']
+
+            iterado = [fila['id'] for fila in modelo.iterar_por_usuario(user_id, tamano_pagina=4)]
+
+            print(f"   {len(completo)} filas, {len(paginado)} paginadas, {len(iterado)} iteradas")
+            assert len(completo) == 25
+            assert paginado == completo
+            assert iterado == completo
+
+    print("\n✅ Test de paginación completado")
+
+if __name__ == "__main__":
+    test_paginacion()
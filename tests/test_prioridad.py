@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test de la prioridad entera de las tareas y de su migración desde texto
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Database, Tarea
+from src.database.migrations import MIGRATIONS, version_actual
+
+def test_prioridad_entera():
+    """Probar la migración de prioridades en texto y el orden alta > media > baja"""
+    print("🔢 Probando prioridad entera de tareas...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "nelida_test.db")
+
+        # 1. Base en la versión 4, con prioridades en texto
+        print("\n1️⃣ Creando base con prioridades en texto...")
+        conn = sqlite3.connect(db_path)
+        version_actual(conn)
+        for version, descripcion, func in MIGRATIONS:
+            if version <= 4:
+                func(conn)
+                conn.execute("INSERT INTO schema_version (version, descripcion) VALUES (?, ?)",
+                             (version, descripcion))
+        conn.executemany("""
+            INSERT INTO tareas (contenido, prioridad, user_id, fecha_creacion)
+            VALUES (?, ?, 1, ?)
+        """, [
+            ("Comprar lamparitas", "baja", "2024-01-01 10:00:00"),
+            ("Pagar el alquiler", "alta", "2024-01-02 10:00:00"),
+            ("Llamar a la abuela", "media", "2024-01-03 10:00:00"),
+            ("Turno con el médico", "alta", "2024-01-04 10:00:00"),
+            ("Tarea borrada", "media", "2024-01-05 10:00:00"),
+        ])
+        conn.execute("DELETE FROM tareas WHERE contenido = 'Tarea borrada'")
+        conn.commit()
+        conn.close()
+
+        # 2. Migrar
+        print("\n2️⃣ Migrando...")
+        db = Database(db_path)
+        tareas = Tarea(db)
+        with db.connection() as conn:
+            assert version_actual(conn) == MIGRATIONS[-1][0]
+            tipos = {fila['prioridad'] for fila in conn.execute("SELECT typeof(prioridad) AS prioridad FROM tareas")}
+            assert tipos == {"integer"}
+
+        listado = tareas.listar_por_usuario(1)
+        for tarea in listado:
+            print(f"   - [{tarea['prioridad']}] {tarea['contenido']}")
+        assert [t['contenido'] for t in listado] == [
+            "Pagar el alquiler", "Turno con el médico", "Llamar a la abuela", "Comprar lamparitas"
+        ]
+        print("✅ Orden alta > media > baja")
+
+        # 3. Los IDs borrados no se reusan y los triggers FTS siguen andando
+        print("\n3️⃣ Creando tareas nuevas...")
+        nueva_id = tareas.crear("Revisar el medidor de gas", 1, prioridad="alta")
+        assert nueva_id == 6
+        assert tareas.obtener_por_id(nueva_id)['prioridad'] == "alta"
+        if db.fts_enabled:
+            assert [t['id'] for t in tareas.buscar_por_contenido("medidor", 1)] == [nueva_id]
+        assert tareas.listar_por_usuario(1)[2]['id'] == nueva_id
+
+        # 4. Prioridades inválidas
+        try:
+            tareas.crear("Algo", 1, prioridad="urgentísima")
+            assert False, "Debería fallar con prioridad inválida"
+        except ValueError as e:
+            print(f"✅ Prioridad inválida rechazada: {e}")
+
+        db.close()
+
+    print("\n✅ Test de prioridad completado")
+
+if __name__ == "__main__":
+    test_prioridad_entera()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test de los respaldos en caliente: copia incremental, escrituras concurrentes y rotación
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Tarea, Nota
+from src.database.respaldos import respaldar, rotar, listar_respaldos, RespaldoEnCurso, _en_curso
+from backends import para_cada_backend
+
+def contar(ruta: str, tabla: str) -> int:
+    conn = sqlite3.connect(ruta)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_respaldo():
+    """Probar que el respaldo copia todo, informa el progreso y es una base válida"""
+    print("💾 Probando respaldo en caliente...")
+
+    for backend, db in para_cada_backend():
+        with tempfile.TemporaryDirectory() as destino:
+            user_id = 12
+            Tarea(db).crear_multiples([(f"Tarea {i} " + "x" * 200, "media", "general")
+                                       for i in range(2000)], user_id)
+            Nota(db).crear("una nota", user_id)
+
+            pasos = []
+            resultado = respaldar(db, destino, paginas_por_paso=8, pausa=0,
+                                  progreso=lambda archivo, copiadas, total: pasos.append((copiadas, total)))
+
+            archivo, = resultado["archivos"]
+            print(f"📦 {archivo}: {resultado['bytes']} bytes en {len(pasos)} pasos")
+            assert len(pasos) > 1 and pasos[-1][0] == pasos[-1][1]
+            assert contar(archivo, "tareas") == 2000 and contar(archivo, "notas") == 1
+            assert not [n for n in os.listdir(resultado["directorio"]) if n.endswith(".parcial")]
+
+    print("\n✅ Test de respaldo completado")
+
+def test_respaldo_con_escrituras():
+    """Probar que el bot sigue escribiendo durante el respaldo y la copia queda consistente"""
+    print("✍️ Probando respaldo con escrituras concurrentes...")
+
+    for backend, db in para_cada_backend(("sqlite3",)):
+        with tempfile.TemporaryDirectory() as destino:
+            tareas = Tarea(db)
+            tareas.crear_multiples([("relleno " + "x" * 500, "baja", "general")] * 3000, 1)
+
+            terminado = threading.Event()
+            latencias = []
+
+            def escribir():
+                while not terminado.is_set():
+                    inicio = time.perf_counter()
+                    tareas.crear("durante el respaldo", 2)
+                    latencias.append(time.perf_counter() - inicio)
+                    time.sleep(0.001)
+
+            escritor = threading.Thread(target=escribir)
+            escritor.start()
+            try:
+                resultado = respaldar(db, destino, paginas_por_paso=16, pausa=0.002)
+            finally:
+                terminado.set()
+                escritor.join()
+
+            archivo, = resultado["archivos"]
+            copiadas = contar(archivo, "tareas")
+            print(f"📝 {len(latencias)} escrituras durante el respaldo, "
+                  f"la más lenta {max(latencias) * 1000:.1f} ms; reinicios: {resultado['reinicios']}")
+            assert latencias
+            assert 3000 <= copiadas <= 3000 + len(latencias)
+            assert sqlite3.connect(archivo).execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+
+    print("\n✅ Test de respaldo con escrituras completado")
+
+def test_rotacion_y_exclusion():
+    """Probar la rotación de respaldos viejos y que no corren dos a la vez"""
+    print("🔄 Probando rotación...")
+
+    with tempfile.TemporaryDirectory() as destino:
+        for nombre in ["20260101-030000", "20260102-030000", "20260103-030000", "otra-cosa"]:
+            os.makedirs(os.path.join(destino, nombre))
+
+        assert rotar(destino, conservar=2) == 1
+        assert [os.path.basename(r) for r in listar_respaldos(destino)] == ["20260102-030000", "20260103-030000"]
+        assert os.path.isdir(os.path.join(destino, "otra-cosa"))
+
+        with _en_curso:
+            try:
+                respaldar(None, destino)
+                assert False, "no debería correr con otro respaldo en curso"
+            except RespaldoEnCurso:
+                print("✅ Un segundo respaldo se rechaza mientras corre el primero")
+
+    print("\n✅ Test de rotación completado")
+
+if __name__ == "__main__":
+    test_respaldo()
+    test_respaldo_con_escrituras()
+    test_rotacion_y_exclusion()
@@ -48,7 +48,7 @@ async def test_rss_feeds():
     # Test 3: Función de noticias de hoy
     print("3️⃣ Test función obtener_noticias_hoy")
     try:
-        resultado_hoy = await obtener_noticias_hoy(limite=5, user_id=12345)
+        resultado_hoy = obtener_noticias_hoy(limite=5, user_id=12345)
         
         if resultado_hoy['success']:
             print(f"✅ Noticias de hoy obtenidas: {resultado_hoy['total']}")
@@ -69,7 +69,7 @@ async def test_rss_feeds():
     # Test 4: Noticias por categoría
     print("4️⃣ Test función obtener_noticias_categoria")
     try:
-        resultado_politica = await obtener_noticias_categoria("política", limite=3, user_id=12345)
+        resultado_politica = obtener_noticias_categoria("política", limite=3, user_id=12345)
         
         if resultado_politica['success']:
             print(f"✅ Noticias de política: {resultado_politica['total']}")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test del sharding por usuario: ruteo, IDs únicos entre shards, rebalanceo y migración
+"""
+import sys
+import os
+import json
+import tempfile
+from datetime import datetime, timedelta
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Database, Recordatorio, Tarea, Nota
+from src.database.shards import ShardedDatabase, rebalancear, migrar_desde, fijar_usuario
+
+USUARIOS = list(range(1000, 1012))
+
+def cargar_datos(db, usuarios) -> dict:
+    """Crear una tarea, una nota y un recordatorio por usuario; devuelve sus IDs"""
+    tareas, notas, recordatorios = Tarea(db), Nota(db), Recordatorio(db)
+    base = datetime(2026, 1, 1, 9, 0)
+    ids = {}
+    for i, user_id in enumerate(usuarios):
+        ids[user_id] = (
+            tareas.crear(f"Tarea de {user_id}", user_id),
+            notas.crear(f"Nota de {user_id}", user_id),
+            recordatorios.crear(f"Recordatorio de {user_id}", base + timedelta(minutes=i), user_id),
+        )
+    return ids
+
+def contenido_por_usuario(db, usuarios) -> dict:
+    tareas, notas = Tarea(db), Nota(db)
+    return {
+        user_id: ([(t['id'], t['contenido']) for t in tareas.listar_por_usuario(user_id)],
+                  [(n['id'], n['contenido']) for n in notas.listar_por_usuario(user_id)])
+        for user_id in usuarios
+    }
+
+def test_ruteo_e_ids():
+    """Probar que cada usuario vive en su shard y que los IDs no se repiten"""
+    print("🧩 Probando ruteo por usuario...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mapa = os.path.join(tmp_dir, "shards.json")
+        db = ShardedDatabase(mapa, total=3)
+        ids = cargar_datos(db, USUARIOS)
+
+        # Los shards se abren recién cuando se usan, y todos quedaron en uso
+        assert len(db.todas(abiertas=True)) == 3
+
+        # Cada usuario está sólo en su shard
+        for user_id in USUARIOS:
+            for shard in db.todas():
+                cantidad = len(Tarea(shard).listar_por_usuario(user_id))
+                assert cantidad == (1 if shard is db.para_usuario(user_id) else 0)
+
+        # IDs únicos por tabla aunque estén en distintos shards
+        for columna in range(3):
+            ids_tabla = [trio[columna] for trio in ids.values()]
+            assert len(set(ids_tabla)) == len(ids_tabla)
+        print(f"✅ {len(USUARIOS)} IDs distintos por tabla en 3 shards")
+
+        # Por ID sin user_id: se busca en todos los shards
+        tareas = Tarea(db)
+        user_id = USUARIOS[5]
+        tarea_id = ids[user_id][0]
+        assert tareas.obtener_por_id(tarea_id)['user_id'] == user_id
+        assert tareas.actualizar_status(tarea_id, "completado")
+        assert tareas.listar_por_usuario(user_id, status="completado")[0]['id'] == tarea_id
+        assert Recordatorio(db).eliminar(ids[user_id][2])
+
+        # Pendientes de todos los usuarios, ordenados entre shards
+        pendientes = Recordatorio(db).obtener_pendientes_hasta(datetime(2027, 1, 1))
+        fechas = [r['fecha_recordatorio'] for r in pendientes]
+        assert len(pendientes) == len(USUARIOS) - 1 and fechas == sorted(fechas)
+
+        db.close()
+
+    print("\n✅ Test de ruteo completado")
+
+def test_rebalanceo_y_fijado():
+    """Probar que rebalancear y fijar usuarios conserva datos e IDs"""
+    print("⚖️ Probando rebalanceo...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mapa = os.path.join(tmp_dir, "shards.json")
+        db = ShardedDatabase(mapa, total=2)
+        cargar_datos(db, USUARIOS)
+        antes = contenido_por_usuario(db, USUARIOS)
+
+        movidos = rebalancear(db, 5)
+        print(f"📦 {len(movidos)} usuarios movidos a otro shard")
+        assert movidos
+        assert contenido_por_usuario(db, USUARIOS) == antes
+        with open(mapa, encoding="utf-8") as f:
+            assert len(json.load(f)["shards"]) == 5
+
+        # Fijar un usuario a un shard
+        user_id = USUARIOS[0]
+        destino = (db.indice_de(user_id) + 1) % 5
+        fijar_usuario(db, user_id, destino)
+        assert db.para_usuario(user_id) is db.shard(destino)
+        assert contenido_por_usuario(db, USUARIOS) == antes
+
+        # Los IDs nuevos siguen sin chocar con los movidos
+        ids_viejos = {i for tareas, notas in antes.values() for i, _ in tareas}
+        nuevos = [Tarea(db).crear("otra", u) for u in USUARIOS]
+        assert not ids_viejos & set(nuevos) and len(set(nuevos)) == len(nuevos)
+
+        # Reducir: los usuarios de los shards que sobran se reparten
+        rebalancear(db, 2)
+        db.close()
+
+        db = ShardedDatabase(mapa)
+        assert len(db.rutas) == 2
+        assert all(len(Tarea(db).listar_por_usuario(u)) == 2 for u in USUARIOS)
+        db.close()
+
+    print("\n✅ Test de rebalanceo completado")
+
+def test_migracion_desde_una_base():
+    """Probar el reparto de una base sin sharding"""
+    print("🚚 Probando migración a shards...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ruta = os.path.join(tmp_dir, "nelida.db")
+        original = Database(ruta)
+        cargar_datos(original, USUARIOS)
+        antes = contenido_por_usuario(original, USUARIOS)
+        original.close()
+
+        db = ShardedDatabase(os.path.join(tmp_dir, "shards.json"), total=4)
+        copiados = migrar_desde(db, ruta)
+        assert set(copiados) == set(USUARIOS)
+        assert contenido_por_usuario(db, USUARIOS) == antes
+
+        # Los IDs nuevos del shard 0 siguen después de los migrados
+        maximo = max(i for tareas, _ in antes.values() for i, _ in tareas)
+        user_id = next(u for u in range(1, 100) if db.indice_de(u) == 0)
+        assert Tarea(db).crear("nueva", user_id) > maximo
+        db.close()
+
+    print("\n✅ Test de migración completado")
+
+if __name__ == "__main__":
+    test_ruteo_e_ids()
+    test_rebalanceo_y_fijado()
+    test_migracion_desde_una_base()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test de la unidad de trabajo: las escrituras de un turno se confirman o deshacen juntas
+"""
+import sys
+import os
+import asyncio
+import contextvars
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Tarea, Nota
+from backends import para_cada_backend, BACKENDS_ARCHIVO
+from src.database.async_models import AsyncModel
+from src.database.unidad_trabajo import unidad_de_trabajo, UnidadTerminada
+
+def contar(db_path: str, tabla: str) -> int:
+    """Contar filas desde otra conexión (sólo ve lo confirmado)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {tabla}").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_unidad_de_trabajo():
+    """Probar commit único, rollback del turno, lecturas propias y caché"""
+    print("🧾 Probando unidad de trabajo...")
+
+    for backend, db in para_cada_backend(BACKENDS_ARCHIVO):
+        db_path = db.db_path
+        executor = ThreadPoolExecutor(max_workers=2)
+        tareas = AsyncModel(Tarea(db), executor)
+        notas = AsyncModel(Nota(db), executor)
+        user_id = 321
+
+        # 1. Varias escrituras desde hilos del executor, un solo commit al final
+        print("\n1️⃣ Turno con dos funciones que escriben...")
+        async def turno_ok():
+            with unidad_de_trabajo(db) as unidad:
+                await tareas.crear("Comprar yerba", user_id)
+                await notas.crear("La yerba buena es la de palo", user_id)
+                assert contar(db_path, "tareas") == 0  # todavía sin confirmar
+                # Las lecturas del turno ven sus propias escrituras
+                assert len(await tareas.listar_por_usuario(user_id)) == 1
+                assert unidad.escrituras == 2
+
+        asyncio.run(turno_ok())
+        assert contar(db_path, "tareas") == 1 and contar(db_path, "notas") == 1
+        assert len(Tarea(db).listar_por_usuario(user_id)) == 1
+        print("✅ Confirmadas juntas")
+
+        # 2. Si una función falla, se deshace todo el turno
+        print("\n2️⃣ Turno con una función que falla...")
+        assert len(Nota(db).listar_por_usuario(user_id)) == 1  # queda en caché
+
+        async def turno_fallido():
+            with unidad_de_trabajo(db) as unidad:
+                await notas.crear("Esta nota no se guarda", user_id)
+                assert len(await notas.listar_por_usuario(user_id)) == 2
+                try:
+                    await tareas.crear("Prioridad rara", user_id, prioridad="urgentísima")
+                except ValueError:
+                    unidad.marcar_fallida("crear_tarea")
+            return unidad
+
+        unidad = asyncio.run(turno_fallido())
+        assert unidad.fallida and unidad.motivo_fallo == "crear_tarea"
+        assert contar(db_path, "notas") == 1
+        assert len(Nota(db).listar_por_usuario(user_id)) == 1  # la caché no se ensució
+        print("✅ Turno deshecho")
+
+        # 3. Una excepción que escapa del bloque también deshace
+        print("\n3️⃣ Excepción dentro del turno...")
+        async def turno_con_excepcion():
+            with unidad_de_trabajo(db):
+                await tareas.crear("Tampoco se guarda", user_id)
+                raise RuntimeError("se cortó la luz")
+
+        try:
+            asyncio.run(turno_con_excepcion())
+            assert False, "Debería propagar la excepción"
+        except RuntimeError:
+            pass
+        assert contar(db_path, "tareas") == 1
+
+        # 4. Una escritura que falla sola se deshace con su savepoint
+        print("\n4️⃣ Escritura inválida dentro del turno...")
+        async def turno_con_error_sql():
+            with unidad_de_trabajo(db):
+                tarea_id = await tareas.crear("Válida", user_id)
+                try:
+                    await tareas.actualizar_status(tarea_id, "inexistente")
+                except sqlite3.IntegrityError:
+                    pass
+                return tarea_id
+
+        tarea_id = asyncio.run(turno_con_error_sql())
+        assert Tarea(db).obtener_por_id(tarea_id)['status'] == "pendiente"
+        print("✅ Sólo se deshizo la escritura inválida")
+
+        # 5. Una escritura que llega después de terminada la unidad (ej: de un
+        # hilo que siguió corriendo) falla en vez de dejar una transacción abierta
+        print("\n5️⃣ Escritura tardía...")
+        with unidad_de_trabajo(db):
+            Tarea(db).crear("Dentro del turno", user_id)
+            ctx = contextvars.copy_context()
+        try:
+            executor.submit(ctx.run, Tarea(db).crear, "Tardía", user_id).result()
+            assert False, "Debería rechazar la escritura tardía"
+        except UnidadTerminada:
+            pass
+        inicio = time.perf_counter()
+        executor.submit(Tarea(db).crear, "De otro turno", user_id).result()
+        assert time.perf_counter() - inicio < 1.0  # nadie quedó con el lock
+        assert contar(db_path, "tareas") == 4
+        print("✅ Escritura tardía rechazada")
+
+        executor.shutdown()
+
+    print("\n✅ Test de unidad de trabajo completado")
+
+if __name__ == "__main__":
+    test_unidad_de_trabajo()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test del modo write-behind: escrituras encoladas y confirmadas en grupo
+"""
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# Agregar src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.database.models import Database, Recordatorio, Tarea, Nota
+
+def test_write_behind():
+    """Probar IDs, agrupamiento, errores aislados y vaciado de la cola al cerrar"""
+    print("✍️ Probando escrituras agrupadas...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "nelida_test.db")
+        db = Database(db_path, write_behind=True, grupo_max_ms=20)
+        tareas = Tarea(db)
+        notas = Nota(db)
+        recordatorios = Recordatorio(db)
+
+        # 1. Muchos hilos escribiendo a la vez
+        print("\n1️⃣ 8 hilos creando 25 tareas cada uno...")
+        ids = []
+        lock = threading.Lock()
+
+        def crear(hilo: int):
+            for i in range(25):
+                tarea_id = tareas.crear(f"Tarea {hilo}-{i}", user_id=hilo)
+                with lock:
+                    ids.append(tarea_id)
+
+        hilos = [threading.Thread(target=crear, args=(n,)) for n in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        assert len(ids) == 200 and len(set(ids)) == 200
+        assert all(tareas.obtener_por_id(tarea_id) is not None for tarea_id in ids)
+        print(f"✅ {db.escrituras_confirmadas} escrituras en {db.grupos_confirmados} commits")
+        assert db.grupos_confirmados < db.escrituras_confirmadas
+
+        # 2. La escritura confirmada ya se ve (y la caché se invalidó)
+        print("\n2️⃣ Leyendo después de escribir...")
+        assert len(notas.listar_por_usuario(5)) == 0
+        nota_id = notas.crear("Comprar pilas", 5)
+        assert [n['id'] for n in notas.listar_por_usuario(5)] == [nota_id]
+
+        # 3. Un error sólo afecta a su escritura
+        print("\n3️⃣ Escritura inválida en medio del grupo...")
+        rec_id = recordatorios.crear("Sacar la basura", datetime.now(), 5)
+        errores = []
+
+        def invalida():
+            try:
+                recordatorios.actualizar_status(rec_id, "inexistente")
+            except sqlite3.IntegrityError as e:
+                errores.append(e)
+
+        hilo_invalido = threading.Thread(target=invalida)
+        hilo_invalido.start()
+        otra_id = notas.crear("Nota válida", 5)
+        hilo_invalido.join()
+        assert len(errores) == 1
+        assert recordatorios.obtener_por_id(rec_id)['status'] == "pendiente"
+        assert notas.listar_por_usuario(5)[0]['id'] == otra_id
+        print(f"✅ Error aislado: {errores[0]}")
+
+        # 4. Dentro de una transacción del hilo, la escritura se suma a ella
+        with db.transaction():
+            notas.crear("En transacción", 6)
+        assert len(notas.listar_por_usuario(6)) == 1
+
+        # 5. close() confirma lo que queda en la cola
+        print("\n4️⃣ Cerrando con escrituras en vuelo...")
+        db.grupo_max_ms = 2000  # el grupo queda abierto esperando más escrituras
+        resultados = []
+        hilos = [threading.Thread(target=lambda n=n: resultados.append(notas.crear(f"Última {n}", 7)))
+                 for n in range(10)]
+        for hilo in hilos:
+            hilo.start()
+        time.sleep(0.2)
+        assert resultados == []
+        db.close()
+        for hilo in hilos:
+            hilo.join()
+
+        conn = sqlite3.connect(db_path)
+        guardadas = conn.execute("SELECT COUNT(*) FROM notas WHERE user_id = 7").fetchone()[0]
+        conn.close()
+        assert guardadas == 10 and len(resultados) == 10
+        print("✅ Cola vaciada al cerrar")
+
+    print("\n✅ Test de write-behind completado")
+
+if __name__ == "__main__":
+    test_write_behind()